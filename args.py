@@ -37,6 +37,9 @@ def get_parser():
     p.add_argument("--num_epoch", default=100, type=int, help="number of epochs for training")
     p.add_argument("--width", default=0.1, type=float, help="width of perturbation") # for DiffAI
     
+    p.add_argument("--nn_domain", default='box', choices=['box', 'zonotope', 'crown'], help="abstract domain inside the networks, the program states are boxes, crown: symbolic linear bounds over the network input")
+    p.add_argument("--zonotope_max_errors", default=64, type=int, help="the maximum number of error terms of a zonotope, the smallest ones are merged into a box")
+    p.add_argument("--fused_mlp", default=False, type=str2bool, help="run the Linear/ReLU/Sigmoid/Tanh networks on boxes in one autograd function with a hand-written backward")
     p.add_argument("--nn_mode", default='all', help="how many NN used in model, 'single' means only used in the first one")
     p.add_argument("--l", default=10, type=int, help="size of hidden states in NN")
     p.add_argument("--b", default=100, type=int, help="range of lambda")
@@ -48,6 +51,14 @@ def get_parser():
     p.add_argument("--test_size", default=20000, type=int, help="test size")
     p.add_argument("--generate_dataset", default=False, type=str2bool, help="generate the data set")
     p.add_argument("--fixed_dataset", default=False, type=str2bool, help="whether to use the same dataset")
+    p.add_argument(
+        "--dataset_format",
+        default="text",
+        choices=['text', 'binary'],
+        help="text: parse the .txt dataset, binary (opt-in fast path): memory-map the float32 .npy dataset converted from it"
+    )
+    p.add_argument("--batch_generation", default=False, type=str2bool, help="opt-in: generate all the trajectories together when a batched generator exists, the random values are drawn in another order than the scalar generators")
+    p.add_argument("--point_store", default=True, type=str2bool, help="keep the training points as tensors once per run, the data loss batches are random permutations of their indices")
 
     # constraint
     p.add_argument("--ini_unsafe_probability", default=0.0, type=float, help="the ini-unsafe_probability to handle")
@@ -98,6 +109,10 @@ def get_parser():
     p.add_argument("--use_hoang", default=False, type=str2bool, help="whether use the outest optimization")
     p.add_argument("--bound_start", default=0, type=int, help=f"the index to start with in safe bound list")
     p.add_argument("--bound_end", default=20, type=int, help=f"the index to end within safe bound list")
+    p.add_argument("--seed_start", default=0, type=int, help=f"the first seed (expr index) to run")
+    p.add_argument("--seed_end", default=20, type=int, help=f"the seed (expr index) to end with")
+    p.add_argument("--num_threads", default=None, type=int, help=f"limit of torch threads in one run")
+    p.add_argument("--result_path", default=None, type=str, help=f"append one json line per (bound, seed) result to this file")
     p.add_argument(
         "--use_abstract_components", 
         default=True, 
@@ -121,6 +136,48 @@ def get_parser():
         default=30,
         help="how many paths to sample in DSE during training"
     )
+    p.add_argument(
+        "--share_path_prefix",
+        default=False,
+        type=str2bool,
+        help="keep one state per component for the sampled paths in DSE until their samples differ, instead of copying each component train_sample_size times"
+    )
+    p.add_argument(
+        "--stream_safety_loss",
+        default=False,
+        type=str2bool,
+        help="accumulate the safety loss of DSE at each Trajectory statement instead of storing the trajectories"
+    )
+    p.add_argument(
+        "--prune_columns",
+        default=False,
+        type=str2bool,
+        help="opt-in fast path: run the program on the live columns of the state only, columns never live at the same time share one column"
+    )
+    p.add_argument(
+        "--compile_program",
+        default=False,
+        type=str2bool,
+        help="opt-in fast path: run a lowered copy of the program, with flattened blocks and the consecutive independent Assigns fused"
+    )
+    p.add_argument(
+        "--masked_branch",
+        default=False,
+        type=str2bool,
+        help="run both arms of a branch on the full batch in DSE and select the sampled one, instead of splitting the batch"
+    )
+    p.add_argument(
+        "--unroll_loop",
+        default=False,
+        type=str2bool,
+        help="run a counter loop in DSE for its known trip count without sampling the counter branch"
+    )
+    p.add_argument(
+        "--compile_loop_body",
+        default=False,
+        type=str2bool,
+        help="wrap the body of an unrolled loop with torch.compile"
+    )
 
     # smooth kernel in training
     p.add_argument("--sample_std", default=1.0, type=float, help=f"std to sample theta")
@@ -130,6 +187,14 @@ def get_parser():
     p.add_argument("--test_mode", default=False, type=str2bool, help="decide whether check load model and then test")
     p.add_argument("--extract_one_trajectory", default=False, type=str2bool, help="extract trajectory starting from one point")
     p.add_argument("--AI_verifier_num_components", default=500, type=int, help="components allowed when using AI as a verifier")
+    p.add_argument("--verifier_chunk_size", default=None, type=int, help="components run together by the AI verifier, all the components by default")
+    p.add_argument("--verifier_memory_budget", default=None, type=float, help="MB, the AI verifier sizes its chunks after the first one to keep the memory of a chunk under it")
+    p.add_argument("--verifier_refine_depth", default=0, type=int, help="bisect the possibly unsafe components of the AI verifier up to this depth and report the unsafe volume, 0: no refinement")
+    p.add_argument("--verifier_refine_time", default=None, type=float, help="seconds, no more bisection after it when refining")
+    p.add_argument("--trajectory_format", default="text", choices=['text', 'binary'], help="text: one line of bounds per step, binary (opt-in, read by trajectory_io.read_trajectories): append-only float32 arrays of the bounds with a JSON header")
+    p.add_argument("--verification_cache_dir", default=None, type=str, help="directory of the on-disk cache of the AI verification results, no cache by default")
+    p.add_argument("--verification_cache_size", default=1024, type=float, help="MB, the least recently used cache files are removed above it")
+    p.add_argument("--verifier_early_stop", default=False, type=str2bool, help="stop the AI verifier at the first chunk with an unsafe component, only the safe/unsafe verdict is kept")
     p.add_argument("--SE_verifier_run_times", default=100, type=int, help="Times to run when using SE as a verifier")
     p.add_argument("--SE_verifier_num_components", default=1, type=int, help="components allowed when using SE as a verifier")
 
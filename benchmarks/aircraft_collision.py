@@ -54,8 +54,8 @@ def initialize_components(abstract_states):
             torch.cat((padding, input_width, padding, padding, padding, padding, padding, padding, padding), 1)),
         'trajectories': [[] for i in range(B)],
         'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # use the log_p here, so start from 0.0
-        'alpha_list': [var(1.0) for i in range(B)],
+        'p_list': [const(0.0) for i in range(B)], # use the log_p here, so start from 0.0
+        'alpha_list': [const(1.0) for i in range(B)],
     }
 
     return states
@@ -77,8 +77,8 @@ def initialization_components_point():
             torch.cat((padding, input_width, padding, padding, padding, padding, padding, padding, padding), 1)),
         'trajectories': [[] for i in range(B)],
         'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
+        'p_list': [const(0.0) for i in range(B)], # might be changed to batch
+        'alpha_list': [const(1.0) for i in range(B)],
     }
 
     return states
@@ -110,31 +110,31 @@ def f_test(x):
     return x
 
 def f_assign_stage_left(x):
-    return x.set_value(var(1.0))
+    return x.set_value(const(1.0))
 
 def f_assign_stage_straight(x):
-    return x.set_value(var(2.0))
+    return x.set_value(const(2.0))
 
 def f_assign_stage_right(x):
-    return x.set_value(var(3.0))
+    return x.set_value(const(3.0))
 
 def f_assign_stage_cruise(x):
-    return x.set_value(var(0.0))
+    return x.set_value(const(0.0))
 
 def f_clear_step(x):
-    return x.set_value(var(0))
+    return x.set_value(const(0))
 
 def f_update_step(x):
-    return x.add(var(1))
+    return x.add(const(1))
 
 def f_update_i(x):
-    return x.add(var(1))
+    return x.add(const(1))
 
 def f_update_y1(x):
-    return x.add(var(5.0))
+    return x.add(const(5.0))
 
 def f_update_x2(x):
-    return x.add(var(5.0))
+    return x.add(const(5.0))
 
 def compute_distance(x):
     x1 = x.select_from_index(1, index0)
@@ -146,27 +146,27 @@ def compute_distance(x):
 def f_assign_update_x1_left(x):
     x1 = x.select_from_index(1, index0)
     x_co = x.select_from_index(1, index1)
-    return x1.sub_l(x_co.mul(var(10.0)))
+    return x1.sub_l(x_co.mul(const(10.0)))
 
 def f_assign_update_x1_right(x):
     x1 = x.select_from_index(1, index0)
     x_co = x.select_from_index(1, index1)
-    return x1.add(x_co.mul(var(10.0)))
+    return x1.add(x_co.mul(const(10.0)))
 
 # i, x1, y1, x2, y2, distance, step, stage, x_co
 class Program(nn.Module):
     def __init__(self, l, nn_mode='all'):
         super(Program, self).__init__()
-        self.critical_distance_square = var(212.0)
-        self.x_unit = var(10.0)
-        self.steps = var(15)
-        self.straight_speed = var(5.0)
-        self.cruise_bar = var(0.5)
-        self.left_bar = var(1.5)
-        self.straight_bar = var(2.5)
-        self.right_bar = var(3.5)
-        self.large_step = var(3)
-        self.small_step = var(2)
+        self.critical_distance_square = const(212.0)
+        self.x_unit = const(10.0)
+        self.steps = const(15)
+        self.straight_speed = const(5.0)
+        self.cruise_bar = const(0.5)
+        self.left_bar = const(1.5)
+        self.straight_bar = const(2.5)
+        self.right_bar = const(3.5)
+        self.large_step = const(3)
+        self.small_step = const(2)
 
         self.nn_left = LinearReLU(l=l)
         self.nn_right = LinearReLU(l=l)
@@ -49,16 +49,8 @@ def initialize_components(abstract_states):
         padding_y1 = padding_y1.cuda()
     # TODO
     input_center, input_width = center[:, :1], width[:, :1]
-    states = {
-        'x': domain.Box(torch.cat((padding, input_center, padding_y1, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding), 1), \
-            torch.cat((padding, input_width, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding), 1)),
-        # 'trajectories': [[] for i in range(B)],
-        'trajectories_l': [[] for i in range(B)],
-        'trajectories_r': [[] for i in range(B)],
-        'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # use the log_p here, so start from 0.0
-        'alpha_list': [var(1.0) for i in range(B)],
-    }
+    states = initialize_states(domain.Box(torch.cat((padding, input_center, padding_y1, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding), 1), \
+        torch.cat((padding, input_width, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding), 1)))
 
     return states
 
@@ -79,16 +71,8 @@ def initialization_components_point(x_l=None, x_r=None):
     
     # input_center[0], input_width[0] = 12.0, 0.0
     # input_center[1], input_width[1] = 12.5, 0.001
-    states = {
-        'x': domain.Box(torch.cat((padding, input_center, padding_y1, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding), 1), \
-            torch.cat((padding, input_width, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding), 1)),
-        # 'trajectories': [[] for i in range(B)],
-        'trajectories_l': [[] for i in range(B)],
-        'trajectories_r': [[] for i in range(B)],
-        'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
-    }
+    states = initialize_states(domain.Box(torch.cat((padding, input_center, padding_y1, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding), 1), \
+        torch.cat((padding, input_width, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding, padding), 1)))
 
     return states
 
@@ -120,14 +104,14 @@ def f_test(x):
     return x
 
 def f_update_i(x):
-    return x.add(var(1))
+    return x.add(const(1))
 
 def f_update_y1(x):
-    return x.add(var(5.0))
+    return x.add(const(5.0))
 
 def f_update_x2(x):
     # print(f"c: {x.c}, delta: {x.delta}")
-    res = x.add(var(5.0))
+    res = x.add(const(5.0))
     # print(f"res c: {res.c}, res delta: {res.delta}")
     return res
 
@@ -139,19 +123,19 @@ def compute_distance(x):
     return ((x1.sub_l(x2)).mul(x1.sub_l(x2))).add((y1.sub_l(y2)).mul(y1.sub_l(y2)))
 
 def f_assign_update_x1_left(x):
-    return x.sub_l(var(5.0))
+    return x.sub_l(const(5.0))
 
 def f_assign_update_x1_right(x):
-    return x.add(var(5.0))
+    return x.add(const(5.0))
 
 def f_assign_stage0(x):
-    return x.set_value(var(0.0))
+    return x.set_value(const(0.0))
 def f_assign_stage1(x):
-    return x.set_value(var(1.0))
+    return x.set_value(const(1.0))
 def f_assign_stage2(x):
-    return x.set_value(var(2.0))
+    return x.set_value(const(2.0))
 def f_assign_stage3(x):
-    return x.set_value(var(3.0))
+    return x.set_value(const(3.0))
 
 def f_assign_sub(x):
     l = x.select_from_index(1, index0)
@@ -163,9 +147,9 @@ def f_assign_sub(x):
 class Program(nn.Module):
     def __init__(self, l, nn_mode='all'):
         super(Program, self).__init__()
-        self.steps = var(15)
-        self.comparison_bar = var(0.0)
-        self.straight_speed = var(5.0)
+        self.steps = const(15)
+        self.comparison_bar = const(0.0)
+        self.straight_speed = const(5.0)
 
         self.nn_classifier = LinearReLU(l=l)
         self.skip = Skip()
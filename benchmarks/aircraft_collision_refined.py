@@ -54,8 +54,8 @@ def initialize_components(abstract_states):
             torch.cat((padding, input_width, padding, padding, padding, padding, padding, padding, padding), 1)),
         'trajectories': [[] for i in range(B)],
         'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # use the log_p here, so start from 0.0
-        'alpha_list': [var(1.0) for i in range(B)],
+        'p_list': [const(0.0) for i in range(B)], # use the log_p here, so start from 0.0
+        'alpha_list': [const(1.0) for i in range(B)],
     }
 
     return states
@@ -77,8 +77,8 @@ def initialization_components_point():
             torch.cat((padding, input_width, padding, padding, padding, padding, padding, padding, padding), 1)),
         'trajectories': [[] for i in range(B)],
         'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
+        'p_list': [const(0.0) for i in range(B)], # might be changed to batch
+        'alpha_list': [const(1.0) for i in range(B)],
     }
 
     return states
@@ -110,13 +110,13 @@ def f_test(x):
     return x
 
 def f_update_i(x):
-    return x.add(var(1))
+    return x.add(const(1))
 
 def f_update_y1(x):
-    return x.add(var(5.0))
+    return x.add(const(5.0))
 
 def f_update_x2(x):
-    return x.add(var(5.0))
+    return x.add(const(5.0))
 
 def compute_distance(x):
     x1 = x.select_from_index(1, index0)
@@ -126,21 +126,21 @@ def compute_distance(x):
     return ((x1.sub_l(x2)).mul(x1.sub_l(x2))).add((y1.sub_l(y2)).mul(y1.sub_l(y2)))
 
 def f_assign_update_x1_left(x):
-    return x.sub_l(var(5.0))
+    return x.sub_l(const(5.0))
 
 def f_assign_update_x1_right(x):
-    return x.add(var(5.0))
+    return x.add(const(5.0))
 
 # i, x1, y1, x2, y2, distance, step, stage, x_co
 class Program(nn.Module):
     def __init__(self, l, nn_mode='all'):
         super(Program, self).__init__()
-        self.steps = var(15)
-        self.straight_speed = var(5.0)
-        self.cruise_bar = var(0.25)
-        self.left_bar = var(0.5)
-        self.straight_bar = var(0.75)
-        self.right_bar = var(1.0)
+        self.steps = const(15)
+        self.straight_speed = const(5.0)
+        self.cruise_bar = const(0.25)
+        self.left_bar = const(0.5)
+        self.straight_bar = const(0.75)
+        self.right_bar = const(1.0)
 
         self.nn_control = LinearReLU(l=l)
         self.skip = Skip()
@@ -54,8 +54,8 @@ def initialize_components(abstract_states):
             torch.cat((padding, input_width, padding, padding, padding, padding, padding, padding, padding, padding, padding), 1)),
         'trajectories': [[] for i in range(B)],
         'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # use the log_p here, so start from 0.0
-        'alpha_list': [var(1.0) for i in range(B)],
+        'p_list': [const(0.0) for i in range(B)], # use the log_p here, so start from 0.0
+        'alpha_list': [const(1.0) for i in range(B)],
     }
 
     return states
@@ -77,8 +77,8 @@ def initialization_components_point():
             torch.cat((padding, input_width, padding, padding, padding, padding, padding, padding, padding, padding, padding), 1)),
         'trajectories': [[] for i in range(B)],
         'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
+        'p_list': [const(0.0) for i in range(B)], # might be changed to batch
+        'alpha_list': [const(1.0) for i in range(B)],
     }
 
     return states
@@ -110,14 +110,14 @@ def f_test(x):
     return x
 
 def f_update_i(x):
-    return x.add(var(1))
+    return x.add(const(1))
 
 def f_update_y1(x):
-    return x.add(var(5.0))
+    return x.add(const(5.0))
 
 def f_update_x2(x):
     # print(f"c: {x.c}, delta: {x.delta}")
-    res = x.add(var(5.0))
+    res = x.add(const(5.0))
     # print(f"res c: {res.c}, res delta: {res.delta}")
     return res
 
@@ -129,26 +129,26 @@ def compute_distance(x):
     return ((x1.sub_l(x2)).mul(x1.sub_l(x2))).add((y1.sub_l(y2)).mul(y1.sub_l(y2)))
 
 def f_assign_update_x1_left(x):
-    return x.sub_l(var(5.0))
+    return x.sub_l(const(5.0))
 
 def f_assign_update_x1_right(x):
-    return x.add(var(5.0))
+    return x.add(const(5.0))
 
 def f_assign_stage0(x):
-    return x.set_value(var(0.0))
+    return x.set_value(const(0.0))
 def f_assign_stage1(x):
-    return x.set_value(var(1.0))
+    return x.set_value(const(1.0))
 def f_assign_stage2(x):
-    return x.set_value(var(2.0))
+    return x.set_value(const(2.0))
 def f_assign_stage3(x):
-    return x.set_value(var(3.0))
+    return x.set_value(const(3.0))
 
 # i, x1, y1, x2, y2, distance, step, stage, x_co
 class Program(nn.Module):
     def __init__(self, l, nn_mode='all'):
         super(Program, self).__init__()
-        self.steps = var(15)
-        self.straight_speed = var(5.0)
+        self.steps = const(15)
+        self.straight_speed = const(5.0)
 
         self.nn_classifier = LinearReLU(l=l)
         self.skip = Skip()
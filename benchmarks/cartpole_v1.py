@@ -52,16 +52,8 @@ def initialize_components(abstract_states):
     x_dot_center, x_dot_width = center[:, 1:2], width[:, 1:2]
     theta_center, theta_width = center[:, 2:3], width[:, 2:3]
     theta_dot_center, theta_dot_width = center[:, 3:], width[:, 3:]
-    states = {
-        'x': domain.Box(torch.cat((padding, x_center, x_dot_center, theta_center, theta_dot_center, padding, padding, padding, padding, padding, padding, padding), 1), \
-            torch.cat((padding, x_width, x_dot_width, theta_width, theta_dot_width, padding, padding, padding, padding, padding, padding, padding), 1)),
-        # 'trajectories': [[] for i in range(B)],
-        'trajectories_l': [[] for i in range(B)],
-        'trajectories_r': [[] for i in range(B)],
-        'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # use the log_p here, so start from 0.0
-        'alpha_list': [var(1.0) for i in range(B)],
-    }
+    states = initialize_states(domain.Box(torch.cat((padding, x_center, x_dot_center, theta_center, theta_dot_center, padding, padding, padding, padding, padding, padding, padding), 1), \
+        torch.cat((padding, x_width, x_dot_width, theta_width, theta_dot_width, padding, padding, padding, padding, padding, padding, padding), 1)))
 
     return states
 
@@ -90,16 +82,8 @@ def initialization_components_point(x_l=None, x_r=None):
     
     # input_center[0], input_width[0] = 12.0, 0.0
     # input_center[1], input_width[1] = 12.5, 0.001
-    states = {
-        'x': domain.Box(torch.cat((padding, x_center, x_dot_center, theta_center, theta_dot_center, padding, padding, padding, padding, padding, padding, padding), 1), \
-            torch.cat((padding, x_width, x_dot_width, theta_width, theta_dot_width, padding, padding, padding, padding, padding, padding, padding), 1)),
-        # 'trajectories': [[] for i in range(B)],
-        'trajectories_l': [[] for i in range(B)],
-        'trajectories_r': [[] for i in range(B)],
-        'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
-    }
+    states = initialize_states(domain.Box(torch.cat((padding, x_center, x_dot_center, theta_center, theta_dot_center, padding, padding, padding, padding, padding, padding, padding), 1), \
+        torch.cat((padding, x_width, x_dot_width, theta_width, theta_dot_width, padding, padding, padding, padding, padding, padding, padding), 1)))
 
     return states
 
@@ -131,12 +115,12 @@ def f_test(x):
     return x
 
 def f_update_i(x):
-    return x.add(var(1))
+    return x.add(const(1))
 
 def f_assign_neg_force(x):
-    return x.set_value(var(-10.0))
+    return x.set_value(const(-10.0))
 def f_assign_pos_force(x):
-    return x.set_value(var(10.0))
+    return x.set_value(const(10.0))
 def f_assign_costheta(x):
     return x.cos()
 def f_assign_sintheta(x):
@@ -145,36 +129,36 @@ def f_assign_temp(x):
     force = x.select_from_index(1, index0)
     theta_dot = x.select_from_index(1, index1)
     sintheta = x.select_from_index(1, index2)
-    return (force.add(sintheta.mul(theta_dot).mul(theta_dot).mul(var(0.05)))).mul(var(1.0/1.1))
+    return (force.add(sintheta.mul(theta_dot).mul(theta_dot).mul(const(0.05)))).mul(const(1.0/1.1))
 def f_assign_thetaacc(x):
     sintheta = x.select_from_index(1, index0)
     costheta = x.select_from_index(1, index1)
     temp = x.select_from_index(1, index2)
     costheta_square = costheta.abs().mul(costheta.abs())
-    upper = (sintheta.mul(var(9.8)).sub_l(costheta.mul(temp))).mul(var(2))
-    down = costheta_square.mul(var(0.1/1.1)).sub_r(var(4/3))
-    return upper.mul(down.div(var(1.0)))
+    upper = (sintheta.mul(const(9.8)).sub_l(costheta.mul(temp))).mul(const(2))
+    down = costheta_square.mul(const(0.1/1.1)).sub_r(const(4/3))
+    return upper.mul(down.div(const(1.0)))
 def f_assign_xacc(x):
     temp = x.select_from_index(1, index0)
     thetaacc = x.select_from_index(1, index1)
     costheta = x.select_from_index(1, index2)
-    return temp.sub_l(thetaacc.mul(costheta).mul(var(0.05/1.1)))
+    return temp.sub_l(thetaacc.mul(costheta).mul(const(0.05/1.1)))
 def f_assign_x(x):
     a = x.select_from_index(1, index0)
     x_dot = x.select_from_index(1, index1)
-    return a.add(x_dot.mul(var(0.02)))
+    return a.add(x_dot.mul(const(0.02)))
 def f_assign_x_dot(x):
     x_dot = x.select_from_index(1, index0)
     xacc = x.select_from_index(1, index1)
-    return x_dot.add(xacc.mul(var(0.02)))
+    return x_dot.add(xacc.mul(const(0.02)))
 def f_assign_theta(x):
     theta = x.select_from_index(1, index0)
     theta_dot = x.select_from_index(1, index1)
-    return theta.add(theta_dot.mul(var(0.02)))
+    return theta.add(theta_dot.mul(const(0.02)))
 def f_assign_theta_dot(x):
     theta_dot = x.select_from_index(1, index0)
     thetaacc = x.select_from_index(1, index1)
-    return theta_dot.add(thetaacc.mul(var(0.02)))
+    return theta_dot.add(thetaacc.mul(const(0.02)))
 
 
 # i, x, x_dot, theta, theta_dot, costheta, sintheta, action, force, temp, thetaacc, xacc 
@@ -182,8 +166,8 @@ def f_assign_theta_dot(x):
 class Program(nn.Module):
     def __init__(self, l, nn_mode='all'):
         super(Program, self).__init__()
-        self.steps = var(10)
-        self.comparison_bar = var(0.5)
+        self.steps = const(10)
+        self.comparison_bar = const(0.5)
         self.nn_classifier = LinearReLU(l=l)
 
         self.skip = Skip()
@@ -50,8 +50,8 @@ def initialize_components(abstract_states):
         'x': domain.Box(torch.cat((input_center, padding, padding, padding), 1), torch.cat((input_width, padding, padding, padding), 1)),
         'trajectories': [[] for i in range(B)],
         'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
+        'p_list': [const(0.0) for i in range(B)], # might be changed to batch
+        'alpha_list': [const(1.0) for i in range(B)],
     }
 
     return states
@@ -70,8 +70,8 @@ def initialization_components_point():
         'x': domain.Box(torch.cat((input_center, padding, padding, padding), 1), torch.cat((input_width, padding, padding, padding), 1)),
         'trajectories': [[] for i in range(B)],
         'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
+        'p_list': [const(0.0) for i in range(B)], # might be changed to batch
+        'alpha_list': [const(1.0) for i in range(B)],
     }
 
     return states
@@ -181,19 +181,19 @@ class LinearComplex(nn.Module):
         return res
 
 def f_assign_min_p(x):
-    return x.set_value(var(-1.2))
+    return x.set_value(const(-1.2))
 
 def f_assign_min_v(x):
-    return x.set_value(var(0.0))
+    return x.set_value(const(0.0))
 
 def f_assign_min_speed(x):
-    return x.set_value(var(-0.07))
+    return x.set_value(const(-0.07))
 
 def f_assign_max_speed(x):
-    return x.set_value(var(0.07))
+    return x.set_value(const(0.07))
 
 def f_assign_reset_acc(x):
-    return x.set_value(var(0.0))
+    return x.set_value(const(0.0))
 
 def f_assign_update_p(x):
     return x.select_from_index(1, index0).add(x.select_from_index(1, index1))
@@ -204,16 +204,16 @@ def f_assign_v(x):
     v = x.select_from_index(1, index1)
     u = x.select_from_index(1, index2)
     # TODO: cos
-    return v.add(u.mul(var(0.0015))).add(p.mul(var(3.0)).cos().mul(var(-0.0025)))
+    return v.add(u.mul(const(0.0015))).add(p.mul(const(3.0)).cos().mul(const(-0.0025)))
 
 
 class Program(nn.Module):
     def __init__(self, l, nn_mode='all'):
         super(Program, self).__init__()
-        self.goal_position = var(0.5)
-        self.min_position = var(-1.2)
-        self.min_speed = var(-0.07)
-        self.max_speed = var(0.07)
+        self.goal_position = const(0.5)
+        self.min_position = const(-1.2)
+        self.min_speed = const(-0.07)
+        self.max_speed = const(0.07)
         
         if nn_mode == 'complex':
             self.nn = LinearComplex(l=l)
@@ -89,22 +89,22 @@ class LinearNNComplex(nn.Module):
 
 
 def f_assign_h_update(x):
-    return x.add(var(0.2))
+    return x.add(const(0.2))
 
 def f_assign_i_update(x):
-    return x.add(var(1.0))
+    return x.add(const(1.0))
 
 def f_assign_h_increase(x):
-    return x.mul(var(2.0)).add(var(1.0))
+    return x.mul(const(2.0)).add(const(1.0))
 
 # input order: 0:h0, 1:bound, 2:count, 3:tmp_h_1, 4:tmp_h_2
 class Program(nn.Module):
     def __init__(self, l=1, nn_mode="complex"):
         super(Program, self).__init__()
-        self.goal_iteration = var(50.0)
-        self.bar1 = var(3.0)
-        self.bar2 = var(5.0)
-        self.bar3 = var(2.5)
+        self.goal_iteration = const(50.0)
+        self.bar1 = const(3.0)
+        self.bar2 = const(5.0)
+        self.bar3 = const(2.5)
 
         # simple version
         if nn_mode == "simple":
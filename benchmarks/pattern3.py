@@ -50,14 +50,7 @@ def initialize_components(abstract_states):
         padding = padding.cuda()
     
     input_center, input_width = center[:, :1], width[:, :1]
-    states = {
-        'x': domain.Box(torch.cat((input_center, padding, padding), 1), torch.cat((input_width, padding, padding), 1)),
-        'trajectories_l': [[] for i in range(B)],
-        'trajectories_r': [[] for i in range(B)],
-        'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
-    }
+    states = initialize_states(domain.Box(torch.cat((input_center, padding, padding), 1), torch.cat((input_width, padding, padding), 1)))
 
     return states
 
@@ -71,14 +64,7 @@ def initialization_components_point():
         input_width = input_width.cuda()
     
     input_center[0], input_width[0] = 1.0, 0.0
-    states = {
-        'x': domain.Box(torch.cat((input_center, padding, padding), 1), torch.cat((input_width, padding, padding), 1)),
-        'trajectories_l': [[] for i in range(B)],
-        'trajectories_r': [[] for i in range(B)],
-        'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
-    }
+    states = initialize_states(domain.Box(torch.cat((input_center, padding, padding), 1), torch.cat((input_width, padding, padding), 1)))
 
     return states
 
@@ -125,7 +111,7 @@ def f_assign_max_z(x):
 class Program(nn.Module):
     def __init__(self, l=1, nn_mode="simple"):
         super(Program, self).__init__()
-        self.bar = var(1.0)
+        self.bar = const(1.0)
         if nn_mode == "simple":
             self.nn = LinearNN(l=l)
         if nn_mode == "complex":
@@ -54,8 +54,8 @@ def initialize_components(abstract_states):
         'x': domain.Box(torch.cat((input_center, padding, padding), 1), torch.cat((input_width, padding, padding), 1)),
         'trajectories': [[] for i in range(B)],
         'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
+        'p_list': [const(0.0) for i in range(B)], # might be changed to batch
+        'alpha_list': [const(1.0) for i in range(B)],
     }
 
     return states
@@ -74,8 +74,8 @@ def initialization_components_point():
         'x': domain.Box(torch.cat((input_center, padding, padding), 1), torch.cat((input_width, padding, padding), 1)),
         'trajectories': [[] for i in range(B)],
         'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
+        'p_list': [const(0.0) for i in range(B)], # might be changed to batch
+        'alpha_list': [const(1.0) for i in range(B)],
     }
 
     return states
@@ -111,11 +111,11 @@ class LinearNNComplex(nn.Module):
 def f_assign_min_z(x):
     # return x.set_value(min_v)
     # return x.sub_l(var(3.0))
-    return x.mul(var(-1.0))
+    return x.mul(const(-1.0))
 
 
 def f_assign_max_z(x):
-    return x.add(var(2.0))
+    return x.add(const(2.0))
     # return x.sub_r(var(1.0))
     # return x.mul(var(-1.0)).sub_l(var(1.0))
     # return x.mul(x).mul(var(-1.0)).sub_l(var(1.0))
@@ -125,11 +125,11 @@ def f_assign_max_z(x):
 def f_assign_min_z(x):
     # return x.set_value(min_v)
     # return x.sub_l(var(3.0))
-    return x.mul(var(-1.0))
+    return x.mul(const(-1.0))
 
 
 def f_assign_max_z(x):
-    return x.add(var(2.0))
+    return x.add(const(2.0))
     # return x.sub_r(var(1.0))
     # return x.mul(var(-1.0)).sub_l(var(1.0))
     # return x.mul(x).mul(var(-1.0)).sub_l(var(1.0))
@@ -140,7 +140,7 @@ def f_assign_max_z(x):
 class Program(nn.Module):
     def __init__(self, l=1, nn_mode="simple"):
         super(Program, self).__init__()
-        self.bar = var(0.0)
+        self.bar = const(0.0)
         if nn_mode == "simple":
             self.nn = LinearNN(l=l)
         if nn_mode == "complex":
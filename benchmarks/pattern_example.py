@@ -51,14 +51,7 @@ def initialize_components(abstract_states):
         padding = padding.cuda()
     
     input_center, input_width = center[:, :1], width[:, :1]
-    states = {
-        'x': domain.Box(torch.cat((input_center, padding, padding, padding, padding), 1), torch.cat((input_width, padding, padding, padding, padding), 1)),
-        'trajectories_l': [[] for i in range(B)],
-        'trajectories_r': [[] for i in range(B)],
-        'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
-    }
+    states = initialize_states(domain.Box(torch.cat((input_center, padding, padding, padding, padding), 1), torch.cat((input_width, padding, padding, padding, padding), 1)))
 
     return states
 
@@ -72,14 +65,7 @@ def initialization_components_point():
         input_width = input_width.cuda()
     
     input_center[0], input_width[0] = 1.0, 0.0
-    states = {
-        'x': domain.Box(torch.cat((input_center, padding, padding, padding, padding), 1), torch.cat((input_width, padding, padding, padding, padding), 1)),
-        'trajectories_l': [[] for i in range(B)],
-        'trajectories_r': [[] for i in range(B)],
-        'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
-    }
+    states = initialize_states(domain.Box(torch.cat((input_center, padding, padding, padding, padding), 1), torch.cat((input_width, padding, padding, padding, padding), 1)))
 
     return states
 
@@ -87,7 +73,7 @@ def f_test(x):
     return x
 
 def f_update_i(x):
-    return x.add(var(1))
+    return x.add(const(1))
 
 
 class LinearNN(nn.Module):
@@ -121,18 +107,18 @@ class LinearNNComplex(nn.Module):
         return res
 
 def f_assign_min_z(x):
-    return x.select_from_index(1, index0).sub_l(var(5.0))
+    return x.select_from_index(1, index0).sub_l(const(5.0))
     # return x.select_from_index(1, index0)
 
 def f_assign_max_z(x):
-    return x.select_from_index(1, index0).add(var(10.0))# .add(x.select_from_index(1, index1)) # mul(var(-1))
+    return x.select_from_index(1, index0).add(const(10.0))# .add(x.select_from_index(1, index1)) # mul(const(-1))
 
 # input order: x, y, z, i, acc
 class Program(nn.Module):
     def __init__(self, l=1, nn_mode="simple"):
         super(Program, self).__init__()
-        self.bar = var(1.0)
-        self.steps = var(0) # here the loop condition is <= N, therefore, steps==1 -> 2 steps executed
+        self.bar = const(1.0)
+        self.steps = const(0) # here the loop condition is <= N, therefore, steps==1 -> 2 steps executed
         if nn_mode == "simple":
             self.nn = LinearNN(l=l)
         if nn_mode == "complex":
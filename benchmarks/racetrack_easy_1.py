@@ -55,8 +55,8 @@ def initialize_components(abstract_states):
         'x': domain.Box(torch.cat((input_center, padding, padding, padding), 1), torch.cat((input_width, padding, padding, padding), 1)),
         'trajectories': [[] for i in range(B)],
         'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
+        'p_list': [const(0.0) for i in range(B)], # might be changed to batch
+        'alpha_list': [const(1.0) for i in range(B)],
     }
 
     return states
@@ -75,8 +75,8 @@ def initialization_components_point():
         'x': domain.Box(torch.cat((input_center, padding, padding, padding), 1), torch.cat((input_width, padding, padding, padding), 1)),
         'trajectories': [[] for i in range(B)],
         'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
+        'p_list': [const(0.0) for i in range(B)], # might be changed to batch
+        'alpha_list': [const(1.0) for i in range(B)],
     }
 
     return states
@@ -112,23 +112,23 @@ class LinearNNComplex(nn.Module):
 
 
 def f_move_down(x):
-    return x.sub_l(var(1.0))
+    return x.sub_l(const(1.0))
 def f_move_right(x):
     return x
 def f_move_up(x):
-    return x.add(var(1.0))
+    return x.add(const(1.0))
 
 def f_forward(x): # y += 1
-    return x.add(var(1.0))
+    return x.add(const(1.0))
 def f_step_update(x):
-    return x.add(var(1.0))
+    return x.add(const(1.0))
 
 class Program(nn.Module):
     def __init__(self, l=1, nn_mode="simple"):
         super(Program, self).__init__()
-        self.step = var(19)
-        self.down_bar = var(0.25)
-        self.up_bar = var(0.75)
+        self.step = const(19)
+        self.down_bar = const(0.25)
+        self.up_bar = const(0.75)
         if nn_mode == "simple":
             self.nn = LinearNN(l=l)
         if nn_mode == "complex":
@@ -51,15 +51,8 @@ def initialize_components(abstract_states):
         padding = padding.cuda()
     
     input_center, input_width = center[:, :1], width[:, :1]
-    states = {
-        'x': domain.Box(torch.cat((input_center, padding, padding, padding, padding, padding, padding, padding, padding), 1), \
-             torch.cat((input_width, padding, padding, padding, padding, padding, padding, padding, padding), 1)),
-        'trajectories_l': [[] for i in range(B)],
-        'trajectories_r': [[] for i in range(B)],
-        'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
-    }
+    states = initialize_states(domain.Box(torch.cat((input_center, padding, padding, padding, padding, padding, padding, padding, padding), 1), \
+         torch.cat((input_width, padding, padding, padding, padding, padding, padding, padding, padding), 1)))
 
     return states
 
@@ -86,16 +79,8 @@ def initialization_components_point(x_l=None, x_r=None):
     # input_center[2], input_width[2] = 5.0, 0.0005
     # input_center[4], input_width[4] = 4.001, 0.0
 
-    states = {
-        'x': domain.Box(torch.cat((input_center, padding, padding, padding, padding, padding, padding, padding, padding), 1), \
-            torch.cat((input_width, padding, padding, padding, padding, padding, padding, padding, padding), 1)),
-        # 'trajectories': [[] for i in range(B)],
-        'trajectories_l': [[] for i in range(B)],
-        'trajectories_r': [[] for i in range(B)],
-        'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
-    }
+    states = initialize_states(domain.Box(torch.cat((input_center, padding, padding, padding, padding, padding, padding, padding, padding), 1), \
+        torch.cat((input_width, padding, padding, padding, padding, padding, padding, padding, padding), 1)))
 
     return states
 
@@ -133,16 +118,16 @@ class LinearNNComplex(nn.Module):
 
 
 def f_move_down(x): #  x -= 1
-    return x.sub_l(var(1.0))
+    return x.sub_l(const(1.0))
 def f_move_right(x):
     return x
 def f_move_up(x): # x += 1
-    return x.add(var(1.0))
+    return x.add(const(1.0))
 
 def f_forward(x): # y += 1
-    return x.add(var(1.0))
+    return x.add(const(1.0))
 def f_step_update(x):
-    return x.add(var(1.0))
+    return x.add(const(1.0))
 
 def f_assign_a(x):
     p0 = x.select_from_index(1, index0)
@@ -162,8 +147,8 @@ def f_assign_c(x):
 class Program(nn.Module):
     def __init__(self, l=1, nn_mode="simple"):
         super(Program, self).__init__()
-        self.step = var(19)
-        self.comparison_bar = var(0.0)
+        self.step = const(19)
+        self.comparison_bar = const(0.0)
         if nn_mode == "simple":
             self.nn = LinearNN(l=l)
         if nn_mode == "complex":
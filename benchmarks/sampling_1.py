@@ -74,25 +74,25 @@ class LinearNNComplex(nn.Module):
 
 
 def f_assign_p0(x):
-    return x.set_value(var(0.2))
+    return x.set_value(const(0.2))
 
 def f_assign_p1(x):
-    return x.set_value(var(0.8))
+    return x.set_value(const(0.8))
 
 def f_assign_max_y(x):
-    return x.set_value(var(10.0))
+    return x.set_value(const(10.0))
 
 
 def f_assign_min_y(x):
-    return x.set_value(var(1.0))
+    return x.set_value(const(1.0))
 
 
 class Program(nn.Module):
     def __init__(self, l=1, nn_mode="complex"):
         super(Program, self).__init__()
-        self.bar = var(0.5)
-        self.max_z = var(10.0)
-        self.min_z = var(1.0)
+        self.bar = const(0.5)
+        self.max_z = const(10.0)
+        self.min_z = const(1.0)
         self.sample_population = [0, 1]
         # simple version
         if nn_mode == "simple":
@@ -73,25 +73,25 @@ class LinearNNComplex(nn.Module):
 
 
 def f_assign_p_gender(x):
-    return x.set_value(var(0.5))
+    return x.set_value(const(0.5))
 
 def f_assign_not_p_gender(x):
-    return x.set_value(var(0.5))
+    return x.set_value(const(0.5))
 
 def f_assign_non_colRank(x):
-    return x.set_value(var(1.0))
+    return x.set_value(const(1.0))
 
 def f_assign_p_colRank(x):
-    return x.set_value(var(0.5))
+    return x.set_value(const(0.5))
 
 def f_assign_not_p_colRank(x):
-    return x.set_value(var(0.5))
+    return x.set_value(const(0.5))
 
 def f_assign_real_hire(x):
-    return x.set_value(var(1.0))
+    return x.set_value(const(1.0))
 
 def f_assign_false_hire(x):
-    return x.set_value(var(0.0))
+    return x.set_value(const(0.0))
 
 # input order: 
 # 0:yExp, 
@@ -106,13 +106,13 @@ def f_assign_false_hire(x):
 class Program(nn.Module):
     def __init__(self, l=1, nn_mode="simple"):
         super(Program, self).__init__()
-        self.p_gender = var(0.5)
+        self.p_gender = const(0.5)
         self.not_p_gender = 1 - self.p_gender
-        self.p_colRank = var(0.5)
+        self.p_colRank = const(0.5)
         self.not_p_colRank = 1 - self.p_colRank
-        self.gender_bar = var(0.5)
-        self.colRank_bar = var(0.5)
-        self.expRank_bar = var(1.8)
+        self.gender_bar = const(0.5)
+        self.colRank_bar = const(0.5)
+        self.expRank_bar = const(1.8)
         self.sample_population = [0, 1]
         if nn_mode == "simple":
             self.nn = LinearNN(l=l)
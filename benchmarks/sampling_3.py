@@ -58,23 +58,23 @@ class LinearNN(nn.Module):
 
 
 def f_assign_p1(x):
-    return x.sub_r(var(1.0))
+    return x.sub_r(const(1.0))
 
 
 def f_assign_max_y(x):
-    return x.set_value(var(10.0))
+    return x.set_value(const(10.0))
 
 
 def f_assign_min_y(x):
-    return x.set_value(var(1.0))
+    return x.set_value(const(1.0))
 
 
 class Program(nn.Module):
     def __init__(self, l=1):
         super(Program, self).__init__()
-        self.bar = var(0.5)
-        self.max_y = var(10.0)
-        self.min_y = var(1.0)
+        self.bar = const(0.5)
+        self.max_y = const(10.0)
+        self.min_y = const(1.0)
         self.sample_population = [0, 1]
         self.nn = LinearNN(l=l)
 
@@ -54,8 +54,8 @@ def initialize_components(abstract_states):
         'x': domain.Box(torch.cat((padding, padding, input_center, input_center), 1), torch.cat((padding, padding, input_width, input_width), 1)),
         'trajectories': [[] for i in range(B)],
         'idx_list': [i for i in range(B)],
-        'p_list': [var(1.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
+        'p_list': [const(1.0) for i in range(B)], # might be changed to batch
+        'alpha_list': [const(1.0) for i in range(B)],
     }
 
     return states
@@ -74,22 +74,22 @@ def initialization_components_point():
         'x': domain.Box(torch.cat((input_center, padding, padding, padding), 1), torch.cat((input_width, padding, padding, padding), 1)),
         'trajectories': [[] for i in range(B)],
         'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
+        'p_list': [const(0.0) for i in range(B)], # might be changed to batch
+        'alpha_list': [const(1.0) for i in range(B)],
     }
 
     return states
 
 
 def f_isOn(x):
-    return x[1].setValue(var(1.0))
+    return x[1].setValue(const(1.0))
 
 def f_notisOn(x):
-    return x[1].setValue(var(0.0))
+    return x[1].setValue(const(0.0))
 
 def f_up_temp(x):
     # x = x - 0.1*(x-lin) + 5.0
-    return x.select_from_index(0, index0).sub_l((x.select_from_index(0, index1).sub_l(x.select_from_index(0, index1))).mul(var(0.1))).add(var(5.0))
+    return x.select_from_index(0, index0).sub_l((x.select_from_index(0, index1).sub_l(x.select_from_index(0, index1))).mul(const(0.1))).add(const(5.0))
 
 def f_test_first(x):
     return x[0]
@@ -123,7 +123,7 @@ class LinearReLU(nn.Module):
 def f_wrap_up_tmp_down_nn(nn):
     def f_tmp_down_nn(x):
         # print(f"nn, before: {x.c, x.delta}")
-        x_input = x.div(var(70.0))
+        x_input = x.div(const(70.0))
         # print(f"nn, before: {x_input.c, x_input.delta}")
         plant = nn(x_input)
         # print(f"nn, after: {plant.c, plant.delta}")
@@ -136,16 +136,16 @@ def f_wrap_up_tmp_down_nn(nn):
 def f_wrap_up_tmp_up_nn(nn):
     def f_tmp_up_nn(x):
         # print(f"nn, before: {x.c, x.delta}")
-        x_input = x.div(var(70.0))
+        x_input = x.div(const(70.0))
         plant = nn(x_input)
         # print(f"nn, after: {plant.c, plant.delta}")
-        return x.select_from_index(1, index0).sub_l(plant).add(var(10.0))
+        return x.select_from_index(1, index0).sub_l(plant).add(const(10.0))
     return f_tmp_up_nn
 
 
 # can not pickle local object
 def f_ifelse_tOn_block1(x):
-    return x.set_value(var(1.0))
+    return x.set_value(const(1.0))
 
 def f_test(x):
     return x
@@ -154,17 +154,17 @@ def f_assign2_single(x):
     return f_up_temp(x)
 
 def f_ifelse_tOff_block2(x):
-    return x.set_value(var(0.0))
+    return x.set_value(const(0.0))
 
 def assign_update(x):
-    return x.add(var(1.0))
+    return x.add(const(1.0))
 
 
 class Program(nn.Module):
     def __init__(self, l, nn_mode='all'):
         super(Program, self).__init__()
-        self.tOff = var(78.0)
-        self.tOn = var(66.0)
+        self.tOff = const(78.0)
+        self.tOn = const(66.0)
         # balance temperature: 70.0
 
         self.nn = LinearReLU(l=l)
@@ -173,7 +173,7 @@ class Program(nn.Module):
         self.assign1 = Assign(target_idx=[2], arg_idx=[2, 3], f=f_wrap_up_tmp_down_nn(self.nn))
 
         # TODO: empty select index works?
-        self.ifelse_tOn_block1 = Assign(target_idx=[1], arg_idx=[1], f=f_ifelse_tOn_block1)# f=lambda x: (x.set_value(var(1.0)), var(1.0)))
+        self.ifelse_tOn_block1 = Assign(target_idx=[1], arg_idx=[1], f=f_ifelse_tOn_block1)# f=lambda x: (x.set_value(const(1.0)), const(1.0)))
         self.ifelse_tOn_block2 = Skip()
         self.ifelse_tOn = IfElse(target_idx=[2], test=self.tOn, f_test=f_test, body=self.ifelse_tOn_block1, orelse=self.ifelse_tOn_block2)
         self.ifblock1 = nn.Sequential(
@@ -184,7 +184,7 @@ class Program(nn.Module):
         self.assign2 = Assign(target_idx=[2], arg_idx=[2, 3], f=f_wrap_up_tmp_up_nn(self.nn))
 
         self.ifelse_tOff_block1 = Skip()
-        self.ifelse_tOff_block2 = Assign(target_idx=[1], arg_idx=[1], f=f_ifelse_tOff_block2)# f=lambda x: (x.set_value(var(0.0)), var(1.0)))
+        self.ifelse_tOff_block2 = Assign(target_idx=[1], arg_idx=[1], f=f_ifelse_tOff_block2)# f=lambda x: (x.set_value(const(0.0)), const(1.0)))
         self.ifelse_tOff = IfElse(target_idx=[2], test=self.tOff, f_test=f_test, body=self.ifelse_tOff_block1, orelse=self.ifelse_tOff_block2)
 
         self.ifblock2 = nn.Sequential(
@@ -192,7 +192,7 @@ class Program(nn.Module):
             self.ifelse_tOff,  # if x <= tOff: skip else: isOn=0.0
         )
 
-        self.ifelse_isOn = IfElse(target_idx=[1], test=var(0.5), f_test=f_test, body=self.ifblock1, orelse=self.ifblock2)
+        self.ifelse_isOn = IfElse(target_idx=[1], test=const(0.5), f_test=f_test, body=self.ifblock1, orelse=self.ifblock2)
         self.assign_update = Assign(target_idx=[0], arg_idx=[0], f=assign_update)
         self.trajectory_update = Trajectory(target_idx=[2])
         self.whileblock = nn.Sequential(
@@ -200,7 +200,7 @@ class Program(nn.Module):
             self.assign_update,
             self.trajectory_update,
         )
-        self.program = While(target_idx=[0], test=var(40.0), body=self.whileblock)
+        self.program = While(target_idx=[0], test=const(40.0), body=self.whileblock)
     
     def forward(self, input, version=None):
         # if transition == 'abstract':
@@ -50,15 +50,7 @@ def initialize_components(abstract_states):
         padding = padding.cuda()
     
     input_center, input_width = center[:, :1], width[:, :1]
-    states = {
-        'x': domain.Box(torch.cat((padding, input_center, input_center, padding), 1), torch.cat((padding, input_width, input_width, padding), 1)),
-        # 'trajectories': [[] for i in range(B)],
-        'trajectories_l': [[] for i in range(B)],
-        'trajectories_r': [[] for i in range(B)],
-        'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
-    }
+    states = initialize_states(domain.Box(torch.cat((padding, input_center, input_center, padding), 1), torch.cat((padding, input_width, input_width, padding), 1)))
 
     return states
 
@@ -77,28 +69,20 @@ def initialization_components_point(x_l=None, x_r=None):
     
     # input_center[0], input_width[0] = 60.5, 0.0
     # input_center[1], input_width[1] = 60.5, 0.001
-    states = {
-        'x': domain.Box(torch.cat((padding, input_center, input_center, padding), 1), torch.cat((padding, input_width, input_width, padding), 1)),
-        # 'trajectories': [[] for i in range(B)],
-        'trajectories_l': [[] for i in range(B)],
-        'trajectories_r': [[] for i in range(B)],
-        'idx_list': [i for i in range(B)],
-        'p_list': [var(0.0) for i in range(B)], # might be changed to batch
-        'alpha_list': [var(1.0) for i in range(B)],
-    }
+    states = initialize_states(domain.Box(torch.cat((padding, input_center, input_center, padding), 1), torch.cat((padding, input_width, input_width, padding), 1)))
 
     return states
 
 
 def f_isOn(x):
-    return x[1].setValue(var(1.0))
+    return x[1].setValue(const(1.0))
 
 def f_notisOn(x):
-    return x[1].setValue(var(0.0))
+    return x[1].setValue(const(0.0))
 
 def f_up_temp(x):
     # x = x - 0.1*(x-lin) + 5.0
-    return x.select_from_index(0, index0).sub_l((x.select_from_index(0, index1).sub_l(x.select_from_index(0, index1))).mul(var(0.1))).add(var(5.0))
+    return x.select_from_index(0, index0).sub_l((x.select_from_index(0, index1).sub_l(x.select_from_index(0, index1))).mul(const(0.1))).add(const(5.0))
 
 def f_test_first(x):
     return x[0]
@@ -130,37 +114,37 @@ class LinearReLU(nn.Module):
 
 # can not pickle local object
 def f_ifelse_tOn_block1(x):
-    return x.set_value(var(1.0))
+    return x.set_value(const(1.0))
 
 def f_test(x):
     return x
 
 def assign_update(x):
-    return x.add(var(1.0))
+    return x.add(const(1.0))
 
 def f_cooling(x):
-    k = var(0.1)
-    dt = var(0.5)
-    return x.mul(var(1.0) - k*dt)
+    k = const(0.1)
+    dt = const(0.5)
+    return x.mul(const(1.0) - k*dt)
 
 def f_warming(x):
-    k = var(0.1)
-    dt = var(0.5)
-    return x.select_from_index(1, index0).mul(var(1-0.1*0.5)).add(x.select_from_index(1, index1))
+    k = const(0.1)
+    dt = const(0.5)
+    return x.select_from_index(1, index0).mul(const(1-0.1*0.5)).add(x.select_from_index(1, index1))
 
 def f_update_high_heat(x):
-    return x.mul(var(15.0))
+    return x.mul(const(15.0))
 
 def f_update_low_heat(x):
-    return x.mul(var(10.0))
+    return x.mul(const(10.0))
 
 # i, x, h, isOn
 class Program(nn.Module):
     def __init__(self, l, nn_mode='all'):
         super(Program, self).__init__()
-        self.h_unit_low = var(15.0)
-        self.h_unit_high = var(10.0)
-        self.steps = var(19)
+        self.h_unit_low = const(15.0)
+        self.h_unit_high = const(10.0)
+        self.steps = const(19)
         # balance temperature: 70.0
 
         self.nn_cool = LinearReLU(l=l)
@@ -192,8 +176,8 @@ class Program(nn.Module):
             self.assign_warming,
         )
 
-        self.ifelse_isOn_heat = IfElse(target_idx=[3], test=var(0.66), f_test=f_test, body=self.low_heat_block, orelse=self.high_heat_block)
-        self.ifelse_isOn = IfElse(target_idx=[3], test=var(0.33), f_test=f_test, body=self.cool_block, orelse=self.ifelse_isOn_heat)
+        self.ifelse_isOn_heat = IfElse(target_idx=[3], test=const(0.66), f_test=f_test, body=self.low_heat_block, orelse=self.high_heat_block)
+        self.ifelse_isOn = IfElse(target_idx=[3], test=const(0.33), f_test=f_test, body=self.cool_block, orelse=self.ifelse_isOn_heat)
         
         self.assign_update = Assign(target_idx=[0], arg_idx=[0], f=assign_update)
         self.trajectory_update = Trajectory(target_idx=[1]) # update the temperature
@@ -79,16 +79,16 @@ class LinearAssign(nn.Module):
 
 
 def f_assign_min_z(x):
-    return x.set_value(var(1.0))
+    return x.set_value(const(1.0))
 
 def f_assign_max_z(x):
-    return x.set_value(var(10.0))
+    return x.set_value(const(10.0))
 
 
 class Program(nn.Module):
     def __init__(self, l=1, nn_mode=None):
         super(Program, self).__init__()
-        self.bar = var(1.0)
+        self.bar = const(1.0)
         self.nn = LinearAssign(l=l)
 
         self.assign_y = Assign(target_idx=[1], arg_idx=[0], f=self.nn)
@@ -6,6 +6,8 @@ import numpy as np
 
 args = get_args()
 generate_dataset = args.generate_dataset
+dataset_format = args.dataset_format
+point_store = args.point_store
 dataset_distribution = args.dataset_distribution
 lr = args.lr
 stop_val = args.stop_val
@@ -19,6 +21,9 @@ width = args.width
 bs = args.bs
 l = args.l
 nn_mode = args.nn_mode
+nn_domain = args.nn_domain
+zonotope_max_errors = args.zonotope_max_errors
+fused_mlp = args.fused_mlp
 b = args.b
 num_components = args.num_components
 save = args.save
@@ -43,6 +48,10 @@ data_bs = args.data_bs
 use_hoang = args.use_hoang
 bound_start = args.bound_start
 bound_end = args.bound_end
+seed_start = args.seed_start
+seed_end = args.seed_end
+num_threads = args.num_threads
+result_path = args.result_path
 
 simple_debug = args.simple_debug
 score_f = args.score_f
@@ -52,10 +61,25 @@ if score_f == 'hybrid':
 extract_one_trajectory = args.extract_one_trajectory
 
 AI_verifier_num_components = args.AI_verifier_num_components
+verifier_chunk_size = args.verifier_chunk_size
+verifier_memory_budget = args.verifier_memory_budget
+verifier_early_stop = args.verifier_early_stop
+trajectory_format = args.trajectory_format
+verification_cache_dir = args.verification_cache_dir
+verification_cache_size = args.verification_cache_size
+verifier_refine_depth = args.verifier_refine_depth
+verifier_refine_time = args.verifier_refine_time
 SE_verifier_num_components = args.SE_verifier_num_components
 # TODO: SE_verifier_num_components
 SE_verifier_run_times = args.SE_verifier_run_times
 train_sample_size = args.train_sample_size
+masked_branch = args.masked_branch
+share_path_prefix = args.share_path_prefix
+stream_safety_loss = args.stream_safety_loss
+prune_columns = args.prune_columns
+compile_program = args.compile_program
+unroll_loop = args.unroll_loop
+compile_loop_body = args.compile_loop_body
 
 K_DISJUNCTS = 10000000
 SAMPLE_SIZE = train_sample_size
@@ -1157,6 +1181,8 @@ PROTECTION_LOOP_NUM_SMOOTH = 999
 MAXIMUM_ITERATION = 300
 if plot and benchmark_name == "mountain_car":
     MAXIMUM_ITERATION = 600
+# initial number of steps preallocated for the trajectories of a batch of states
+TRAJECTORY_CAPACITY = 32
 
 N_INFINITY = var(-10000.0)
 P_INFINITY = var(10000.0)
@@ -1181,6 +1207,8 @@ if benchmark_name is not None:
     model_name_prefix = f"{benchmark_name}_{nn_mode}_{l}_{data_bs}_{num_components}_{train_size}"
     if score_f != 'volume':
         model_name_prefix += f"_{score_f}"
+    if nn_domain != 'box':
+        model_name_prefix += f"_{nn_domain}"
 
     dataset_path_prefix = f"dataset/{benchmark_name}"
 
@@ -1188,6 +1216,9 @@ if benchmark_name is not None:
     # TODO fix the name issue
     if score_f != 'hybrid':
         expr_info_prefix += f"_{score_f}"
+    # runs over a part of the seeds write to their own logs
+    if seed_start != 0 or seed_end != 20:
+        expr_info_prefix += f"_seed{seed_start}_{seed_end}"
     # test_info_prefix = f"{AI_verifier_num_components}_{SE_verifier_run_times}"
     test_info_prefix = f"{AI_verifier_num_components}"
 
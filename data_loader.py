@@ -1,3 +1,4 @@
+import os
 import random
 from random import shuffle
 import pandas as pd
@@ -6,14 +7,65 @@ import time
 from timeit import default_timer as timer
 
 from constants import *
+import constants
 
 
-def load_data(
-    train_size,
-    test_size,
-    dataset_path,
-    ):
-    start_t = time.time()
+'''
+Binary trajectory dataset
+<prefix>.states.npy: float32, total_steps x state_dim, the states of all the trajectories one after another
+<prefix>.actions.npy: float32, total_steps x action_dim
+<prefix>.offsets.npy: int64, (num_trajectories + 1), the i-th trajectory is the steps [offsets[i], offsets[i+1])
+'''
+class TrajectoryView():
+    # one trajectory, a list of [state, action] backed by the memory-mapped arrays
+    def __init__(self, idx, states, actions):
+        self.idx = idx
+        self.states = states
+        self.actions = actions
+
+    def __len__(self):
+        return self.states.shape[0]
+
+    def __getitem__(self, i):
+        return [self.states[i], self.actions[i]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class TrajectoryDataset():
+    # a list of trajectories, index holds the order of the trajectories, slicing and shuffling only touch the index
+    def __init__(self, states, actions, offsets, index=None):
+        self.states = states
+        self.actions = actions
+        self.offsets = offsets
+        self.index = np.arange(offsets.shape[0] - 1) if index is None else index
+
+    def __len__(self):
+        return self.index.shape[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return TrajectoryDataset(self.states, self.actions, self.offsets, self.index[i])
+        idx = self.index[i]
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return TrajectoryView(idx, self.states[start:end], self.actions[start:end])
+
+    def __setitem__(self, i, trajectory):
+        # used by random.shuffle, trajectory is a view from this dataset
+        self.index[i] = trajectory.idx
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def binary_dataset_prefix(dataset_path):
+    return os.path.splitext(dataset_path)[0]
+
+
+def read_text_dataset(dataset_path):
     f = open(dataset_path, 'r')
     f.readline()
     data_list = list()
@@ -29,9 +81,92 @@ def load_data(
             action = [float(v) for v in action_list.split(',')]
             trajectory_list.append([state, action])
         data_list.append(trajectory_list)
+    f.close()
+    return data_list
+
+
+def save_array(path, array):
+    # write to a file of this process and move it in place, a reader never sees a half-written array
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+    return
+
+
+def write_binary_arrays(states, actions, offsets, path_prefix):
+    # the offsets of an older conversion do not match the new states
+    try:
+        os.remove(f"{path_prefix}.offsets.npy")
+    except FileNotFoundError:
+        pass
+    save_array(f"{path_prefix}.states.npy", states.astype(np.float32))
+    save_array(f"{path_prefix}.actions.npy", actions.astype(np.float32))
+    # offsets are written last, their existence marks a complete dataset
+    save_array(f"{path_prefix}.offsets.npy", offsets.astype(np.int64))
+    return
+
+
+def write_binary_dataset(trajectory_list, path_prefix):
+    trajectory_list = [trajectory for trajectory in trajectory_list if len(trajectory) > 0]
+    offsets = np.zeros(len(trajectory_list) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(trajectory) for trajectory in trajectory_list])
+    states = np.array([state for trajectory in trajectory_list for (state, action) in trajectory], dtype=np.float32)
+    actions = np.array([action for trajectory in trajectory_list for (state, action) in trajectory], dtype=np.float32)
+    write_binary_arrays(states, actions, offsets, path_prefix)
+    return
+
+
+def convert_dataset(dataset_path):
+    # one-time conversion from the text dataset to the binary dataset
+    start_t = time.time()
+    path_prefix = binary_dataset_prefix(dataset_path)
+    write_binary_dataset(read_text_dataset(dataset_path), path_prefix)
+    print(f"convert {dataset_path} to {path_prefix}.*.npy: {time.time() - start_t} sec.")
+    return path_prefix
+
+
+def load_binary_dataset(path_prefix, num_tries=5):
+    # offsets first: the arrays of a conversion running in another process are replaced before its offsets
+    for _ in range(num_tries):
+        try:
+            offsets = np.load(f"{path_prefix}.offsets.npy")
+            states = np.load(f"{path_prefix}.states.npy", mmap_mode='r')
+            actions = np.load(f"{path_prefix}.actions.npy", mmap_mode='r')
+        except FileNotFoundError:
+            # the offsets are removed while the dataset is converted again
+            time.sleep(1)
+            continue
+        if offsets[-1] == states.shape[0] == actions.shape[0]:
+            return TrajectoryDataset(states, actions, offsets)
+        time.sleep(1)
+    raise ValueError(f"{path_prefix}.*.npy: incomplete binary dataset after {num_tries} tries")
+
+
+def load_binary_data(dataset_path):
+    path_prefix = binary_dataset_prefix(dataset_path)
+    try:
+        offsets_mtime = os.path.getmtime(f"{path_prefix}.offsets.npy")
+    except FileNotFoundError:
+        offsets_mtime = None
+    if offsets_mtime is None or (os.path.exists(dataset_path) and os.path.getmtime(dataset_path) > offsets_mtime):
+        convert_dataset(dataset_path)
+    return load_binary_dataset(path_prefix)
+
+
+def load_data(
+    train_size,
+    test_size,
+    dataset_path,
+    ):
+    start_t = time.time()
+    if constants.dataset_format == 'binary':
+        data_list = load_binary_data(dataset_path)
+    else:
+        data_list = read_text_dataset(dataset_path)
 
     # data_list = np.array(data_list)
-    np.random.shuffle(data_list)
+    np.random.shuffle(data_list.index if isinstance(data_list, TrajectoryDataset) else data_list)
     trajectory_train_list = data_list[:train_size]
     trajectory_test_list = data_list[train_size:train_size + test_size]
     print(f"train tra length: {len(trajectory_train_list)}, test tra length: {len(trajectory_test_list)}")
@@ -39,4 +174,4 @@ def load_data(
     print("---Data Generation---")
     print("--- %s seconds ---" % (time.time() - start_t))
     # return train_list[:, 0], test_list[:, 0], train_list[:, 1], test_list[:, 1]
-    return trajectory_train_list, trajectory_test_list
\ No newline at end of file
+    return trajectory_train_list, trajectory_test_list
@@ -0,0 +1,162 @@
+'''
+Batched versions of the generators in benchmark.py
+x: array of N initial values, all the trajectories are simulated step by step together
+return: states (N x steps x state_dim), actions (N x steps x action_dim)
+'''
+import time
+
+import numpy as np
+
+import benchmark
+
+
+def batch_to_trajectory_list(states, actions):
+    # the format of the scalar generators, a list of [(state, action)] per trajectory
+    states, actions = states.tolist(), actions.tolist()
+    return [list(zip(trajectory_states, trajectory_actions)) for trajectory_states, trajectory_actions in zip(states, actions)]
+
+
+# thermostat
+def batch_thermostat(x, steps, heat_bound, tOff, tOn, random_state=np.random):
+    # one step uses at most two random values in the scalar version (heat policy with x > tOff)
+    N = x.shape[0]
+    h_unit = 15.0
+    states, actions = np.zeros((N, steps, 2)), np.zeros((N, steps, 2))
+    isOn = np.zeros(N)
+    for i in range(steps):
+        u = random_state.random((2, N))
+        cool_index = isOn <= 0.5
+        heat_low_index = np.logical_and(~cool_index, x <= tOff)
+
+        # nn_cool_policy_new
+        cool_isOn = np.where(x <= tOn, u[0] * 0.5 + 0.5, u[0] * 0.5)
+        # nn_heat_policy_new
+        h = np.where(heat_low_index, np.minimum(1.0, (heat_bound - 0.95*x)/15.0), u[0] * (heat_bound - 0.95*x)/15.0)
+        heat_isOn = np.where(heat_low_index, u[0] * 0.5 + 0.5, u[1] * 0.5)
+        h = np.where(cool_index, 0.0, h)
+        isOn = np.where(cool_index, cool_isOn, heat_isOn)
+
+        states[:, i, 0], states[:, i, 1] = x, np.where(cool_index, 0.0, 1.0)
+        actions[:, i, 0], actions[:, i, 1] = isOn, h
+        x = np.where(cool_index, benchmark.cooling_new(x), benchmark.warming_new(x, h * h_unit))
+    return states, actions
+
+
+def batch_thermostat_new(x, safe_bound, random_state=np.random):
+    return batch_thermostat(x, steps=20, heat_bound=83.0, tOff=76.0, tOn=60.95, random_state=random_state)
+
+
+def batch_thermostat_new_40(x, safe_bound, random_state=np.random):
+    return batch_thermostat(x, steps=40, heat_bound=83.0, tOff=76.0, tOn=60.95, random_state=random_state)
+
+
+def batch_thermostat_new_tinyinput(x, safe_bound, random_state=np.random):
+    return batch_thermostat(x, steps=20, heat_bound=85.0, tOff=76.0, tOn=62.0, random_state=random_state)
+
+
+# aircraft collision
+def batch_classifier_stage_new(x1, y1, x2, y2, stage, step):
+    critical_distance_square = 250
+    stage_0, stage_1, stage_2, stage_3 = stage == 0, stage == 1, stage == 2, stage == 3
+    to_3 = np.logical_and(stage_0, benchmark.aircraft_distance(x1-5, y1+5, x2+5, y2) < 40)
+    to_1 = np.logical_and.reduce((
+        stage_0,
+        ~to_3,
+        np.logical_or(benchmark.aircraft_distance(x1, y1+5, x2+5, y2) < 40, benchmark.aircraft_distance(x1, y1, x2, y2) <= critical_distance_square),
+    ))
+    step = np.where(stage_0, step, step + 1)
+    next_1 = np.logical_and(stage_1, step > 3)
+    next_2 = np.logical_and(stage_2, step > 2)
+    next_3 = np.logical_and(stage_3, step > 3)
+
+    new_stage = stage.copy()
+    new_stage[to_3], new_stage[to_1] = 3, 1
+    new_stage[next_1], new_stage[next_2], new_stage[next_3] = 2, 3, 0
+    new_step = np.where(np.logical_or.reduce((to_3, to_1, next_1, next_2)), 0, step)
+
+    p = np.zeros((stage.shape[0], 4))
+    p[np.arange(stage.shape[0]), new_stage.astype(int)] = 1
+    return p, new_stage, new_step, benchmark.aircraft_distance(x1, y1, x2, y2)
+
+
+def batch_aircraft_collision_new(x, safe_bound, random_state=np.random):
+    N = x.shape[0]
+    steps = 15
+    straight_speed = 5.0
+    x1, y1, x2, y2 = x, np.full(N, -15.0), np.zeros(N), np.zeros(N)
+    stage, step = np.zeros(N), np.zeros(N)
+    states, actions = np.zeros((N, steps, 5)), np.zeros((N, steps, 4))
+    for i in range(steps):
+        p, stage, step, aircraft_distance = batch_classifier_stage_new(x1, y1, x2, y2, stage, step)
+        states[:, i] = np.stack((x1, y1, x2, y2, stage), 1)
+        actions[:, i] = p
+        x1 = np.where(p[:, 1] == 1, x1 - 5.0, np.where(p[:, 3] == 1, x1 + 5.0, x1))
+        y1 = y1 + straight_speed
+        x2 = x2 + straight_speed
+        collision_num = int(np.sum(aircraft_distance < 40))
+        if collision_num > 0:
+            print(f"Collision: {collision_num} trajectories at step {i}")
+    return states, actions
+
+
+# racetrack
+def batch_car_control_relaxed_multi_classifier(x, y, random_state=np.random):
+    # the choices are in the order of the scalar version: 1, 0, 2
+    safe_range = np.array(benchmark.absolute_safe_range_relaxed_multi)[y]
+    choice_list = np.array([1, 0, 2])
+    next_x = np.stack((x, x - 1, x + 1), 1)
+    select = np.logical_and(next_x <= safe_range[:, 1:], next_x >= safe_range[:, :1])
+    select_num = select.sum(1)
+    if np.any(select_num == 0):
+        raise IndexError('Cannot choose from an empty sequence')
+    # the k-th selected choice
+    k = np.floor(random_state.random(x.shape[0]) * select_num)
+    rank = np.cumsum(select, 1) - 1
+    index = choice_list[np.argmax(np.logical_and(select, rank == k[:, None]), 1)]
+    p = np.zeros((x.shape[0], 3))
+    p[np.arange(x.shape[0]), index] = 1.0
+    return p, index
+
+
+def batch_racetrack_relaxed_multi(x, safe_bound, random_state=np.random):
+    N = x.shape[0]
+    steps = 20
+    x1, y1, x2, y2 = x, np.zeros(N, dtype=int), x, np.zeros(N, dtype=int)
+    states, actions = np.zeros((N, 2*steps, 3)), np.zeros((N, 2*steps, 3))
+    for i in range(steps):
+        p0, index0 = batch_car_control_relaxed_multi_classifier(x1, y1, random_state)
+        states[:, 2*i] = np.stack((x1, y1, np.zeros(N)), 1)
+        actions[:, 2*i] = p0
+        p1, index1 = batch_car_control_relaxed_multi_classifier(x2, y2, random_state)
+        states[:, 2*i+1] = np.stack((x2, y2, np.ones(N)), 1)
+        actions[:, 2*i+1] = p1
+        # from_index3_to_position, the action is one-hot
+        x1, y1 = x1 + (index0 == 2) - (index0 == 0), y1 + 1
+        x2, y2 = x2 + (index1 == 2) - (index1 == 0), y2 + 1
+    return states, actions
+
+
+batch_benchmark_dict = {
+    'thermostat_new': batch_thermostat_new,
+    'thermostat_new_cnn': batch_thermostat_new,
+    'thermostat_new_40': batch_thermostat_new_40,
+    'thermostat_new_tinyinput': batch_thermostat_new_tinyinput,
+    'aircraft_collision_new': batch_aircraft_collision_new,
+    'racetrack_relaxed_multi': batch_racetrack_relaxed_multi,
+}
+
+
+if __name__ == "__main__":
+    # the parity with the scalar versions is checked in test_batch_benchmark.py
+    range_list = [
+        ('thermostat_new', [60.0, 64.0]),
+        ('thermostat_new_40', [60.0, 64.0]),
+        ('thermostat_new_tinyinput', [60.0, 60.1]),
+        ('aircraft_collision_new', [12.0, 16.0]),
+        ('racetrack_relaxed_multi', [5.0, 6.0]),
+    ]
+    for benchmark_name, (l, r) in range_list:
+        x = np.random.random(20000) * (r - l) + l
+        start_t = time.time()
+        batch_benchmark_dict[benchmark_name](x, 0.0)
+        print(f"{benchmark_name}: batched generation of 20000 trajectories: {time.time() - start_t} sec.")
@@ -6,8 +6,17 @@ from scipy.stats import truncnorm
 from scipy.stats import uniform
 
 import benchmark
+from batch_benchmark import (
+    batch_benchmark_dict,
+    batch_to_trajectory_list,
+)
 from args import get_args
 from constants import *
+from data_loader import (
+    binary_dataset_prefix,
+    write_binary_arrays,
+    write_binary_dataset,
+)
 
 
 def dataset_arg(dataset):
@@ -136,11 +145,7 @@ def show_unsafe_percentage(res_list):
     print(f"unsafe trajectory percentage: {unsafe_num / len(res_list)}")
 
 
-def generate_dataset(func, distribution, input_range, safe_bound, data_size=20000):
-    res_list = list()
-    min_tra, max_tra = 100000, -100000
-    print(f"Start generation.")
-
+def sample_initial_states(distribution, input_range, data_size):
     if distribution == "normal":
         l, r = input_range[0], input_range[1]
         X = get_truncated_normal((l+r)/2.0, sd=1, low=l, upp=r)
@@ -154,6 +159,16 @@ def generate_dataset(func, distribution, input_range, safe_bound, data_size=2000
         x_list[0] = l
         x_list[1] = r
     
+    return x_list
+
+
+def generate_dataset(func, distribution, input_range, safe_bound, data_size=20000):
+    res_list = list()
+    min_tra, max_tra = 100000, -100000
+    print(f"Start generation.")
+
+    x_list = sample_initial_states(distribution, input_range, data_size)
+    
     max_tra_l = 0.0
     avg_tra_l = 0.0
     for x in x_list:
@@ -173,7 +188,33 @@ def generate_dataset(func, distribution, input_range, safe_bound, data_size=2000
     return res_list
 
 
-def write_dataset(res_list, path):
+def generate_dataset_batch(batch_func, distribution, input_range, safe_bound, data_size=20000):
+    # all the trajectories are generated together, states: N x steps x state_dim, actions: N x steps x action_dim
+    print(f"Start batch generation.")
+    x_list = sample_initial_states(distribution, input_range, data_size)
+    states, actions = batch_func(np.array(x_list), safe_bound)
+
+    if 'thermostat' in benchmark_name or 'aircraft_collision' in benchmark_name:
+        unsafe_area = [55.0, 83.0] if 'thermostat' in benchmark_name else [40.0, 100000.0]
+        target_x = states[:, :, 0]
+        unsafe_num = np.sum(np.logical_or(target_x.max(1) > unsafe_area[1], target_x.min(1) < unsafe_area[0]))
+        print(f"unsafe trajectory percentage: {unsafe_num / states.shape[0]}")
+    print(f"trajectory length: {states.shape[1]}")
+
+    return states, actions
+
+
+def write_dataset_batch(states, actions, path, dataset_format='text'):
+    # the text dataset is always written, the binary one is converted from it when it is missing or older
+    write_dataset(batch_to_trajectory_list(states, actions), path)
+    if dataset_format == 'binary':
+        # written after the text dataset from the arrays, so load_data does not convert it again
+        N, T, _ = states.shape
+        write_binary_arrays(states.reshape(N * T, -1), actions.reshape(N * T, -1), np.arange(N + 1) * T, binary_dataset_prefix(path))
+    return
+
+
+def write_dataset(res_list, path, dataset_format='text'):
     f = open(path, 'w')
     f.write("trajectory_list\n")
     for trajectory_list in res_list:
@@ -183,6 +224,9 @@ def write_dataset(res_list, path):
             f.write(f"{state};")
         f.write(f"\n")
     f.close()
+    if dataset_format == 'binary':
+        # written after the text dataset, so load_data does not convert it again
+        write_binary_dataset(res_list, binary_dataset_prefix(path))
     return 
 
 
@@ -316,11 +360,27 @@ def run(safe_bound):
     
     input_range = dataset_arg(benchmark_name)
 
+    if args.batch_generation and benchmark_name in batch_benchmark_dict:
+        states, actions = generate_dataset_batch(
+            batch_func=batch_benchmark_dict[benchmark_name], 
+            distribution=distribution, 
+            input_range=input_range, 
+            safe_bound=safe_bound,
+        )
+        write_dataset_batch(
+            states,
+            actions,
+            path=f"{benchmark_name}_{safe_bound}.txt",
+            dataset_format=args.dataset_format,
+        )
+        return
+
     res_list = generate_dataset(func=func, distribution=distribution, input_range=input_range, safe_bound=safe_bound)
     write_dataset(
         res_list,
         # path=f"dataset/{dataset}_{distribution}_{input_range[0]}_{input_range[1]}_{safe_bound}.txt",
-        path=f"{benchmark_name}_{safe_bound}.txt"
+        path=f"{benchmark_name}_{safe_bound}.txt",
+        dataset_format=args.dataset_format,
         )
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+'''
+Parity of the batched generators of batch_benchmark.py with the scalar versions of benchmark.py
+the random values drawn by the batched version are replayed into the scalar version through benchmark.random
+python -m unittest discover -s dataset
+'''
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import benchmark
+from batch_benchmark import batch_benchmark_dict
+
+
+class RecordRandom():
+    def __init__(self):
+        self.draws = list()
+
+    def random(self, size):
+        values = np.random.random(size)
+        self.draws.append(values)
+        return values
+
+
+class ReplayRandom():
+    def __init__(self, values=None, choices=None):
+        self.values = list() if values is None else values
+        self.choices = list() if choices is None else choices
+
+    def random(self):
+        return self.values.pop(0)
+
+    def choice(self, seq):
+        choice = self.choices.pop(0)
+        assert choice in seq, f"choice {choice} not in {seq}"
+        return choice
+
+
+def thermostat_replay(states, actions, draws, tOff=76.0):
+    # cooling and heating below tOff use one random value, heating above tOff uses two
+    replay_list = list()
+    for n in range(states.shape[0]):
+        values = list()
+        for i in range(states.shape[1]):
+            values.append(draws[i][0][n])
+            if states[n, i, 1] == 1.0 and states[n, i, 0] > tOff:
+                values.append(draws[i][1][n])
+        replay_list.append(ReplayRandom(values=values))
+    return replay_list
+
+
+def deterministic_replay(states, actions, draws):
+    return [ReplayRandom() for n in range(states.shape[0])]
+
+
+def choice_replay(states, actions, draws):
+    return [ReplayRandom(choices=[int(i) for i in np.argmax(actions[n], 1)]) for n in range(states.shape[0])]
+
+
+# the input range and the replay of each entry of batch_benchmark_dict
+PARITY_DICT = {
+    'thermostat_new': ([60.0, 64.0], thermostat_replay),
+    'thermostat_new_cnn': ([60.0, 64.0], thermostat_replay),
+    'thermostat_new_40': ([60.0, 64.0], thermostat_replay),
+    'thermostat_new_tinyinput': ([60.0, 60.1], thermostat_replay),
+    'aircraft_collision_new': ([12.0, 16.0], deterministic_replay),
+    'racetrack_relaxed_multi': ([5.0, 6.0], choice_replay),
+}
+
+
+def count_mismatch(benchmark_name, x, safe_bound, replay):
+    # the number of trajectories of the batched version different from the scalar version
+    scalar_func = getattr(benchmark, benchmark_name)
+    batch_func = batch_benchmark_dict[benchmark_name]
+    record_random = RecordRandom()
+    states, actions = batch_func(np.array(x), safe_bound, random_state=record_random)
+    replay_list = replay(states, actions, record_random.draws)
+
+    scalar_random = benchmark.random
+    mismatch = 0
+    try:
+        for n, x_n in enumerate(x):
+            benchmark.random = replay_list[n]
+            try:
+                trajectory_list = scalar_func(x_n, safe_bound)
+            except (IndexError, AssertionError):
+                # the scalar version draws other random values than the batched version
+                mismatch += 1
+                continue
+            scalar_states = np.array([state for state, action in trajectory_list], dtype=float)
+            scalar_actions = np.array([action for state, action in trajectory_list], dtype=float)
+            if not (np.array_equal(scalar_states, states[n]) and np.array_equal(scalar_actions, actions[n])):
+                mismatch += 1
+    finally:
+        benchmark.random = scalar_random
+    return mismatch
+
+
+class TestBatchBenchmark(unittest.TestCase):
+    def test_all_benchmarks_checked(self):
+        self.assertEqual(set(batch_benchmark_dict), set(PARITY_DICT))
+
+    def test_parity(self):
+        np.random.seed(0)
+        for benchmark_name, ((l, r), replay) in PARITY_DICT.items():
+            with self.subTest(benchmark_name=benchmark_name):
+                x = (np.random.random(200) * (r - l) + l).tolist()
+                self.assertEqual(count_mismatch(benchmark_name, x, 0.0, replay), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
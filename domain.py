@@ -79,10 +79,34 @@ def handleNegative(interval):
     return Interval(l, r)
 
 
+def batch_interval_cos(left, right):
+    # elementwise interval cosine of [left, right], same cases as Interval.cos without host sync
+    pi, pi_twice = float(PI), float(PI_TWICE)
+    # handleNegative
+    n = torch.where(left < 0.0, torch.ceil(-left / pi_twice), torch.zeros_like(left))
+    left, right = left + pi_twice * n, right + pi_twice * n
+    # fmod by PI_TWICE, left is non-negative here
+    n = torch.floor(left / pi_twice)
+    left, right = left - pi_twice * n, right - pi_twice * n
+
+    full_idx = (right - left) >= pi_twice
+    # when left >= PI, cos(t) = -cos(t - PI)
+    shift_idx = left >= pi
+    left, right = torch.where(shift_idx, left - pi, left), torch.where(shift_idx, right - pi, right)
+    cos_left, cos_right = torch.cos(left), torch.cos(right)
+    neg_ones, ones = -torch.ones_like(left), torch.ones_like(left)
+    res_l = torch.where(right <= pi, cos_right, neg_ones)
+    res_r = torch.where(right <= pi, cos_left, torch.where(right <= pi_twice, torch.max(cos_left, cos_right), ones))
+    res_l, res_r = torch.where(shift_idx, -res_r, res_l), torch.where(shift_idx, -res_l, res_r)
+
+    res_l, res_r = torch.where(full_idx, neg_ones, res_l), torch.where(full_idx, ones, res_r)
+    return res_l, res_r
+
+
 # interval domain
 
 class Interval:
-    def __init__(self, left=var(0.0), right=var(0.0)):
+    def __init__(self, left=const(0.0), right=const(0.0)):
         self.left = left
         self.right = right
     
@@ -113,7 +137,7 @@ class Interval:
     
     def getLength(self):
         if self.right.data.item() < self.left.data.item():
-            return var(0.0)
+            return const(0.0)
         else:
             # print(f"in getLength: {self.right}, {self.left}")
             # print(f"in getLength: {self.right.sub(self.left)}")
@@ -121,7 +145,7 @@ class Interval:
         
     def getVolumn(self):
         if self.right.data.item() < self.left.data.item():
-            return var(0.0)
+            return const(0.0)
         else:
             return torch.max(EPSILON, (self.right.sub(self.left)))
     
@@ -197,8 +221,8 @@ class Interval:
 
     def getZonotope(self):
         res = Zonotope()
-        res.center = (self.left.add(self.right)).div(var(2.0))
-        res.alpha_i[0] = (self.right.sub(self.left)).div(var(2.0))
+        res.center = (self.left.add(self.right)).div(const(2.0))
+        res.alpha_i[0] = (self.right.sub(self.left)).div(const(2.0))
         return res
     
     # arithmetic
@@ -248,8 +272,8 @@ class Interval:
         
         res = Interval()
         if isinstance(y, torch.Tensor):
-            res.left = y.sub(var(1.0).mul(self.right))
-            res.right = y.sub(var(1.0).mul(self.left))
+            res.left = y.sub(const(1.0).mul(self.right))
+            res.right = y.sub(const(1.0).mul(self.left))
         else:
             res.left = y.left.sub(self.right)
             res.right = y.right.sub(self.left)
@@ -312,8 +336,8 @@ class Interval:
 
         res = Interval()
         tmp_interval = Interval()
-        tmp_interval.left = var(1.0).div(self.right)
-        tmp_interval.right = var(1.0).div(self.left)
+        tmp_interval.left = const(1.0).div(self.right)
+        tmp_interval.right = const(1.0).div(self.left)
         res = tmp_interval.mul(y)
         
         show_value(res)
@@ -472,7 +496,7 @@ class Box():
     
     def set_value(self, value):
         # print(f"value: {value}")
-        return self.new(value, var(0.0))
+        return self.new(value, const(0.0))
     
     def sound_join(self, other):
         l1, r1 = self.c - self.delta, self.c + self.delta
@@ -568,42 +592,8 @@ class Box():
     
     def cos(self):
         #TODO: only for box, not for zonotope
-        # todo: batch this
-        # For batch:
-        B = self.c.shape[0]
-        if len(self.c.shape) > 1:
-            c, delta = torch.tensor([]), torch.tensor([])
-            # show_cuda_memory(f"before B")
-            for i in range(B):
-                # show_cuda_memory(f"-------ini B")
-                new_c, new_delta = self.c[i], self.delta[i]
-                new_box = self.new(new_c, new_delta)
-                interval = new_box.getInterval()
-                # show_cuda_memory(f"before cos")
-                # print(interval.left, interval.right)
-                res_interval = interval.cos()
-                # print(res_interval.left, res_interval.right)
-                # exit(0)
-                # show_cuda_memory(f"after cos")
-                get_box = res_interval.getBox()
-                # print(c)
-                if c.shape[0] == 0:
-                    c, delta = get_box.c, get_box.delta
-                else:
-                    if len(get_box.c.shape) != len(c.shape) and len(c.shape) >= 1:
-                        get_box.c, get_box.delta = get_box.c.unsqueeze(0), get_box.delta.unsqueeze(0)
-                    c, delta = torch.cat((c, get_box.c), 0), torch.cat((delta, get_box.delta), 0)
-            if len(c.shape) == 1:
-                c, delta = c.unsqueeze(1), delta.unsqueeze(1)
-            del self.c
-            del self.delta
-            return self.new(c, delta)
-        else:
-            # TODO: support batch and double check
-            interval = self.getInterval()
-            res_interval = interval.cos()
-            res = res_interval.getBox()
-            return res
+        left, right = batch_interval_cos(self.c - self.delta, self.c + self.delta)
+        return self.new((right + left) / 2.0, (right - left) / 2.0)
     
     def sin(self):
         return self.sub_l(PI_HALF).cos()
@@ -646,7 +636,7 @@ class Box():
     
     def sigmoid_linear(self, sig_range):
         a = var(0.5/sig_range)
-        b = var(0.5)
+        b = const(0.5)
         x = self.mul(a).add(b)
         tp = torch.clamp(x.c + x.delta, 0, 1)
         bt = torch.clamp(x.c - x.delta, 0, 1)
@@ -654,6 +644,276 @@ class Box():
         return self.new((tp + bt)/2, (tp - bt)/2)
 
 
+class BatchZonotope():
+    '''
+    c: B x D, errors: B x E x D, the points are c + sum_e eps_e * errors[:, e], eps_e in [-1, 1]
+    the same methods as Box for the functions inside the networks, the other methods go through the Box hull
+    '''
+    def __init__(self, c, errors):
+        self.c = c
+        self.errors = errors
+    
+    def new(self, c, errors):
+        return self.__class__(c, errors)
+    
+    @classmethod
+    def from_box(cls, box):
+        # one error term per dimension with a width
+        errors = torch.diag_embed(box.delta)
+        width_idx = torch.nonzero(torch.any(box.delta != 0, 0)).flatten()
+        return cls(box.c, errors[:, width_idx, :])
+    
+    @property
+    def delta(self):
+        return self.errors.abs().sum(1)
+    
+    def clone(self):
+        return self.new(self.c.clone(), self.errors.clone())
+    
+    def getBox(self):
+        return Box(self.c, self.delta)
+    
+    def getRight(self):
+        return self.c + self.delta
+    
+    def getLeft(self):
+        return self.c - self.delta
+    
+    def getInterval(self):
+        delta = self.delta
+        return Interval(self.c - delta, self.c + delta)
+    
+    def select_from_index(self, dim, idx):
+        return self.new(torch.index_select(self.c, dim, idx), torch.index_select(self.errors, dim + 1, idx))
+    
+    def append_errors(self, new_delta):
+        # one new error term per dimension, for the dimensions with a width
+        return self.new(self.c, torch.cat((self.errors, torch.diag_embed(new_delta)), 1)).consolidate()
+    
+    def consolidate(self):
+        # drop the error terms which are zero in the whole batch,
+        # merge the smallest ones into a box if there are more than zonotope_max_errors
+        D = self.errors.shape[2]
+        norm = self.errors.abs().sum(2)
+        keep_idx = torch.nonzero(torch.any(norm != 0, 0)).flatten()
+        errors, norm = self.errors[:, keep_idx], norm[:, keep_idx]
+        max_errors = max(constants.zonotope_max_errors, D)
+        if errors.shape[1] > max_errors:
+            # the order of the error terms by the sum over the batch, the same terms are kept for all the states
+            order = torch.argsort(norm.sum(0), descending=True)
+            kept, merged = order[:max_errors - D], order[max_errors - D:]
+            errors = torch.cat((errors[:, kept], torch.diag_embed(errors[:, merged].abs().sum(1))), 1)
+        return self.new(self.c, errors)
+    
+    def align_errors(self, other):
+        # a Box gets new error terms, independent of the ones of self
+        if isinstance(other, Box):
+            B, D = other.c.shape
+            zero_errors = torch.zeros(B, self.errors.shape[1], D, device=other.c.device)
+            other = BatchZonotope(other.c, torch.cat((zero_errors, torch.diag_embed(other.delta)), 1))
+        E = max(self.errors.shape[1], other.errors.shape[1])
+        self_errors = F.pad(self.errors, (0, 0, 0, E - self.errors.shape[1]))
+        other_errors = F.pad(other.errors, (0, 0, 0, E - other.errors.shape[1]))
+        return self_errors, other_errors, other.c
+    
+    def matmul(self, other):
+        return self.new(self.c.matmul(other), self.errors.matmul(other))
+    
+    def add(self, other):
+        if isinstance(other, torch.Tensor):
+            return self.new(self.c.add(other), self.errors)
+        self_errors, other_errors, other_c = self.align_errors(other)
+        return self.new(self.c.add(other_c), self_errors + other_errors).consolidate()
+    
+    def sub_l(self, other): # self - other
+        if isinstance(other, torch.Tensor):
+            return self.new(self.c.sub(other), self.errors)
+        self_errors, other_errors, other_c = self.align_errors(other)
+        return self.new(self.c.sub(other_c), self_errors - other_errors).consolidate()
+    
+    def sub_r(self, other): # other - self
+        return self.sub_l(other).mul(const(-1.0))
+    
+    def mul(self, other):
+        if isinstance(other, torch.Tensor):
+            # a B x D factor is per state, broadcast over the error terms of B x E x D
+            error_other = other.unsqueeze(1) if other.dim() == 2 else other
+            return self.new(self.c * other, self.errors * error_other)
+        return self.getBox().mul(other)
+    
+    def linear_relaxation(self, lam, g_min, g_max):
+        # y = lam * x + g, g in [g_min, g_max] is the range of f(x) - lam * x over the bounds of x
+        mu, beta = (g_max + g_min) / 2, (g_max - g_min) / 2
+        return self.new(lam * self.c + mu, lam.unsqueeze(1) * self.errors).append_errors(beta)
+    
+    def relu(self):
+        l, r = self.getLeft(), self.getRight()
+        zeros, ones = torch.zeros_like(l), torch.ones_like(l)
+        cross_idx = torch.logical_and(l < 0, r > 0)
+        lam = torch.where(l >= 0, ones, torch.where(r <= 0, zeros, r / (r - l).clamp(min=float(EPSILON))))
+        g_l, g_r = F.relu(l) - lam * l, F.relu(r) - lam * r
+        # relu(x) - lam * x is 0 at 0
+        g_min = torch.where(cross_idx, torch.min(zeros, torch.min(g_l, g_r)), torch.min(g_l, g_r))
+        return self.linear_relaxation(lam, g_min, torch.max(g_l, g_r))
+    
+    def s_shaped(self, f, df):
+        # sigmoid and tanh, with the smaller derivative at the bounds f(x) - lam * x is monotonic over the bounds
+        l, r = self.getLeft(), self.getRight()
+        lam = torch.min(df(l), df(r))
+        g_l, g_r = f(l) - lam * l, f(r) - lam * r
+        return self.linear_relaxation(lam, torch.min(g_l, g_r), torch.max(g_l, g_r))
+    
+    def sigmoid(self):
+        return self.s_shaped(torch.sigmoid, lambda x: torch.sigmoid(x) * (1 - torch.sigmoid(x)))
+    
+    def tanh(self):
+        return self.s_shaped(torch.tanh, lambda x: 1 - torch.tanh(x) ** 2)
+    
+    def sigmoid_linear(self, sig_range):
+        return self.getBox().sigmoid_linear(sig_range)
+    
+    def conv(self, weight, bias, padding):
+        return self.getBox().conv(weight, bias, padding)
+    
+    def exp(self):
+        return self.getBox().exp()
+    
+    def abs(self):
+        return self.getBox().abs()
+    
+    def cos(self):
+        return self.getBox().cos()
+    
+    def sin(self):
+        return self.getBox().sin()
+
+
+class LinearBounds():
+    '''
+    symbolic linear lower and upper bounds of the values over the input box (CROWN/DeepPoly style relaxations),
+    the input is c_0 + delta_0 * eps, eps in [-1, 1]^E,
+    lower: b_l + eps @ A_l, upper: b_u + eps @ A_u, A_l and A_u: B x E x D, b_l and b_u: B x D
+    the same methods as Box for the functions inside the networks, the other methods go through the Box hull
+    '''
+    def __init__(self, A_l, b_l, A_u, b_u):
+        self.A_l, self.b_l = A_l, b_l
+        self.A_u, self.b_u = A_u, b_u
+    
+    def new(self, A_l, b_l, A_u, b_u):
+        return self.__class__(A_l, b_l, A_u, b_u)
+    
+    @classmethod
+    def from_box(cls, box):
+        # one input variable per dimension with a width
+        width_idx = torch.nonzero(torch.any(box.delta != 0, 0)).flatten()
+        A = torch.diag_embed(box.delta)[:, width_idx, :]
+        return cls(A, box.c, A, box.c)
+    
+    def clone(self):
+        return self.new(self.A_l.clone(), self.b_l.clone(), self.A_u.clone(), self.b_u.clone())
+    
+    def getLeft(self):
+        return self.b_l - self.A_l.abs().sum(1)
+    
+    def getRight(self):
+        return self.b_u + self.A_u.abs().sum(1)
+    
+    def getBox(self):
+        l, r = self.getLeft(), self.getRight()
+        return Box((r + l) / 2, (r - l) / 2)
+    
+    def getInterval(self):
+        return Interval(self.getLeft(), self.getRight())
+    
+    def select_from_index(self, dim, idx):
+        return self.new(
+            torch.index_select(self.A_l, dim + 1, idx), torch.index_select(self.b_l, dim, idx),
+            torch.index_select(self.A_u, dim + 1, idx), torch.index_select(self.b_u, dim, idx),
+        )
+    
+    def matmul(self, other):
+        # the lower bound takes the lower bounds of the positive weights and the upper bounds of the negative weights
+        pos, neg = other.clamp(min=0), other.clamp(max=0)
+        return self.new(
+            self.A_l.matmul(pos) + self.A_u.matmul(neg), self.b_l.matmul(pos) + self.b_u.matmul(neg),
+            self.A_u.matmul(pos) + self.A_l.matmul(neg), self.b_u.matmul(pos) + self.b_l.matmul(neg),
+        )
+    
+    def add(self, other):
+        if isinstance(other, torch.Tensor):
+            return self.new(self.A_l, self.b_l + other, self.A_u, self.b_u + other)
+        if isinstance(other, LinearBounds):
+            return self.new(self.A_l + other.A_l, self.b_l + other.b_l, self.A_u + other.A_u, self.b_u + other.b_u)
+        return self.new(self.A_l, self.b_l + other.getLeft(), self.A_u, self.b_u + other.getRight())
+    
+    def sub_l(self, other): # self - other
+        if isinstance(other, torch.Tensor):
+            return self.add(-other)
+        return self.add(other.mul(const(-1.0)))
+    
+    def sub_r(self, other): # other - self
+        return self.mul(const(-1.0)).add(other)
+    
+    def mul(self, other):
+        if isinstance(other, torch.Tensor):
+            pos, neg = other.clamp(min=0), other.clamp(max=0)
+            # a B x D factor is per state, broadcast over the input variables of A, B x E x D
+            A_pos, A_neg = (pos.unsqueeze(1), neg.unsqueeze(1)) if other.dim() == 2 else (pos, neg)
+            return self.new(
+                self.A_l * A_pos + self.A_u * A_neg, self.b_l * pos + self.b_u * neg,
+                self.A_u * A_pos + self.A_l * A_neg, self.b_u * pos + self.b_l * neg,
+            )
+        return self.getBox().mul(other)
+    
+    def linear_relaxation(self, lower_slope, lower_intercept, upper_slope, upper_intercept):
+        # the slopes are non-negative, so the lower bound of the output only uses the lower bound of the input
+        return self.new(
+            lower_slope.unsqueeze(1) * self.A_l, lower_slope * self.b_l + lower_intercept,
+            upper_slope.unsqueeze(1) * self.A_u, upper_slope * self.b_u + upper_intercept,
+        )
+    
+    def relu(self):
+        l, r = self.getLeft(), self.getRight()
+        zeros, ones = torch.zeros_like(l), torch.ones_like(l)
+        cross_idx = torch.logical_and(l < 0, r > 0)
+        # upper: the line through (l, 0) and (r, r), lower: 0 or x, whichever has the smaller area
+        upper_slope = torch.where(l >= 0, ones, torch.where(r <= 0, zeros, r / (r - l).clamp(min=float(EPSILON))))
+        upper_intercept = torch.where(cross_idx, -upper_slope * l, zeros)
+        lower_slope = torch.where(l >= 0, ones, torch.where(torch.logical_and(cross_idx, r > -l), ones, zeros))
+        return self.linear_relaxation(lower_slope, zeros, upper_slope, upper_intercept)
+    
+    def s_shaped(self, f, df):
+        # sigmoid and tanh, parallel lines with the smaller derivative at the bounds
+        l, r = self.getLeft(), self.getRight()
+        lam = torch.min(df(l), df(r))
+        g_l, g_r = f(l) - lam * l, f(r) - lam * r
+        return self.linear_relaxation(lam, torch.min(g_l, g_r), lam, torch.max(g_l, g_r))
+    
+    def sigmoid(self):
+        return self.s_shaped(torch.sigmoid, lambda x: torch.sigmoid(x) * (1 - torch.sigmoid(x)))
+    
+    def tanh(self):
+        return self.s_shaped(torch.tanh, lambda x: 1 - torch.tanh(x) ** 2)
+    
+    def sigmoid_linear(self, sig_range):
+        return self.getBox().sigmoid_linear(sig_range)
+    
+    def conv(self, weight, bias, padding):
+        return self.getBox().conv(weight, bias, padding)
+    
+    def exp(self):
+        return self.getBox().exp()
+    
+    def abs(self):
+        return self.getBox().abs()
+    
+    def cos(self):
+        return self.getBox().cos()
+    
+    def sin(self):
+        return self.getBox().sin()
+
+
 class Zonotope:
     def __init__(self, left=0.0, right=0.0):
         self.center = var((left + right)/2.0)
@@ -719,7 +979,7 @@ class Zonotope:
             largest_l = max(l1, l2)
             shortest_l = min(l1, l2)
             for i in range(largest_l - res_l):
-                res.alpha_i.append(var(0.0)) # take spaces
+                res.alpha_i.append(const(0.0)) # take spaces
 
             for i in range(shortest_l):
                 res.alpha_i[i] = self.alpha_i[i].add(y.alpha_i[i])
@@ -750,13 +1010,13 @@ class Zonotope:
             largest_l = max(l1, l2)
             shortest_l = min(l1, l2)
             for i in range(largest_l - res_l):
-                res.alpha_i.append(var(0.0)) # take spaces
+                res.alpha_i.append(const(0.0)) # take spaces
 
             for i in range(shortest_l):
                 res.alpha_i[i] = self.alpha_i[i].sub(y.alpha_i[i])
             if l1 < l2:
                 for i in range(l1, l2):
-                    res.alpha_i[i] = var(0.0).sub(y.alpha_i[i])
+                    res.alpha_i[i] = const(0.0).sub(y.alpha_i[i])
             else:
                 for i in range(l2, l1):
                     res.alpha_i[i] = self.alpha_i[i]
@@ -783,7 +1043,7 @@ class Zonotope:
             largest_l = max(l1, l2)
             shortest_l = min(l1, l2)
             for i in range(largest_l - res_l):
-                res.alpha_i.append(var(0.0)) # take spaces
+                res.alpha_i.append(const(0.0)) # take spaces
 
             for i in range(shortest_l):
                 res.alpha_i[i] = y.alpha_i[i].sub(self.alpha_i[i])
@@ -792,7 +1052,7 @@ class Zonotope:
                     res.alpha_i[i] = y.alpha_i[i]
             else:
                 for i in range(l2, l1):
-                    res.alpha_i[i] = var(0.0).sub(self.alpha_i[i])
+                    res.alpha_i[i] = const(0.0).sub(self.alpha_i[i])
         # print('after sub_r', res.getInterval().left, res.getInterval().right)
         if isinstance(y, torch.Tensor):
             res = self.getInterval().sub_r(y).getZonotope()
@@ -815,7 +1075,7 @@ class Zonotope:
 
     def div(self, y):
         tmp_res = self.getInterval()
-        tmp_res = tmp_res.div(var(1.0))
+        tmp_res = tmp_res.div(const(1.0))
         res = tmp_res.getZonotope().mul(y)
         
         return res
@@ -855,7 +1115,7 @@ class Zonotope:
             l1 = self.getCoefLength()
             l2 = y.getCoefLength()
             for i in range(max(l1, l2)):
-                res.alpha_i.append(var(0.0))
+                res.alpha_i.append(const(0.0))
             
             tmp_interval_2 = y.getInterval()
             m = tmp_interval_2.left
@@ -893,7 +1153,7 @@ class Zonotope:
             l1 = self.getCoefLength()
             l2 = y.getCoefLength()
             for i in range(max(l1, l2)):
-                res.alpha_i.append(var(0.0))
+                res.alpha_i.append(const(0.0))
             
             tmp_interval_2 = y.getInterval()
             m = tmp_interval_2.left
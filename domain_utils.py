@@ -1,49 +1,388 @@
-
 import torch
 import domain
 
+import constants
+from fused_mlp import fused_mlp
+
+
+class SymbolicStates():
+    '''
+    Structure-of-arrays states of a batch of B symbolic states
+    x: Box, B x D
+    trajectories_l, trajectories_r: B x T x K, preallocated, T is the capacity and grows when full
+    trajectory_length: int64 tensor, B, the number of recorded steps of each state
+    max_length: python int, upper bound of trajectory_length, no host sync to get it
+    idx_list: int64 tensor, B, the index of the component a state comes from
+    p_list: B, log probability of the sampled path
+    multiplicity: int64 tensor, B, the number of sampled paths sharing the state, all ones if the paths are not shared
+    safety: None, or B x N x 3 when the safety loss of the N targets is accumulated at each step instead of storing the trajectories,
+        the running unsafe penalty, the min lower bound and the max upper bound of the measured steps
+    '''
+    def __init__(self, x, trajectories_l, trajectories_r, trajectory_length, max_length, idx_list, p_list, multiplicity=None, safety=None, target=None):
+        self.x = x
+        self.trajectories_l = trajectories_l
+        self.trajectories_r = trajectories_r
+        self.trajectory_length = trajectory_length
+        self.max_length = max_length
+        self.idx_list = idx_list
+        self.p_list = p_list
+        self.multiplicity = torch.ones_like(idx_list) if multiplicity is None else multiplicity
+        self.safety = safety
+        self.target = target
+
+    def __len__(self):
+        return self.x.c.shape[0]
+
+    def new(self, x, trajectories_l, trajectories_r, trajectory_length, max_length, idx_list, p_list, multiplicity=None, safety=None):
+        return self.__class__(x, trajectories_l, trajectories_r, trajectory_length, max_length, idx_list, p_list, multiplicity, safety, self.target)
+
+    def select_columns(self, columns):
+        # keep the columns of x, the trajectories are not changed
+        columns = torch.tensor(columns, device=self.x.c.device)
+        return self.new(
+            domain.Box(self.x.c[:, columns], self.x.delta[:, columns]),
+            self.trajectories_l,
+            self.trajectories_r,
+            self.trajectory_length,
+            self.max_length,
+            self.idx_list,
+            self.p_list,
+            self.multiplicity,
+            self.safety,
+        )
+
+    def clone(self):
+        return self.new(
+            self.x.clone(),
+            self.trajectories_l.clone(),
+            self.trajectories_r.clone(),
+            self.trajectory_length.clone(),
+            self.max_length,
+            self.idx_list.clone(),
+            self.p_list.clone(),
+            self.multiplicity.clone(),
+            None if self.safety is None else self.safety.clone(),
+        )
+
+    def select(self, index):
+        # gather the states, index is a boolean mask or an int64 index tensor over the batch
+        return self.new(
+            domain.Box(self.x.c[index], self.x.delta[index]),
+            self.trajectories_l[index],
+            self.trajectories_r[index],
+            self.trajectory_length[index],
+            self.max_length,
+            self.idx_list[index],
+            self.p_list[index],
+            self.multiplicity[index],
+            None if self.safety is None else self.safety[index],
+        )
+
+    def scatter(self, index, other):
+        # write the states of other back to the rows in index
+        self.reserve(other.max_length, other.trajectories_l.shape[2])
+        other_l, other_r = align_trajectories(other, self.trajectories_l.shape[1], self.trajectories_l.shape[2])
+        self.x.c[index] = other.x.c
+        self.x.delta[index] = other.x.delta
+        self.trajectories_l[index] = other_l
+        self.trajectories_r[index] = other_r
+        self.trajectory_length[index] = other.trajectory_length
+        self.max_length = max(self.max_length, other.max_length)
+        self.idx_list[index] = other.idx_list
+        self.p_list[index] = other.p_list
+        self.multiplicity[index] = other.multiplicity
+        if self.safety is not None:
+            self.safety[index] = other.safety
+        return self
+
+    def reserve(self, length, K):
+        # make sure there is space for length steps of K values
+        B, T, old_K = self.trajectories_l.shape
+        if length <= T and K <= old_K:
+            return
+        new_T = max(T, constants.TRAJECTORY_CAPACITY)
+        while new_T < length:
+            new_T *= 2
+        self.trajectories_l, self.trajectories_r = align_trajectories(self, new_T, max(K, old_K))
+
+    def record(self, left, right):
+        # append one step (B x K) to the trajectory of each state
+        B, K = left.shape
+        self.reserve(self.max_length + 1, K)
+        batch_idx = torch.arange(B, device=left.device)
+        self.trajectories_l[batch_idx, self.trajectory_length] = left
+        self.trajectories_r[batch_idx, self.trajectory_length] = right
+        self.trajectory_length = self.trajectory_length + 1
+        self.max_length += 1
+        return self
+
+    def where(self, mask, other):
+        # row-wise select, the i-th state is from self if mask[i] else from other
+        T = max(self.trajectories_l.shape[1], other.trajectories_l.shape[1])
+        K = max(self.trajectories_l.shape[2], other.trajectories_l.shape[2])
+        self_l, self_r = align_trajectories(self, T, K)
+        other_l, other_r = align_trajectories(other, T, K)
+        x_mask, trajectory_mask = mask[:, None], mask[:, None, None]
+        return self.new(
+            domain.Box(torch.where(x_mask, self.x.c, other.x.c), torch.where(x_mask, self.x.delta, other.x.delta)),
+            torch.where(trajectory_mask, self_l, other_l),
+            torch.where(trajectory_mask, self_r, other_r),
+            torch.where(mask, self.trajectory_length, other.trajectory_length),
+            max(self.max_length, other.max_length),
+            torch.where(mask, self.idx_list, other.idx_list),
+            torch.where(mask, self.p_list, other.p_list),
+            torch.where(mask, self.multiplicity, other.multiplicity),
+            None if self.safety is None else torch.where(mask[:, None, None], self.safety, other.safety),
+        )
+
+    def start_safety_loss(self, target):
+        # accumulate the safety loss at each step from now on, the trajectories are not stored
+        B, N = len(self), len(target)
+        self.target = target
+        self.safety = torch.zeros((B, N, 3), device=self.x.c.device)
+        self.safety[:, :, 1], self.safety[:, :, 2] = 100000, -100000
+        return self
+
+    def accumulate_safety(self, left, right):
+        # measure one step (B x K) against the targets
+        step = self.trajectory_length
+        safety_list = list()
+        for target_idx, target_component in enumerate(self.target):
+            l, r = left[:, target_idx], right[:, target_idx]
+            # the first step is not measured for distance
+            measured = torch.ones_like(step, dtype=torch.bool)
+            if target_component['distance']:
+                l, r = distance_transform(l, r)
+                measured = step > 0
+            safe_intervals = stack_safe_intervals(target_component)
+            if target_component["map_mode"] is True:
+                # the steps past the constraints of map_condition are not measured
+                measured = torch.logical_and(measured, step < safe_intervals.shape[0])
+            # B x M x 2, the constraint over the step of each state, the one condition if not in map mode
+            safe_intervals = safe_intervals[torch.clamp(step, max=safe_intervals.shape[0] - 1)]
+            unsafe_value = interval_unsafe_value(l.unsqueeze(1), r.unsqueeze(1), safe_intervals[:, :, 0], safe_intervals[:, :, 1])
+            unsafe_value = torch.min(unsafe_value, 1)[0]
+            safety = self.safety[:, target_idx]
+            # the range is not differentiated
+            min_l, max_r = safety[:, 1].detach(), safety[:, 2].detach()
+            safety_list.append(torch.stack((
+                safety[:, 0] + torch.where(measured, unsafe_value, torch.zeros_like(unsafe_value)),
+                torch.where(measured, torch.min(min_l, l.detach()), min_l),
+                torch.where(measured, torch.max(max_r, r.detach()), max_r),
+            ), 1))
+        self.safety = torch.stack(safety_list, 1)
+        self.trajectory_length = self.trajectory_length + 1
+        self.max_length += 1
+        return self
+
+    def get_trajectories(self):
+        # B x max_length x K, steps after trajectory_length of a state are padding
+        return self.trajectories_l[:, :self.max_length], self.trajectories_r[:, :self.max_length]
+
+
+def initialize_states(x):
+    B, D = x.c.shape
+    device = x.c.device
+    trajectories_l = torch.zeros((B, 0, 0), device=device)
+    trajectories_r = torch.zeros((B, 0, 0), device=device)
+    states = SymbolicStates(
+        x=x,
+        trajectories_l=trajectories_l,
+        trajectories_r=trajectories_r,
+        trajectory_length=torch.zeros(B, dtype=torch.long, device=device),
+        max_length=0,
+        idx_list=torch.arange(B, device=device),
+        p_list=torch.zeros(B, device=device), # use the log_p here, so start from 0.0
+    )
+    return states
+
+
+def align_trajectories(states, T, K):
+    # pad the trajectories of states to B x T x K
+    trajectories_l, trajectories_r = states.trajectories_l, states.trajectories_r
+    B, old_T, old_K = trajectories_l.shape
+    if old_T == T and old_K == K:
+        return trajectories_l, trajectories_r
+    new_trajectories_l = torch.zeros((B, T, K), device=trajectories_l.device)
+    new_trajectories_r = torch.zeros((B, T, K), device=trajectories_r.device)
+    new_trajectories_l[:, :old_T, :old_K] = trajectories_l
+    new_trajectories_r[:, :old_T, :old_K] = trajectories_r
+    return new_trajectories_l, new_trajectories_r
+
 
 def concatenate_states(states1, states2):
     if len(states1) == 0:
         return states2
     if len(states2) == 0:
         return states1
-    
-    # x, trajectories, idx_list, p_list
-    res_c, res_delta = torch.cat((states1['x'].c, states2['x'].c), 0), torch.cat((states1['x'].delta, states2['x'].delta), 0)
-    res_states = {
-        'x': domain.Box(res_c, res_delta),
-        'trajectories_l': states1['trajectories_l'] + states2['trajectories_l'],
-        'trajectories_r': states1['trajectories_r'] + states2['trajectories_r'],
-        'idx_list': states1['idx_list'] + states2['idx_list'],
-        'p_list': states1['p_list'] + states2['p_list'],
-    }
-    return res_states
+    return concatenate_states_list([states1, states2])
 
 
 def concatenate_states_list(states_list):
     # check needed, cause pre-selected as a states
+    states_list = [states for states in states_list if len(states) > 0]
     if len(states_list) == 0:
+        return dict()
+    if len(states_list) == 1:
         return states_list[0]
-    c_list, delta_list, trajectories_l_list, trajectories_r_list, idx_list, p_list = list(), list(), list(), list(), list(), list()
+    T = max([states.trajectories_l.shape[1] for states in states_list])
+    K = max([states.trajectories_l.shape[2] for states in states_list])
+    c_list, delta_list, trajectories_l_list, trajectories_r_list = list(), list(), list(), list()
     for states in states_list:
-        c_list.append(states['x'].c)
-        delta_list.append(states['x'].delta)
-        trajectories_l_list.append(states['trajectories_l'])
-        trajectories_r_list.append(states['trajectories_r'])
-        idx_list.append(states['idx_list'])
-        p_list.append(states['p_list'])
-    res_c, res_delta = torch.cat(c_list, 0), torch.cat(delta_list)
-    # res_c, res_delta = torch.cat([states['x'].c for states in states_list], 0), \
-    #     torch.cat([states['x'].delta for states in states_list])
-    # trajectories_list = [states['trajectories'] for states in states_list]
-    # idx_list = [states['idx_list'] for states in states_list]
-    # p_list = [states['p_list'] for states in states_list]
-    res_states = {
-        'x': domain.Box(res_c, res_delta),
-        'trajectories_l': sum(trajectories_l_list, []),
-        'trajectories_r': sum(trajectories_r_list, []),
-        'idx_list': sum(idx_list, []),
-        'p_list': sum(p_list, []),
-    }
+        c_list.append(states.x.c)
+        delta_list.append(states.x.delta)
+        trajectories_l, trajectories_r = align_trajectories(states, T, K)
+        trajectories_l_list.append(trajectories_l)
+        trajectories_r_list.append(trajectories_r)
+    res_states = SymbolicStates(
+        x=domain.Box(torch.cat(c_list, 0), torch.cat(delta_list, 0)),
+        trajectories_l=torch.cat(trajectories_l_list, 0),
+        trajectories_r=torch.cat(trajectories_r_list, 0),
+        trajectory_length=torch.cat([states.trajectory_length for states in states_list], 0),
+        max_length=max([states.max_length for states in states_list]),
+        idx_list=torch.cat([states.idx_list for states in states_list], 0),
+        p_list=torch.cat([states.p_list for states in states_list], 0),
+        multiplicity=torch.cat([states.multiplicity for states in states_list], 0),
+        safety=None if states_list[0].safety is None else torch.cat([states.safety for states in states_list], 0),
+        target=states_list[0].target,
+    )
     return res_states
+
+
+def sound_join_states(states_list, join_trajectories=True):
+    '''
+    sound join of the states with the same idx_list in one pass, the result is sorted by idx_list
+    the boxes of the same component are joined by the min of the lower bounds and the max of the upper bounds
+    join_trajectories: the steps of the trajectories are joined in the same way, 
+    otherwise a step is taken from the first trajectory that covers it (training)
+    '''
+    states_list = [states for states in states_list if len(states) > 0]
+    if len(states_list) == 0:
+        return dict()
+    if len(states_list) == 1:
+        return states_list[0]
+    states = concatenate_states_list(states_list)
+    x = states.x
+    N, D = x.c.shape
+    _, T, K = states.trajectories_l.shape
+    device = x.c.device
+
+    idx_list, inverse = torch.unique(states.idx_list, sorted=True, return_inverse=True)
+    U = idx_list.shape[0]
+    position = torch.arange(N, device=device)
+    # the rank of each state in its component, the states of a component are padded to G rows
+    inverse_sorted, order = torch.sort(inverse, stable=True)
+    count = torch.bincount(inverse, minlength=U)
+    start = torch.cumsum(count, 0) - count
+    first = order[start]
+    rank = torch.empty_like(position)
+    rank[order] = position - start[inverse_sorted]
+    G = int(count.max())
+    def group_reduce(values, fill, reduce):
+        padded = values.new_full((U, G) + tuple(values.shape[1:]), fill)
+        padded[inverse, rank] = values
+        return padded.amin(1) if reduce == 'amin' else padded.amax(1)
+
+    # a component from one side only keeps its box
+    joined_left = group_reduce(x.c - x.delta, float('inf'), 'amin')
+    joined_right = group_reduce(x.c + x.delta, float('-inf'), 'amax')
+    joined = (count > 1).unsqueeze(1)
+    c = torch.where(joined, (joined_left + joined_right) / 2.0, x.c[first])
+    delta = torch.where(joined, (joined_right - joined_left) / 2.0, x.delta[first])
+
+    # the steps after the shortest trajectory are from the longer ones
+    trajectory_length = group_reduce(states.trajectory_length, -1, 'amax')
+    step = torch.arange(T, device=device)
+    valid = step.unsqueeze(0) < states.trajectory_length.unsqueeze(1)
+    if join_trajectories:
+        valid = valid.unsqueeze(2)
+        trajectories_l = group_reduce(states.trajectories_l.masked_fill(~valid, float('inf')), float('inf'), 'amin')
+        trajectories_r = group_reduce(states.trajectories_r.masked_fill(~valid, float('-inf')), float('-inf'), 'amax')
+        recorded = (step.unsqueeze(0) < trajectory_length.unsqueeze(1)).unsqueeze(2)
+        trajectories_l = torch.where(recorded, trajectories_l, torch.zeros_like(trajectories_l))
+        trajectories_r = torch.where(recorded, trajectories_r, torch.zeros_like(trajectories_r))
+    else:
+        source = position.unsqueeze(1).expand(N, T).masked_fill(~valid, N)
+        source = group_reduce(source, N, 'amin')
+        source = torch.where(source < N, source, first.unsqueeze(1))
+        trajectories_l = states.trajectories_l[source, step.unsqueeze(0)]
+        trajectories_r = states.trajectories_r[source, step.unsqueeze(0)]
+
+    res_states = SymbolicStates(
+        x=domain.Box(c, delta),
+        trajectories_l=trajectories_l,
+        trajectories_r=trajectories_r,
+        trajectory_length=trajectory_length,
+        max_length=states.max_length,
+        idx_list=idx_list,
+        p_list=states.p_list[first],
+        multiplicity=states.multiplicity[first],
+    )
+    return res_states
+
+
+# id of a target component: (the component, its stacked safe intervals), the component is kept so that its id is not reused
+# cleared when the targets are rebuilt
+SAFE_INTERVALS = dict()
+
+
+def stack_safe_intervals(target_component):
+    # [T, M, 2]: the M alternative safe intervals of each step, built once per target, the intervals are constants
+    cached = SAFE_INTERVALS.get(id(target_component))
+    if cached is None or cached[0] is not target_component:
+        with torch.no_grad():
+            if target_component["map_mode"] is True:
+                safe_interval_list = target_component["map_condition"]
+                M = max(len(safe_interval_sub_list) for safe_interval_sub_list in safe_interval_list)
+                safe_intervals = list()
+                for safe_interval_sub_list in safe_interval_list:
+                    # pad with the first interval, the min over the intervals is unchanged
+                    safe_interval_sub_list = safe_interval_sub_list + [safe_interval_sub_list[0]] * (M - len(safe_interval_sub_list))
+                    safe_intervals.append(torch.stack([torch.stack((safe_interval.left, safe_interval.right)) for safe_interval in safe_interval_sub_list]))
+                safe_intervals = torch.stack(safe_intervals)
+            else:
+                safe_interval = target_component["condition"]
+                safe_intervals = torch.stack((safe_interval.left, safe_interval.right)).view(1, 1, 2)
+        cached = (target_component, safe_intervals)
+        SAFE_INTERVALS[id(target_component)] = cached
+    return cached[1]
+
+
+def clear_safe_intervals():
+    # the targets are rebuilt, the cached components would be kept alive otherwise
+    SAFE_INTERVALS.clear()
+
+
+def distance_transform(pre_l, pre_r):
+    # the interval of the absolute value
+    zeros = torch.zeros_like(pre_l)
+    all_neg_index = torch.logical_and(pre_l<0, pre_r<=0)
+    across_index = torch.logical_and(pre_l<0, pre_r>0)
+    all_pos_index = torch.logical_and(pre_l>=0, pre_r>0)
+    l = torch.where(all_neg_index, pre_r.abs(), torch.where(across_index, torch.max(pre_l, zeros), torch.where(all_pos_index, pre_l, zeros)))
+    r = torch.where(all_neg_index, pre_l.abs(), torch.where(across_index, torch.max(pre_l.abs(), pre_r), torch.where(all_pos_index, pre_r, zeros)))
+    return l, r
+
+
+def interval_unsafe_value(l, r, safe_interval_l, safe_interval_r):
+    # distance to the safe interval if they do not intersect, otherwise the unsafe portion of [l, r]
+    intersection_l, intersection_r = torch.max(l, safe_interval_l), torch.min(r, safe_interval_r)
+    empty_value = torch.max(l - safe_interval_r, safe_interval_l - r) + 1.0
+    other_value = 1 - (intersection_r - intersection_l + constants.eps) / (r - l + constants.eps)
+    return torch.where(intersection_r < intersection_l, empty_value, other_value)
+
+
+def apply_function(f, x):
+    # the functions of the Assigns, the networks run in constants.nn_domain and return a Box
+    if constants.nn_domain != 'box' and isinstance(f, torch.nn.Module):
+        nn_domain = {
+            'zonotope': domain.BatchZonotope,
+            'crown': domain.LinearBounds,
+        }[constants.nn_domain]
+        res = f(nn_domain.from_box(x))
+        return res.getBox() if isinstance(res, nn_domain) else res
+    if constants.fused_mlp and isinstance(f, torch.nn.Module):
+        res = fused_mlp(f, x.c, x.delta)
+        if res is not None:
+            return domain.Box(*res)
+    return f(x)
@@ -0,0 +1,207 @@
+'''
+Fused interval forward and backward of a Linear/ReLU/Sigmoid/Tanh network on a Box
+the layers of a network are traced once by running it on an MLPTrace, the networks with any other operation are not fused
+'''
+import torch
+
+
+class NotAnMLP(Exception):
+    pass
+
+
+class MLPTrace():
+    # records the operations the network applies to its input
+    def __init__(self, layers=None):
+        self.layers = list() if layers is None else layers
+
+    def matmul(self, other):
+        if not isinstance(other, torch.Tensor) or len(other.shape) != 2:
+            raise NotAnMLP("matmul")
+        self.layers.append(('matmul', other))
+        return self
+
+    def add(self, other):
+        if not isinstance(other, torch.Tensor) or len(other.shape) != 1 or len(self.layers) == 0 or self.layers[-1][0] != 'matmul':
+            raise NotAnMLP("add")
+        self.layers.append(('add', other))
+        return self
+
+    def relu(self):
+        self.layers.append(('relu', None))
+        return self
+
+    def sigmoid(self):
+        self.layers.append(('sigmoid', None))
+        return self
+
+    def tanh(self):
+        self.layers.append(('tanh', None))
+        return self
+
+    def __getattr__(self, name):
+        raise NotAnMLP(name)
+
+
+def trace_mlp(f):
+    # the layers of f: list of (kind, index of the weight and bias in params), params, None if f is not such a network
+    try:
+        res = f(MLPTrace())
+    except NotAnMLP:
+        return None
+    if not isinstance(res, MLPTrace) or len(res.layers) == 0:
+        return None
+    layers, params = list(), list()
+    for kind, tensor in res.layers:
+        if kind == 'add':
+            # the bias of the previous matmul
+            layers[-1] = ('linear', layers[-1][1], len(params))
+            params.append(tensor)
+        elif kind == 'matmul':
+            layers.append(('linear', len(params), None))
+            params.append(tensor)
+        else:
+            layers.append((kind, None, None))
+    return layers, params
+
+
+def activation_forward(kind, c, delta):
+    # the bounds in place, (tp + bt) / 2 and (tp - bt) / 2 as Box does
+    tp, bt = c + delta, c - delta
+    if kind == 'relu':
+        tp, bt = tp.relu_(), bt.relu_()
+    elif kind == 'sigmoid':
+        tp, bt = tp.sigmoid_(), bt.sigmoid_()
+    else:
+        tp, bt = tp.tanh_(), bt.tanh_()
+    c = torch.lerp(tp, bt, 0.5)
+    return c, tp - c
+
+
+def activation_backward(kind, c, delta, grad_c, grad_delta):
+    # c, delta: the output of the activation, the derivatives are got from the bounds of the output
+    tp, bt = c + delta, c - delta
+    grad_tp = torch.lerp(grad_c, grad_delta, 0.5)
+    grad_bt = grad_c - grad_tp
+    if kind == 'relu':
+        # 0 at 0 as autograd
+        grad_tp, grad_bt = torch.where(tp > 0, grad_tp, torch.zeros_like(grad_tp)), torch.where(bt > 0, grad_bt, torch.zeros_like(grad_bt))
+    elif kind == 'sigmoid':
+        grad_tp, grad_bt = grad_tp * tp * (1 - tp), grad_bt * bt * (1 - bt)
+    else:
+        grad_tp, grad_bt = grad_tp * (1 - tp * tp), grad_bt * (1 - bt * bt)
+    return grad_tp + grad_bt, grad_tp - grad_bt
+
+
+class FusedMLP(torch.autograd.Function):
+    '''
+    c, delta of the Box through the layers, Box.matmul, Box.add, Box.relu, Box.sigmoid, Box.tanh in one function
+    one c, delta pair is kept per layer for the backward: the input of a linear layer, the output of an activation
+    '''
+    @staticmethod
+    def forward(ctx, layers, c, delta, *params):
+        saved = list()
+        for kind, weight_idx, bias_idx in layers:
+            if kind == 'linear':
+                saved += [c, delta]
+                weight = params[weight_idx]
+                c = c.matmul(weight) if bias_idx is None else torch.addmm(params[bias_idx], c, weight)
+                delta = delta.matmul(weight.abs())
+            else:
+                c, delta = activation_forward(kind, c, delta)
+                saved += [c, delta]
+        ctx.layers = layers
+        ctx.num_saved = len(saved)
+        ctx.save_for_backward(*saved, *params)
+        return c, delta
+
+    @staticmethod
+    def backward(ctx, grad_c, grad_delta):
+        layers = ctx.layers
+        saved, params = ctx.saved_tensors[:ctx.num_saved], ctx.saved_tensors[ctx.num_saved:]
+        params_grad = [None] * len(params)
+        for layer_idx in reversed(range(len(layers))):
+            kind, weight_idx, bias_idx = layers[layer_idx]
+            c, delta = saved[2 * layer_idx], saved[2 * layer_idx + 1]
+            if kind == 'linear':
+                weight = params[weight_idx]
+                if ctx.needs_input_grad[3 + weight_idx]:
+                    params_grad[weight_idx] = c.transpose(0, 1).matmul(grad_c) + torch.sign(weight) * delta.transpose(0, 1).matmul(grad_delta)
+                if bias_idx is not None and ctx.needs_input_grad[3 + bias_idx]:
+                    params_grad[bias_idx] = grad_c.sum(0)
+                grad_c, grad_delta = grad_c.matmul(weight.transpose(0, 1)), grad_delta.matmul(weight.abs().transpose(0, 1))
+            else:
+                grad_c, grad_delta = activation_backward(kind, c, delta, grad_c, grad_delta)
+        return (None, grad_c, grad_delta, *params_grad)
+
+
+def fused_mlp(f, c, delta):
+    # None if f is not a Linear/ReLU/Sigmoid/Tanh network
+    if not hasattr(f, 'mlp_plan'):
+        f.mlp_plan = trace_mlp(f)
+    if f.mlp_plan is None or len(c.shape) != 2:
+        return None
+    layers, params = f.mlp_plan
+    return FusedMLP.apply(layers, c, delta, *params)
+
+
+if __name__ == "__main__":
+    # fused against the layer by layer Box forward and autograd
+    import time
+    import torch.nn as nn
+
+    class Box():
+        def __init__(self, c, delta):
+            self.c, self.delta = c, delta
+        def matmul(self, other):
+            return Box(self.c.matmul(other), self.delta.matmul(other.abs()))
+        def add(self, other):
+            return Box(self.c.add(other), self.delta)
+        def relu(self):
+            tp, bt = torch.relu(self.c + self.delta), torch.relu(self.c - self.delta)
+            return Box((tp + bt) / 2, (tp - bt) / 2)
+        def sigmoid(self):
+            tp, bt = torch.sigmoid(self.c + self.delta), torch.sigmoid(self.c - self.delta)
+            return Box((tp + bt) / 2, (tp - bt) / 2)
+
+    class Linear(nn.Module):
+        def __init__(self, i, o):
+            super().__init__()
+            self.weight, self.bias = nn.Parameter(torch.randn(i, o) / i ** 0.5), nn.Parameter(torch.randn(o))
+        def forward(self, x):
+            return x.matmul(self.weight).add(self.bias)
+
+    class Net(nn.Module):
+        def __init__(self, l):
+            super().__init__()
+            self.linear1, self.linear2, self.linear3 = Linear(4, l), Linear(l, l), Linear(l, 1)
+        def forward(self, x):
+            return self.linear3(self.linear2(self.linear1(x).relu()).relu()).sigmoid()
+
+    torch.manual_seed(0)
+    for B, l in [(1000, 64), (20000, 64), (20000, 256)]:
+        net = Net(l)
+        c, delta = torch.randn(B, 4, requires_grad=True), torch.rand(B, 4, requires_grad=True)
+        res_list = list()
+        for fused in [False, True]:
+            net.zero_grad()
+            c.grad, delta.grad = None, None
+            start_t = time.time()
+            for i in range(10):
+                # the bytes kept for the backward, counted once per tensor
+                saved_tensors = dict()
+                def pack(tensor):
+                    saved_tensors[tensor.data_ptr()] = tensor.numel() * tensor.element_size()
+                    return tensor
+                with torch.autograd.graph.saved_tensors_hooks(pack, lambda tensor: tensor):
+                    if fused:
+                        out_c, out_delta = fused_mlp(net, c, delta)
+                    else:
+                        out = net(Box(c, delta))
+                        out_c, out_delta = out.c, out.delta
+                (out_c.sum() + (out_delta * out_c).sum()).backward()
+            saved_bytes = sum(saved_tensors.values())
+            res_list.append((time.time() - start_t, saved_bytes, out_c, out_delta, [p.grad.clone() for p in net.parameters()] + [c.grad.clone(), delta.grad.clone()]))
+        (t0, m0, c0, d0, g0), (t1, m1, c1, d1, g1) = res_list
+        print(f"B: {B}, l: {l}, box: {t0:.4f} sec. {m0 / 2**20:.1f} MB saved, fused: {t1:.4f} sec. {m1 / 2**20:.1f} MB saved, "
+            f"max output diff: {max(float((c0 - c1).abs().max()), float((d0 - d1).abs().max()))}, "
+            f"max relative grad diff: {max(float((a - b).abs().max() / a.abs().max().clamp(min=1e-12)) for a, b in zip(g0, g1))}")
@@ -8,6 +8,7 @@ import importlib
 from utils import (
     load_model,
 )
+from trajectory_io import open_trajectory_writer
 
 import import_hub as hub
 importlib.reload(hub)
@@ -15,17 +16,14 @@ from import_hub import *
 
 
 def store_trajectory(output_states, trajectory_path, category=None):
-    trajectory_path = trajectory_path + f"_{category}"
-    trajectory_path += ".txt"
-    trajectory_log_file = open(trajectory_path, 'w')
-    trajectory_log_file.write(f"{constants.name_list}\n")
-    for trajectory_idx, trajectory in enumerate(output_states['trajectories']):
-        trajectory_log_file.write(f"trajectory_idx {trajectory_idx}\n")
-        for state in trajectory:
-            for x in state:
-                trajectory_log_file.write(f"{float(x.left)}, {float(x.right)};")
-            trajectory_log_file.write(f"\n")
-    trajectory_log_file.close()
+    trajectory_writer = open_trajectory_writer(trajectory_path + f"_{category}", f"{constants.name_list}", constants.trajectory_format)
+    trajectory_list = list()
+    for trajectory in output_states['trajectories']:
+        trajectory_l = np.array([[float(x.left) for x in state] for state in trajectory])
+        trajectory_r = np.array([[float(x.right) for x in state] for state in trajectory])
+        trajectory_list.append((trajectory_l, trajectory_r))
+    trajectory_writer.append_list(trajectory_list)
+    trajectory_writer.close()
     return 
 
 
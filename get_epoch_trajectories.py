@@ -18,21 +18,13 @@ from utils import (
 from data_loader import (
     load_data,
 )
+from trajectory_io import open_trajectory_writer
 
 
 def store_trajectory(output_states, trajectory_path):
-    trajectory_log_file = open(trajectory_path, 'w')
-    trajectory_log_file.write(f"###\n")
-    for trajectory_idx, trajectory_l in enumerate(output_states['trajectories_l']):
-        trajectory_r = output_states['trajectories_r'][trajectory_idx]
-        trajectory_log_file.write(f"trajectory_idx {trajectory_idx}\n")
-        for state_idx, state_l in enumerate(trajectory_l):
-            state_r = trajectory_r[state_idx]
-            for idx, x_l in enumerate(state_l):
-                x_r = state_r[idx]
-                trajectory_log_file.write(f"{float(x_l)}, {float(x_r)};")
-            trajectory_log_file.write(f"\n")
-    trajectory_log_file.close()
+    trajectory_writer = open_trajectory_writer(trajectory_path, "###", constants.trajectory_format)
+    trajectory_writer.append(*output_states.get_trajectories(), output_states.trajectory_length)
+    trajectory_writer.close()
     return 
 
 
@@ -49,8 +41,9 @@ def is_safe_trajectory(trajectory, safe_range_list):
 def calculate_safety(output_states, safe_range_list):
     total_trajectories = 0
     safe_trajectories = 0
-    for trajectory_idx, trajectory_l in enumerate(output_states['trajectories_l']):
-        trajectory_r = output_states['trajectories_r'][trajectory_idx]
+    trajectories_l, trajectories_r = output_states.get_trajectories()
+    for trajectory_idx, length in enumerate(output_states.trajectory_length.tolist()):
+        trajectory_l, trajectory_r = trajectories_l[trajectory_idx, :length], trajectories_r[trajectory_idx, :length]
         safe_flag = 1
         for state_idx, state_l in enumerate(trajectory_l):
             state_r = trajectory_r[state_idx]
@@ -4,6 +4,7 @@ import torch.nn as nn
 
 from random import shuffle
 from torch.distributions.bernoulli import Bernoulli
+from torch.distributions.binomial import Binomial
 from torch.distributions.categorical import Categorical
 
 import domain
@@ -13,6 +14,8 @@ import constants
 from domain_utils import (
     concatenate_states,
     concatenate_states_list,
+    initialize_states,
+    apply_function,
 )
 
 from utils import (
@@ -114,13 +117,13 @@ class SigmoidLinear(nn.Module):
 Program Statement
 '''
 def calculate_states(target_idx, arg_idx, f, states):
-    x = states['x']
+    x = states.x
     input = x.select_from_index(1, arg_idx)
-    res = f(input)
+    res = apply_function(f, input)
     x.c[:, target_idx] = res.c 
 
     x.delta[:, target_idx] = res.delta
-    states['x'] = x
+    states.x = x
     return states
 
 
@@ -135,9 +138,9 @@ def extract_branch_probability(target, test):
     right_volume_zero_idx = torch.logical_and(right_index, volume_zero)
 
     if constants.score_f == 'hybrid':
-        p_test[left_index] = (torch.min((volume[left_index]) / max((test - target.getLeft()[left_index]), EPSILON), var(1.0)) + var(2.0)) / var(3.0)
-        p_test[cross_idx] = (torch.min((test - target.getLeft()[cross_idx]) / max(volume[cross_idx], EPSILON), var(1.0)) + var(1.0)) / var(3.0)
-        p_test[right_index] = (var(1.0) - torch.min(volume[right_index] / max((target.getRight()[right_index] - test), EPSILON), var(1.0))) / var(3.0)
+        p_test[left_index] = (torch.min((volume[left_index]) / max((test - target.getLeft()[left_index]), EPSILON), const(1.0)) + const(2.0)) / const(3.0)
+        p_test[cross_idx] = (torch.min((test - target.getLeft()[cross_idx]) / max(volume[cross_idx], EPSILON), const(1.0)) + const(1.0)) / const(3.0)
+        p_test[right_index] = (const(1.0) - torch.min(volume[right_index] / max((target.getRight()[right_index] - test), EPSILON), const(1.0))) / const(3.0)
         p_test[left_volume_zero_idx] = 1.0
         p_test[right_volume_zero_idx] = 0.0
     else:
@@ -156,9 +159,15 @@ def sample_from_p(p_left, p_right):
     return left, right
 
 
+def sample_count_from_p(p_left, multiplicity):
+    # the number of the paths sharing a state sampled to the left, one Bernoulli sample per path
+    m = Binomial(total_count=multiplicity.to(p_left.dtype), probs=p_left.squeeze(1))
+    return m.sample().long()
+
+
 def calculate_branch(target_idx, test, states):
     body_states, orelse_states = dict(), dict()
-    x = states['x']
+    x = states.x
     target = x.select_from_index(1, target_idx) # select the batch target from x
 
     # select the idx of left = target.left < test,  right = target.right >= test
@@ -167,7 +176,13 @@ def calculate_branch(target_idx, test, states):
     # split the other
 
     p_left, p_right = extract_branch_probability(target, test)
-    left, right = sample_from_p(p_left, p_right)
+    if constants.share_path_prefix:
+        # the paths sharing a state fork only if their samples differ
+        left_count = sample_count_from_p(p_left, states.multiplicity)
+        right_count = states.multiplicity - left_count
+        left, right = (left_count > 0)[:, None], (right_count > 0)[:, None]
+    else:
+        left, right = sample_from_p(p_left, p_right)
     if constants.debug:
         print(f"test: {test}")
         print(f"target c: {target.c}, delta: {target.delta}")
@@ -175,69 +190,94 @@ def calculate_branch(target_idx, test, states):
         print(f"right probability: {p_right}")
 
     if True in left: # split to left
-        left_idx = left.nonzero(as_tuple=True)[0].tolist()
-        x_left = domain.Box(x.c[left.squeeze(1)], x.delta[left.squeeze(1)])
-        left_target_c, left_target_delta = target.c[left].unsqueeze(1), target.delta[left].unsqueeze(1)
+        left = left.squeeze(1)
+        if constants.debug:
+            print(f"before update: states p_list")
+            print(states.p_list)
+        body_states = states.select(left)
+        left_target_c, left_target_delta = target.c[left], target.delta[left]
         # get the new c, delta
         new_left_target_c = ((left_target_c - left_target_delta) + torch.min((left_target_c + left_target_delta), test)) / 2.0
         new_left_target_delta = (torch.min((left_target_c + left_target_delta), test) - (left_target_c - left_target_delta)) / 2.0
-        x_left.c[:, target_idx:target_idx+1] = new_left_target_c
-        x_left.delta[:, target_idx:target_idx+1] = new_left_target_delta
-
-        if constants.debug:
-            print(f"before update: states p_list")
-            print(states['p_list'])
-        body_states['x'] = x_left
-        body_states['trajectories_l'], body_states['trajectories_r'], body_states['idx_list'], body_states['p_list'] = list(), list(), list(), list()
-        for i in left_idx:
-            body_states['trajectories_l'].append(states['trajectories_l'][i])
-            body_states['trajectories_r'].append(states['trajectories_r'][i])
-            body_states['idx_list'].append(states['idx_list'][i])
-            body_states['p_list'].append(states['p_list'][i] + torch.log(p_left[i]))
+        body_states.x.c[:, target_idx:target_idx+1] = new_left_target_c
+        body_states.x.delta[:, target_idx:target_idx+1] = new_left_target_delta
+        body_states.p_list = body_states.p_list + torch.log(p_left[left].squeeze(1))
+        if constants.share_path_prefix:
+            body_states.multiplicity = left_count[left]
         if constants.debug:
             print(f"after update: body_states p_list")
-            print(body_states['p_list'])
+            print(body_states.p_list)
     
     if True in right: # split to right
-        right_idx = right.nonzero(as_tuple=True)[0].tolist()
-        x_right = domain.Box(x.c[right.squeeze(1)], x.delta[right.squeeze(1)])
-        right_target_c, right_target_delta = target.c[right].unsqueeze(1), target.delta[right].unsqueeze(1)
+        right = right.squeeze(1)
+        if constants.debug:
+            print(f"before update: states p_list")
+            print(states.p_list)
+        orelse_states = states.select(right)
+        right_target_c, right_target_delta = target.c[right], target.delta[right]
 
         new_right_target_c = (torch.max((right_target_c - right_target_delta), test) + (right_target_c + right_target_delta)) / 2.0
         new_right_target_delta = ((right_target_c + right_target_delta) - torch.max((right_target_c - right_target_delta), test)) / 2.0
-        x_right.c[:, target_idx:target_idx+1] = new_right_target_c
-        x_right.delta[:, target_idx:target_idx+1] = new_right_target_delta
-
-        if constants.debug:
-            print(f"before update: states p_list")
-            print(states['p_list'])
-            print(f"right: {right_idx}")
-            print(f"len p_list: {len(states['p_list'])}")
-        orelse_states['x'] = x_right
-        orelse_states['trajectories_l'], orelse_states['trajectories_r'], orelse_states['idx_list'], orelse_states['p_list'] = list(), list(), list(), list()
-        for i in right_idx:
-            orelse_states['trajectories_l'].append(states['trajectories_l'][i])
-            orelse_states['trajectories_r'].append(states['trajectories_r'][i])
-            orelse_states['idx_list'].append(states['idx_list'][i])
-            orelse_states['p_list'].append(states['p_list'][i] + torch.log(p_right[i]))
+        orelse_states.x.c[:, target_idx:target_idx+1] = new_right_target_c
+        orelse_states.x.delta[:, target_idx:target_idx+1] = new_right_target_delta
+        orelse_states.p_list = orelse_states.p_list + torch.log(p_right[right].squeeze(1))
+        if constants.share_path_prefix:
+            orelse_states.multiplicity = right_count[right]
         if constants.debug:
             print(f"after update: orelse_states p_list")
-            print(orelse_states['p_list'])
+            print(orelse_states.p_list)
     
     if constants.debug:
         print(f"body_states p_list")
         if len(body_states) > 0:
-            print(body_states['p_list'])
+            print(body_states.p_list)
         print(f"orelse_states p_list")
         if len(orelse_states) > 0:
-            print(orelse_states['p_list'])
+            print(orelse_states.p_list)
     
     return body_states, orelse_states
 
 
-def extract_branch_probability_list(target, index_mask):
+def clip_branch_masked(states, target, target_idx, test, mask, p, to_left):
+    # the states in mask are clipped to the branch and take its probability
+    # the other states are kept unchanged, so the batch shape is fixed
+    target_c, target_delta = target.c, target.delta
+    if to_left:
+        new_target_l, new_target_r = target_c - target_delta, torch.min((target_c + target_delta), test)
+    else:
+        new_target_l, new_target_r = torch.max((target_c - target_delta), test), target_c + target_delta
+    x_mask = mask[:, None]
+    states.x.c[:, target_idx:target_idx+1] = torch.where(x_mask, (new_target_l + new_target_r) / 2.0, target_c)
+    states.x.delta[:, target_idx:target_idx+1] = torch.where(x_mask, (new_target_r - new_target_l) / 2.0, target_delta)
+    # log(1.0) for the unselected states, avoid the nan gradient from log(0.0)
+    states.p_list = states.p_list + torch.log(torch.where(x_mask, p, torch.ones_like(p))).squeeze(1)
+    return states
+
+
+def calculate_branch_masked(target_idx, test, states, active=None):
+    # both branches keep all the states, left marks the states sampled to the body
+    target = states.x.select_from_index(1, target_idx)
+    p_left, p_right = extract_branch_probability(target, test)
+    left, right = sample_from_p(p_left, p_right)
+    left, right = left.squeeze(1), right.squeeze(1)
+    if active is not None:
+        left, right = torch.logical_and(left, active), torch.logical_and(right, active)
+    if constants.debug:
+        print(f"test: {test}")
+        print(f"target c: {target.c}, delta: {target.delta}")
+        print(f"left probability: {p_left}")
+        print(f"right probability: {p_right}")
+
+    body_states = clip_branch_masked(states.clone(), target, target_idx, test, left, p_left, True)
+    orelse_states = clip_branch_masked(states, target, target_idx, test, right, p_right, False)
+
+    return body_states, orelse_states, left
+
+
+def extract_branch_probability_list(target, index_mask, multiplicity=None):
     # volume_based probability assignment
     # return a list of boolean tensor where the k-th boolean tensor represents the states fall into the k-th branch
+    # and the number of the paths of each state sampled to each branch
     zeros = torch.zeros(index_mask.shape)
     branch = torch.zeros(index_mask.shape, dtype=torch.bool)
     if torch.cuda.is_available():
@@ -264,48 +304,65 @@ def extract_branch_probability_list(target, index_mask):
         p_volume = pre_score / sumed_score
         
     m = Categorical(p_volume)
-    res = m.sample()
-    branch[(torch.arange(p_volume.size(0)), res)] = True
+    if multiplicity is None:
+        res = m.sample()
+        branch[(torch.arange(p_volume.size(0)), res)] = True
+        count = branch.long()
+    else:
+        # one sample per path, the samples after the multiplicity of a state are dropped
+        res = m.sample((int(torch.max(multiplicity)),))
+        valid = torch.arange(res.shape[0], device=res.device)[:, None] < multiplicity[None, :]
+        count = F.one_hot(res, p_volume.shape[1]).mul(valid[:, :, None]).sum(0)
+        branch = count > 0
     p_volume = torch.where(branch, p_volume, zeros)
 
-    return branch, p_volume
+    return branch, p_volume, count
 
 
-def assign_states(states, branch, p_volume):
+def assign_states(states, branch, p_volume, count):
     # K batches, M branches, # no change to the x itself
     K, M = branch.shape
     states_list = list()
-    x = states['x']
 
     for i in range(M):
         new_states = dict()
         p = p_volume[:, i]
         this_branch = branch[:, i]
         if True in this_branch:
-            this_idx = this_branch.nonzero(as_tuple=True)[0].tolist()
-            x_this = domain.Box(x.c[this_branch], x.delta[this_branch])
-            new_states['x'] = x_this
-            new_states['trajectories_l'] = [states['trajectories_l'][idx] for idx in this_idx]
-            new_states['trajectories_r'] = [states['trajectories_r'][idx] for idx in this_idx]
-            new_states['idx_list'] = [states['idx_list'][idx] for idx in this_idx]
-            new_states['p_list'] = [states['p_list'][idx].add(torch.log(p[idx])) for idx in this_idx]
+            new_states = states.select(this_branch)
+            new_states.p_list = new_states.p_list.add(torch.log(p[this_branch]))
+            new_states.multiplicity = count[this_branch, i]
         states_list.append(new_states)
 
     return states_list 
 
 
+def assign_states_masked(states, branch, p_volume, branch_list):
+    # run every branch on all the states, then select the sampled one for each state
+    K, M = branch.shape
+    res_states = None
+    for i in range(M):
+        this_branch = branch[:, i]
+        p = p_volume[:, i]
+        new_states = states.clone() if i < M - 1 else states
+        new_states.p_list = new_states.p_list + torch.log(torch.where(this_branch, p, torch.ones_like(p)))
+        new_states = branch_list[i](new_states)
+        res_states = new_states if res_states is None else new_states.where(this_branch, res_states)
+    return res_states
+
+
 def calculate_branches(arg_idx, states):
 
-    x = states['x']
+    x = states.x
     target = x.select_from_index(1, arg_idx)
     # index_mask is a boolean tensor
     index_mask = select_argmax(target.c - target.delta, target.c + target.delta)
     # no split of boxes/states, only use the volume based probability distribution
     # branch: boolean tensor k-th colume represents the k-th branch, 
     # p_volume: real tensor, k-th column represents the probability to select the k-th branch(after samping)
-    branch, p_volume = extract_branch_probability_list(target, index_mask)
+    branch, p_volume, count = extract_branch_probability_list(target, index_mask, states.multiplicity if constants.share_path_prefix else None)
 
-    states_list = assign_states(states, branch, p_volume)
+    states_list = assign_states(states, branch, p_volume, count)
     return states_list
         
 
@@ -345,6 +402,11 @@ class IfElse(nn.Module):
             self.target_idx = self.target_idx.cuda()
     
     def forward(self, states):
+        if constants.masked_branch:
+            body_states, orelse_states, left = calculate_branch_masked(self.target_idx, self.test, states)
+            body_states = self.body(body_states)
+            orelse_states = self.orelse(orelse_states)
+            return body_states.where(left, orelse_states)
 
         body_states, orelse_states = calculate_branch(self.target_idx, self.test, states)
         if len(body_states) > 0:
@@ -367,6 +429,12 @@ class ArgMax(nn.Module):
             self.arg_idx = self.arg_idx.cuda()
     
     def forward(self, states):
+        if constants.masked_branch:
+            target = states.x.select_from_index(1, self.arg_idx)
+            index_mask = select_argmax(target.c - target.delta, target.c + target.delta)
+            branch, p_volume, _ = extract_branch_probability_list(target, index_mask)
+            return assign_states_masked(states, branch, p_volume, self.branch_list)
+
         res_states_list = list()
         states_list = calculate_branches(self.arg_idx, states)
 
@@ -378,16 +446,96 @@ class ArgMax(nn.Module):
         return res_states
 
 
+def find_counter_update(body, counter_idx):
+    # the loop is a counter loop if the counter is only updated by one top-level Assign from itself,
+    # and no branch inside the body touches the counter
+    top_level = list(body.children()) if isinstance(body, nn.Sequential) else [body]
+    counter_update = None
+    for module in body.modules():
+        if isinstance(module, Assign) and counter_idx in module.target_idx.tolist():
+            if counter_update is not None or module not in top_level:
+                return None
+            if module.target_idx.tolist() != [counter_idx] or module.arg_idx.tolist() != [counter_idx]:
+                return None
+            # a trained update would change the trip count of a cached counter value
+            if isinstance(module.f, nn.Module) and any(True for _ in module.f.parameters()):
+                return None
+            counter_update = module
+        if isinstance(module, (IfElse, While)) and counter_idx in module.target_idx.tolist():
+            return None
+    return counter_update
+
+
 class While(nn.Module):
     def __init__(self, target_idx, test, body):
         super().__init__()
         self.target_idx = torch.tensor(target_idx)
         self.test = test
         self.body = body
+        # Assign updating the loop counter, None if the loop is not a counter loop
+        self.counter_update = find_counter_update(body, target_idx[0]) if len(target_idx) == 1 else None
+        self.trip_count_cache = dict()
+        self.compiled_body = None
         if torch.cuda.is_available():
             self.target_idx = self.target_idx.cuda()
     
+    def get_trip_count(self, states):
+        # the counter branch is deterministic if the counter is the same point for all the states,
+        # the trip count is then got by running the counter update on the counter alone
+        if self.counter_update is None or not constants.unroll_loop:
+            return None
+        counter = states.x.select_from_index(1, self.target_idx)
+        if not bool(torch.all(counter.delta == 0.0) and torch.all(counter.c == counter.c[0])):
+            return None
+        # the trip count of the probed initial counter value and the bound of the test
+        start = counter.c[0].item()
+        key = (start, self.test.item())
+        if key not in self.trip_count_cache:
+            probe = domain.Box(counter.c[:1], counter.delta[:1])
+            trip_count = 0
+            while probe.c.item() <= self.test.item() and trip_count <= constants.MAXIMUM_ITERATION:
+                probe = self.counter_update.f(probe)
+                trip_count += 1
+            self.trip_count_cache[key] = trip_count
+        return self.trip_count_cache[key]
+    
+    def get_body(self):
+        if not constants.compile_loop_body:
+            return self.body
+        if self.compiled_body is None:
+            if hasattr(torch, 'compile'):
+                self.compiled_body = torch.compile(self.body)
+            else:
+                print(f"torch.compile is not available in torch {torch.__version__}, run the loop body eagerly")
+                self.compiled_body = self.body
+        return self.compiled_body
+    
+    def forward_unrolled(self, states, trip_count):
+        body = self.get_body()
+        for i in range(trip_count):
+            states = body(states)
+        return states
+    
+    def forward_masked(self, states):
+        # the states leaving the loop stay in the batch and are not updated anymore
+        i = 0
+        active = torch.ones(len(states), dtype=torch.bool, device=states.x.c.device)
+        while True:
+            body_states, states, active = calculate_branch_masked(self.target_idx, self.test, states, active)
+            if not active.any():
+                break
+            states = self.body(body_states).where(active, states)
+            i += 1
+            if i > constants.MAXIMUM_ITERATION:
+                break
+        return states
+    
     def forward(self, states):
+        trip_count = self.get_trip_count(states)
+        if trip_count is not None:
+            return self.forward_unrolled(states, trip_count)
+        if constants.masked_branch:
+            return self.forward_masked(states)
         i = 0
         res_states = dict()
         while(len(states) > 0):
@@ -412,34 +560,12 @@ class Trajectory(nn.Module):
             self.target_idx = self.target_idx.cuda()
     
     def forward(self, states):
-        x = states['x']
-        trajectories_l = states['trajectories_l']
-        trajectories_r = states['trajectories_r']
-        B, D = x.c.shape
-
+        x = states.x
         input = x.select_from_index(1, self.target_idx)
         input_interval = input.getInterval()
-        _, K = input_interval.left.shape
-        for x_idx in range(B):
-            trajectories_l[x_idx].append(input_interval.left[x_idx])
-            trajectories_r[x_idx].append(input_interval.right[x_idx])
+        if states.safety is not None:
+            states.accumulate_safety(input_interval.left, input_interval.right)
+        else:
+            states.record(input_interval.left, input_interval.right)
 
-        states['trajectories_l'] = trajectories_l
-        states['trajectories_r'] = trajectories_r
         return states
-
-
-
-
-            
-
-            
-
-
-
-
-
-
-
-
-
@@ -11,9 +11,21 @@ import importlib
 from utils import (
     batch_pair,
     divide_chunks,
+    create_point_store,
+    point_store_yield,
     save_model,
     aggregate_sampling_states,
     )
+from domain_utils import (
+    concatenate_states_list,
+    stack_safe_intervals,
+    distance_transform,
+    interval_unsafe_value,
+)
+from program_utils import (
+    prune_states,
+    run_program,
+)
 
 import import_hub as hub
 importlib.reload(hub)
@@ -86,91 +98,61 @@ def extract_safe_loss_old(component, target_component, target_idx):
     return component_loss, real_safety_loss, (min_l, max_r)
 
 
+def extract_streamed_safe_loss(component, target_idx):
+    # the safety loss accumulated at the Trajectory statements
+    safety = component.safety[:, target_idx]
+    min_l, max_r = float(torch.min(safety[:, 1].detach())), float(torch.max(safety[:, 2].detach()))
+    return safety[:, 0], (min_l, max_r)
+
+
 def extract_safe_loss(component, target_component, target_idx):
+    p_list = component.p_list
+    if component.safety is not None:
+        unsafe_penalty, (min_l, max_r) = extract_streamed_safe_loss(component, target_idx)
+        return weight_safe_loss(component, unsafe_penalty, p_list, min_l, max_r)
+
+    trajectories_l, trajectories_r = component.get_trajectories()
+    # only the steps shared by all the trajectories in the component are measured
+    C = int(torch.min(component.trajectory_length))
+    l, r = trajectories_l[:, :C, target_idx], trajectories_r[:, :C, target_idx]
+    # the first step is not measured for distance
+    measured = torch.ones(C, dtype=torch.bool, device=l.device)
+    if target_component['distance']:
+        l, r = distance_transform(l, r)
+        measured[:1] = False
+
+    safe_intervals = stack_safe_intervals(target_component)
+    if target_component["map_mode"] is True:
+        safe_intervals = safe_intervals[:C]
+    # B x C x M
+    unsafe_value = interval_unsafe_value(l.unsqueeze(2), r.unsqueeze(2), safe_intervals[:, :, 0], safe_intervals[:, :, 1])
+    # the closest alternative safe interval
+    unsafe_value = torch.min(unsafe_value, 2)[0]
+    unsafe_value = torch.where(measured, unsafe_value, torch.zeros_like(unsafe_value))
 
-    if target_component["map_mode"] is False:
-        safe_interval_l, safe_interval_r = target_component["condition"].left, target_component["condition"].right
-    else:
-        safe_interval_list = target_component["map_condition"]
-
-    trajectories_l = component['trajectories_l']
-    trajectories_r = component['trajectories_r']
-    p_list = torch.stack(component['p_list'])
-    converted_trajectories_l, converted_trajectories_r = list(zip(*trajectories_l)), list(zip(*trajectories_r))
-    stacked_trajectories_l = [torch.stack(i) for i in converted_trajectories_l]
-    stacked_trajectories_r = [torch.stack(i) for i in converted_trajectories_r]
-
-    B, C = len(trajectories_l), len(converted_trajectories_l)
-    unsafe_value = torch.zeros((B, C))
-    if torch.cuda.is_available():
-        unsafe_value = unsafe_value.cuda()
     min_l, max_r = 100000, -100000
-
-    for state_idx, stacked_state in enumerate(stacked_trajectories_l):
-        if target_component['distance'] and state_idx == 0:
-            continue
-        pre_l = stacked_state[:, target_idx]
-        pre_r = stacked_trajectories_r[state_idx][:, target_idx]
-        if target_component['distance']:
-            l = torch.zeros(pre_l.shape)
-            l_zeros = torch.zeros(pre_l.shape)
-            r = torch.zeros(pre_r.shape)
-            if torch.cuda.is_available():
-                l = l.cuda()
-                r = r.cuda()
-                l_zeros = l_zeros.cuda()
-            all_neg_index = torch.logical_and(pre_l<0, pre_r<=0)
-            across_index = torch.logical_and(pre_l<0, pre_r>0)
-            all_pos_index = torch.logical_and(pre_l>=0, pre_r>0)
-            l[all_neg_index], r[all_neg_index] = pre_r[all_neg_index].abs(), pre_l[all_neg_index].abs()
-            l[across_index], r[across_index] = torch.max(pre_l[across_index], l_zeros[across_index]), torch.max(pre_l[across_index].abs(), pre_r[across_index])
-            l[all_pos_index], r[all_pos_index] = pre_l[all_pos_index], pre_r[all_pos_index]
-        else:
-            l = pre_l
-            r = pre_r
-
-        if target_component["map_mode"] is True:
-            safe_interval_sub_list = safe_interval_list[state_idx] # the constraint over the k-th step
-            tmp_unsafe_value_list = list()
-            for safe_interval in safe_interval_sub_list:
-                tmp_unsafe_value = torch.zeros((B, 1))
-                if torch.cuda.is_available():
-                    tmp_unsafe_value = tmp_unsafe_value.cuda()
-                safe_interval_l, safe_interval_r = safe_interval.left, safe_interval.right
-                intersection_l, intersection_r = torch.max(l, safe_interval_l), torch.min(r, safe_interval_r)
-                empty_idx = intersection_r < intersection_l
-                # other_idx = intersection_r >= intersection_l
-                other_idx = ~ empty_idx
-                tmp_unsafe_value[empty_idx, 0] = torch.max(l[empty_idx] - safe_interval_r, safe_interval_l - r[empty_idx]) + 1.0
-                tmp_unsafe_value[other_idx, 0] = 1 - (intersection_r[other_idx] - intersection_l[other_idx] + eps) / (r[other_idx] - l[other_idx] + eps)
-                min_l, max_r = min(float(torch.min(l)), min_l), max(float(torch.max(r)), max_r)
-                tmp_unsafe_value_list.append(tmp_unsafe_value)
-            # at most two value are compared, in our benchmarks
-            if len(tmp_unsafe_value_list) > 1:
-                unsafe_value[:, state_idx] = torch.min(tmp_unsafe_value_list[0], tmp_unsafe_value_list[1]).squeeze()
-            else:
-                unsafe_value[:, state_idx] = tmp_unsafe_value_list[0].squeeze()
-        else:
-            intersection_l, intersection_r = torch.max(l, safe_interval_l), torch.min(r, safe_interval_r)
-            empty_idx = intersection_r < intersection_l
-            # other_idx = intersection_r >= intersection_l
-            other_idx = ~ empty_idx
-            unsafe_value[empty_idx, state_idx] = torch.max(l[empty_idx] - safe_interval_r, safe_interval_l - r[empty_idx]) + 1.0
-            unsafe_value[other_idx, state_idx] = 1 - (intersection_r[other_idx] - intersection_l[other_idx] + eps) / (r[other_idx] - l[other_idx] + eps)
-            min_l, max_r = min(float(torch.min(l)), min_l), max(float(torch.max(r)), max_r)
+    if bool(measured.any()):
+        min_l, max_r = min(float(torch.min(l[:, measured])), min_l), max(float(torch.max(r[:, measured])), max_r)
 
     # sum over one trajectories
     unsafe_penalty = torch.sum(unsafe_value, 1)
+    return weight_safe_loss(component, unsafe_penalty, p_list, min_l, max_r)
+
+
+def weight_safe_loss(component, unsafe_penalty, p_list, min_l, max_r):
     # max over one trajectory
     print(f"unsafe penalty: {unsafe_penalty.detach().cpu().numpy().tolist()}")
-    sum_penalty = torch.sum(unsafe_penalty)
+    # each state stands for multiplicity sampled paths
+    multiplicity = component.multiplicity.to(unsafe_penalty.dtype)
+    sum_penalty = torch.sum(multiplicity * unsafe_penalty)
     print(f"sum penalty: {sum_penalty}")
     # !!! detach!!!
-    component_loss = torch.dot(p_list.squeeze(), unsafe_penalty.detach()) + sum_penalty
+    component_loss = torch.dot(p_list * multiplicity, unsafe_penalty.detach()) + sum_penalty
     real_safety_loss = float(sum_penalty)
 
-    component_loss /= len(component['p_list'])
-    real_safety_loss /= len(component['p_list'])
+    num_paths = float(torch.sum(multiplicity))
+    component_loss /= num_paths
+    real_safety_loss /= num_paths
 
     return component_loss, real_safety_loss, (min_l, max_r)
 
@@ -205,17 +187,21 @@ def safe_distance(component_result_list, target):
     return loss, real_safety_loss
 
 
-def cal_data_loss(m, trajectories, criterion):
+def cal_data_loss(m, trajectories, criterion, point_batches=None):
     # for the point in the same batch
     # calculate the data loss of each point
     # add the point data loss together
+    # point_batches: the batches of the points of trajectories from the point store, instead of batching the trajectories
     if len(trajectories) == 0:
         return var_list([0.0])
 
     expec_data_loss = var_list([0.0])
     count = 0
-    for X, y in batch_pair_yield(trajectories, data_bs=512):
-        X, y = torch.from_numpy(X).float(), torch.from_numpy(y).float()
+    if point_batches is None:
+        point_batches = (
+            (torch.from_numpy(X).float(), torch.from_numpy(y).float()) for X, y in batch_pair_yield(trajectories, data_bs=512)
+        )
+    for X, y in point_batches:
         if torch.cuda.is_available():
             X = X.cuda()
             y = y.cuda()
@@ -237,40 +223,30 @@ def cal_safe_loss(m, abstract_states, target):
     }>
     '''
     # show_component(abstract_state)
-    ini_states = initialize_components(abstract_states)
-    component_result_list = list()
-    for i in range(len(ini_states['idx_list'])):
-        component = {
-            'trajectories_l': list(),
-            'trajectories_r': list(),
-            'p_list': list(),
-        }
-        component_result_list.append(component)
+    sample_result_list = list()
     
     # aggregate abstract states based on sample_size
-    aggregated_abstract_states_list = aggregate_sampling_states(abstract_states, constants.SAMPLE_SIZE)
+    # with shared path prefixes, one state per component stands for all its sampled paths
+    share_path_prefix = constants.share_path_prefix and not constants.masked_branch
+    aggregated_abstract_states_list = aggregate_sampling_states(abstract_states, 1 if share_path_prefix else constants.SAMPLE_SIZE)
     if constants.profile:
         start = time.time()
     for aggregated_abstract_states in aggregated_abstract_states_list:
-        ini_states = initialize_components(aggregated_abstract_states)
+        ini_states = prune_states(m, initialize_components(aggregated_abstract_states))
+        if share_path_prefix:
+            ini_states.multiplicity = ini_states.multiplicity * constants.SAMPLE_SIZE
+        if constants.stream_safety_loss:
+            ini_states.start_safety_loss(target)
         # print(f"start safe AI")
-        output_states = m(ini_states, 'abstract')
-        trajectories_l = output_states['trajectories_l']
-        trajectories_r = output_states['trajectories_r']
-        idx_list = output_states['idx_list']
-        p_list = output_states['p_list']
-
-        ziped_result = zip(idx_list, trajectories_l, trajectories_r, p_list)
-        sample_result = [(x, y, z, i) for x, y, z, i in sorted(ziped_result, key=lambda tuple: tuple[0])]
-        for idx, trajectory_l, trajectory_r, p in sample_result:
-            component_result_list[0]['trajectories_l'].append(trajectory_l)
-            component_result_list[0]['trajectories_r'].append(trajectory_r)
-            component_result_list[0]['p_list'].append(p)
+        output_states = run_program(m, ini_states, 'abstract')
+        _, sorted_idx = torch.sort(output_states.idx_list, stable=True)
+        sample_result_list.append(output_states.select(sorted_idx))
+    component_result = concatenate_states_list(sample_result_list)
     if constants.profile:
         end = time.time()
         print(f"--SAFE OUTPUT EXTRACTION: {end - start}")
         start_safety_loss_calculation = time.time()
-    safe_loss, real_safety_loss = safe_distance([component_result_list[0]], target)
+    safe_loss, real_safety_loss = safe_distance([component_result], target)
     if constants.profile:
         end_safety_loss_calculation = time.time()
         print(f"--SAFETY LOSS CALCULATION: {end_safety_loss_calculation - start_safety_loss_calculation}")
@@ -308,6 +284,8 @@ def learning(
     if epochs_to_skip is None:
         epochs_to_skip = -1
 
+    point_store = create_point_store(components) if constants.point_store else None
+
     start_time = time.time()
 
     print(f"epochs_to_skip: {epochs_to_skip}")
@@ -316,8 +294,9 @@ def learning(
         if i <= epochs_to_skip:
             continue
 
-        for trajectories, abstract_states in divide_chunks(components, bs=bs, data_bs=None):
-            data_loss = cal_data_loss(m, trajectories, criterion)
+        for chunk_idx, (trajectories, abstract_states) in enumerate(divide_chunks(components, bs=bs, data_bs=None)):
+            point_batches = None if point_store is None else point_store_yield(point_store, chunk_idx * bs, (chunk_idx + 1) * bs, data_bs=512)
+            data_loss = cal_data_loss(m, trajectories, criterion, point_batches=point_batches)
             safe_loss, real_safety_loss = cal_safe_loss(m, abstract_states, target)
             loss = (data_loss + lambda_ * safe_loss) / lambda_
 
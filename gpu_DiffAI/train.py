@@ -8,9 +8,15 @@ import importlib
 from utils import (
     batch_pair,
     divide_chunks,
+    create_point_store,
+    point_store_yield,
     save_model,
     batch_pair_yield,
     )
+from program_utils import (
+    prune_states,
+    run_program,
+)
 
 import import_hub as hub
 importlib.reload(hub)
@@ -81,14 +87,13 @@ def extract_safe_loss(component, target_component, target_idx):
     else:
         safe_interval_list = target_component["map_condition"]
 
-    trajectories_l = component['trajectories_l']
-    trajectories_r = component['trajectories_r']
-    converted_trajectories_l, converted_trajectories_r = list(zip(*trajectories_l)), list(zip(*trajectories_r))
-    stacked_trajectories_l = [torch.stack(i) for i in converted_trajectories_l]
-    stacked_trajectories_r = [torch.stack(i) for i in converted_trajectories_r]
-    # exit(0)
+    trajectories_l, trajectories_r = component.get_trajectories()
+    # only the steps shared by all the trajectories in the component are measured
+    C = int(torch.min(component.trajectory_length))
+    stacked_trajectories_l = trajectories_l[:, :C].unbind(1)
+    stacked_trajectories_r = trajectories_r[:, :C].unbind(1)
 
-    B, C = len(trajectories_l), len(converted_trajectories_l)
+    B = len(component)
     unsafe_value = torch.zeros((B, C))
     if torch.cuda.is_available():
         unsafe_value = unsafe_value.cuda()
@@ -150,7 +155,7 @@ def extract_safe_loss(component, target_component, target_idx):
     # print(unsafe_penalty.shape, torch.sum(unsafe_penalty))
     component_loss = torch.sum(unsafe_penalty)
 
-    component_loss /= len(component['trajectories_l'])
+    component_loss /= len(component)
 
     return component_loss, (min_l, max_r)
     
@@ -181,17 +186,21 @@ def safe_distance(component_result_list, target):
     return loss
 
 
-def cal_data_loss(m, trajectories, criterion):
+def cal_data_loss(m, trajectories, criterion, point_batches=None):
     # for the point in the same batch
     # calculate the data loss of each point
     # add the point data loss together
+    # point_batches: the batches of the points of trajectories from the point store, instead of batching the trajectories
     if len(trajectories) == 0:
         return var_list([0.0])
 
     expec_data_loss = var_list([0.0])
     count = 0
-    for X, y in batch_pair_yield(trajectories, data_bs=512):
-        X, y = torch.from_numpy(X).float(), torch.from_numpy(y).float()
+    if point_batches is None:
+        point_batches = (
+            (torch.from_numpy(X).float(), torch.from_numpy(y).float()) for X, y in batch_pair_yield(trajectories, data_bs=512)
+        )
+    for X, y in point_batches:
         # print(f"after batch pair: {X.shape}")
         if torch.cuda.is_available():
             X = X.cuda()
@@ -213,11 +222,11 @@ def cal_safe_loss(m, abstract_states, target):
     }>
     '''
     # show_component(abstract_state)
-    ini_states = initialize_components(abstract_states)
+    ini_states = prune_states(m, initialize_components(abstract_states))
 
     # TODO: sample simultanuously
     # list of trajectories, p_list
-    output_states = m(ini_states, 'abstract')
+    output_states = run_program(m, ini_states, 'abstract')
 
     safe_loss = safe_distance([output_states], target)
     return safe_loss
@@ -253,6 +262,8 @@ def learning(
     if epochs_to_skip is None:
         epochs_to_skip = -1
 
+    point_store = create_point_store(components) if constants.point_store else None
+
     start_time = time.time()
 
     print(f"epochs_to_skip: {epochs_to_skip}")
@@ -261,10 +272,11 @@ def learning(
         if i <= epochs_to_skip:
             continue
 
-        for trajectories, abstract_states in divide_chunks(components, bs=bs, data_bs=None):
+        for chunk_idx, (trajectories, abstract_states) in enumerate(divide_chunks(components, bs=bs, data_bs=None)):
             if constants.profile:
                 start_forward = time.time()
-            data_loss = cal_data_loss(m, trajectories, criterion)
+            point_batches = None if point_store is None else point_store_yield(point_store, chunk_idx * bs, (chunk_idx + 1) * bs, data_bs=512)
+            data_loss = cal_data_loss(m, trajectories, criterion, point_batches=point_batches)
             safe_loss = cal_safe_loss(m, abstract_states, target)
             print(f"data loss: {float(data_loss)}, safe loss: {float(safe_loss)}")
             
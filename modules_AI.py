@@ -14,9 +14,15 @@ import time
 from utils import (
     select_argmax,
 )
+from domain_utils import (
+    initialize_states,
+    sound_join_states,
+    apply_function,
+)
 
 torch.autograd.set_detect_anomaly(True)
 
+
 '''
 Module used as functions
 '''
@@ -110,121 +116,28 @@ class SigmoidLinear(nn.Module):
 Program Statement
 '''
 
-def sound_join_trajectory(trajectory_1_l, trajectory_1_r, trajectory_2_l, trajectory_2_r):
-    assert(len(trajectory_1_l) == len(trajectory_1_r))
-    assert(len(trajectory_2_l) == len(trajectory_2_l))
-    l1, l2 = len(trajectory_1_l), len(trajectory_2_l)
-    # pdb.set_trace()
-    trajectory_l, trajectory_r = list(), list()
-    K = min(l1, l2)
-    for idx in range(K):
-        states_1_l, states_1_r, states_2_l, states_2_r = trajectory_1_l[idx], trajectory_1_r[idx], trajectory_2_l[idx], trajectory_2_r[idx]
-        trajectory_l.append(torch.min(states_1_l, states_2_l))
-        trajectory_r.append(torch.max(states_1_r, states_2_r))
-    
-    if l1 < l2:
-        trajectory_l.extend(trajectory_2_l[l2 - 1:])
-        trajectory_r.extend(trajectory_2_r[l2 - 1:])
-    elif l1 > l2:
-        trajectory_l.extend(trajectory_1_l[l1 - 1:])
-        trajectory_r.extend(trajectory_1_r[l1 - 1:])
-    assert(len(trajectory_l) == max(l1, l2))
-    # pdb.set_trace()
-
-    return trajectory_l, trajectory_r
-
-
-def update_joined_tables(res_states, new_c, new_delta, new_trajectory_l, new_trajectory_r, new_idx, new_p):
-    if 'x' in res_states:
-        res_states['x'].c = torch.cat((res_states['x'].c, new_c), 0)
-        res_states['x'].delta = torch.cat((res_states['x'].delta, new_delta), 0)
-        res_states['trajectories_l'].append(new_trajectory_l)
-        res_states['trajectories_r'].append(new_trajectory_r)
-        res_states['idx_list'].append(new_idx)
-        res_states['p_list'].append(new_p)
-    else:
-        res_states['x'] = domain.Box(new_c, new_delta)
-        # res_states['trajectories'] = [new_trajectory]
-        res_states['trajectories_l'] = [new_trajectory_l]
-        res_states['trajectories_r'] = [new_trajectory_r]
-        res_states['idx_list'] = [new_idx]
-        res_states['p_list'] = [new_p]
-
-    return res_states
-
-
+# the trajectories are joined step by step
 def sound_join(states1, states2):
-    # symbol_tables
-    # 'x': B*D, 'trajectories': trajectory of each B, 'idx_list': idx of B in order
-    if len(states1) == 0:
-        return states2
-    if len(states2) == 0:
-        return states1
-
-    res_states = dict()
-    idx1, idx2 = 0, 0
-    idx_list_1, idx_list_2 = states1['idx_list'], states2['idx_list']
-    p_list_1, p_list_2 = states1['p_list'], states2['p_list']
-
-    while idx1 <= len(idx_list_1) - 1 or idx2 <= len(idx_list_2) - 1:
-        if idx1 > len(idx_list_1) - 1 or (idx2 <= len(idx_list_2) - 1 and idx_list_1[idx1] > idx_list_2[idx2]):
-            new_c = states2['x'].c[idx2:idx2+1].clone()
-            new_delta = states2['x'].delta[idx2:idx2+1].clone()
-            new_trajectory_l = states2['trajectories_l'][idx2]
-            new_trajectory_r = states2['trajectories_r'][idx2]
-            new_idx = states2['idx_list'][idx2]
-            new_p = states2['p_list'][idx2]
-            res_states = update_joined_tables(res_states, new_c, new_delta, new_trajectory_l, new_trajectory_r, new_idx, new_p)
-            idx2 += 1
-        elif idx2 > len(idx_list_2) - 1 or (idx1 <= len(idx_list_1) - 1 and idx_list_1[idx1] < idx_list_2[idx2]):
-            new_c = states1['x'].c[idx1:idx1+1].clone()
-            new_delta = states1['x'].delta[idx1:idx1+1].clone()
-            new_trajectory_l = states1['trajectories_l'][idx1]
-            new_trajectory_r = states1['trajectories_r'][idx1]
-            new_idx = states1['idx_list'][idx1]
-            new_p = states1['p_list'][idx1]
-            res_states = update_joined_tables(res_states, new_c, new_delta, new_trajectory_l, new_trajectory_r, new_idx, new_p)
-            idx1 += 1
-        else: # idx_list_1[idx_1] == idx_list_2[idx_2], need to join
-            assert(idx_list_1[idx1] == idx_list_2[idx2])
-            new_left = torch.min(states1['x'].c[idx1:idx1+1] - states1['x'].delta[idx1:idx1+1], states2['x'].c[idx2:idx2+1] - states2['x'].delta[idx2:idx2+1])
-            new_right = torch.max(states1['x'].c[idx1:idx1+1] + states1['x'].delta[idx1:idx1+1], states2['x'].c[idx2:idx2+1] + states2['x'].delta[idx2:idx2+1])
-            new_c = (new_left + new_right) / 2.0
-            new_delta = (new_right - new_left) / 2.0
-            # pdb.set_trace()
-            new_trajectory_l, new_trajectory_r = sound_join_trajectory(states1['trajectories_l'][idx1], states1['trajectories_r'][idx1], states2['trajectories_l'][idx2], states2['trajectories_r'][idx2])
-            new_idx = idx_list_1[idx1]
-            new_p = p_list_1[idx1]
-            res_states = update_joined_tables(res_states, new_c, new_delta, new_trajectory_l, new_trajectory_r, new_idx, new_p)
-            idx2 += 1
-            idx1 += 1
-
-    return res_states
+    return sound_join_states([states1, states2], join_trajectories=True)
 
 
 def sound_join_list(states_list):
-    if len(states_list) == 0:
-        return states_list[0]
-    res_states = dict()
-
-    for states_idx, states in enumerate(states_list):
-        res_states = sound_join(res_states, states)
-    return res_states
+    return sound_join_states(states_list, join_trajectories=True)
 
 
 def calculate_states(target_idx, arg_idx, f, states):
-    x = states['x']
+    x = states.x
     input = x.select_from_index(1, arg_idx)
-    res = f(input)
+    res = apply_function(f, input)
     x.c[:, target_idx] = res.c 
     x.delta[:, target_idx] = res.delta
-    states['x'] = x
+    states.x = x
     return states
 
 
 def calculate_branch(target_idx, test, states):
     body_states, orelse_states = dict(), dict()
-    x = states['x']
+    x = states.x
     target = x.select_from_index(1, target_idx) # select the batch target from x
 
     # select the idx of left = target.left < test,  right = target.right >= test
@@ -235,8 +148,8 @@ def calculate_branch(target_idx, test, states):
 
     left = target.getLeft() <= test
     if True in left: # split to left
-        left_idx = left.nonzero(as_tuple=True)[0].tolist()
-        x_left = domain.Box(x.c[left.squeeze(1)], x.delta[left.squeeze(1)])
+        body_states = states.select(left.squeeze(1))
+        x_left = body_states.x
         left_target_c, left_target_delta = target.c[left].unsqueeze(1), target.delta[left].unsqueeze(1)
         # get the new c, delta
         new_left_target_c = ((left_target_c - left_target_delta) + torch.min((left_target_c + left_target_delta), test)) / 2.0
@@ -244,16 +157,12 @@ def calculate_branch(target_idx, test, states):
         x_left.c[:, target_idx:target_idx+1] = new_left_target_c
         x_left.delta[:, target_idx:target_idx+1] = new_left_target_delta
 
-        body_states['x'] = x_left
-        body_states['trajectories_l'] = [states['trajectories_l'][i] for i in left_idx]
-        body_states['trajectories_r'] = [states['trajectories_r'][i] for i in left_idx]
-        body_states['idx_list'] = [states['idx_list'][i] for i in left_idx]
-        body_states['p_list'] = [states['p_list'][i] for i in left_idx]
+        body_states.x = x_left
     
     right = target.getRight() > test
     if True in right: # split to right
-        right_idx = right.nonzero(as_tuple=True)[0].tolist()
-        x_right = domain.Box(x.c[right.squeeze(1)], x.delta[right.squeeze(1)])
+        orelse_states = states.select(right.squeeze(1))
+        x_right = orelse_states.x
         right_target_c, right_target_delta = target.c[right].unsqueeze(1), target.delta[right].unsqueeze(1)
 
         new_right_target_c = (torch.max((right_target_c - right_target_delta), test) + (right_target_c + right_target_delta)) / 2.0
@@ -261,12 +170,7 @@ def calculate_branch(target_idx, test, states):
         x_right.c[:, target_idx:target_idx+1] = new_right_target_c
         x_right.delta[:, target_idx:target_idx+1] = new_right_target_delta
 
-        orelse_states['x'] = x_right
-        # orelse_states['trajectories'] = [states['trajectories'][i] for i in right_idx]
-        orelse_states['trajectories_l'] = [states['trajectories_l'][i] for i in right_idx]
-        orelse_states['trajectories_r'] = [states['trajectories_r'][i] for i in right_idx]
-        orelse_states['idx_list'] = [states['idx_list'][i] for i in right_idx]
-        orelse_states['p_list'] = [states['p_list'][i] for i in right_idx]
+        orelse_states.x = x_right
     
     # pdb.set_trace()
     
@@ -276,20 +180,12 @@ def calculate_branch(target_idx, test, states):
 def assign_states(states, mask):
     states_list = list()
     K, M = mask.shape
-    x = states['x']
 
     for i in range(M):
         new_states = dict()
         this_branch = mask[:, i]
         if True in this_branch:
-            this_idx = this_branch.nonzero(as_tuple=True)[0].tolist()
-            x_this = domain.Box(x.c[this_branch], x.delta[this_branch])
-            new_states['x'] = x_this
-            # new_states['trajectories'] = [states['trajectories'][idx] for idx in this_idx]
-            new_states['trajectories_l'] = [states['trajectories_l'][idx] for idx in this_idx]
-            new_states['trajectories_r'] = [states['trajectories_r'][idx] for idx in this_idx]
-            new_states['idx_list'] = [states['idx_list'][idx] for idx in this_idx]
-            new_states['p_list'] = [states['p_list'][idx] for idx in this_idx]
+            new_states = states.select(this_branch)
         states_list.append(new_states)
     
     return states_list
@@ -298,7 +194,7 @@ def assign_states(states, mask):
 def calculate_branches(arg_idx, states):
     # select argmax
     # argmax
-    x = states['x']
+    x = states.x
     target = x.select_from_index(1, arg_idx)
 
     index_mask = select_argmax(target.c - target.delta, target.c + target.delta)
@@ -412,34 +308,9 @@ class Trajectory(nn.Module):
             self.target_idx = self.target_idx.cuda()
     
     def forward(self, states):
-        x = states['x']
-        trajectories_l = states['trajectories_l']
-        trajectories_r = states['trajectories_r']
-        B, D = x.c.shape
-        
+        x = states.x
         input = x.select_from_index(1, self.target_idx)
         input_interval = input.getInterval()
-        _, K = input_interval.left.shape
-        for x_idx in range(B):
-            trajectories_l[x_idx].append(input_interval.left[x_idx])
-            trajectories_r[x_idx].append(input_interval.right[x_idx])
-
-        states['trajectories_l'] = trajectories_l
-        states['trajectories_r'] = trajectories_r
+        states.record(input_interval.left, input_interval.right)
 
         return states
-
-
-
-            
-
-            
-
-
-
-
-
-
-
-
-
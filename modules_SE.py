@@ -22,6 +22,18 @@ from utils import (
 import math
 
 
+def initialize_states(x):
+    B = x.c.shape[0]
+    states = {
+        'x': x,
+        'trajectories_l': [[] for i in range(B)],
+        'trajectories_r': [[] for i in range(B)],
+        'idx_list': [i for i in range(B)],
+        'p_list': [var(0.0) for i in range(B)],
+    }
+    return states
+
+
 def show_tra_l(l):
     for abstract_state in l:
         print("in one abstract state")
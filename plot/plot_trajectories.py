@@ -3,99 +3,67 @@ from matplotlib.patches import Polygon, Circle, Rectangle
 import matplotlib
 import matplotlib.pyplot as plt
 import math
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from trajectory_io import read_trajectories
+
+
+def distance_bounds(l, r):
+    if l < 0 and r <= 0: l, r = abs(r), abs(l)
+    elif l < 0 and r > 0: l, r = 0.0,  max(abs(l), abs(r))
+    else: pass
+    return l, r
 
 
 def read_symbolic_trajectories(configs):
-    file_name = configs['symbolic_trajectory_path']
-    f = open(file_name, 'r')
-    f.readline()
-    #  read the first property
+    _, trajectory_bounds = read_trajectories(configs['symbolic_trajectory_path'])
     symbolic_trajectory_list = list() # each element is a trajectory of (l, r)
-    trajectory = list()
-    for line in f:
-        if 'trajectory_idx' in line:
-            if len(trajectory) > 0:
-                symbolic_trajectory_list.append(trajectory)
-                trajectory = list()
-        else:
+    for trajectory_l, trajectory_r in trajectory_bounds:
+        if len(trajectory_l) == 0:
+            continue
+        trajectory = list()
+        for state_l, state_r in zip(trajectory_l.tolist(), trajectory_r.tolist()):
             # Racetrack, thermostat can choose the first element
             # AC should choose the coordinate, specifically, x
             tmp_state_list = list()
             if configs['benchmark'] == 'Racetrack-Relaxed-Multi':
-                properties = line.split(';')[0] 
-                content = properties.split(', ')
-                l, r = float(content[0]), float(content[1])
-                if l < 0 and r <= 0: l, r = abs(r), abs(l)
-                elif l < 0 and r > 0: l, r = 0.0,  max(abs(l), abs(r))
-                else: pass
-                tmp_state_list.append((l, r)) # distance
-                properties = line.split(';')[1] 
-                content = properties.split(', ')
-                l, r = float(content[0]), float(content[1])
-                tmp_state_list.append((l, r)) # agent1's x
-                properties = line.split(';')[2]
-                content = properties.split(', ')
-                l, r = float(content[0]), float(content[1])
-                tmp_state_list.append((l, r)) # agent2's x
+                tmp_state_list.append(distance_bounds(state_l[0], state_r[0])) # distance
+                tmp_state_list.append((state_l[1], state_r[1])) # agent1's x
+                tmp_state_list.append((state_l[2], state_r[2])) # agent2's x
             elif configs['benchmark'] in ['AC', 'AC-New', 'AC-New-1']:
-                properties = line.split(';')[0] 
-                content = properties.split(', ')
-                l, r = float(content[0]), float(content[1])
-                if l < 0 and r <= 0: l, r = abs(r), abs(l)
-                elif l < 0 and r > 0: l, r = 0.0,  max(abs(l), abs(r))
-                else: pass
-                l, r = math.sqrt(l), math.sqrt(r)
-                tmp_state_list.append((l, r))
+                l, r = distance_bounds(state_l[0], state_r[0])
+                tmp_state_list.append((math.sqrt(l), math.sqrt(r)))
             else:
-                properties = line.split(';')[0]
-                content = properties.split(', ')
-                l, r = float(content[0]), float(content[1])
-                tmp_state_list.append((l, r)) # distance
+                tmp_state_list.append((state_l[0], state_r[0])) # distance
             trajectory.append(tmp_state_list)
+        symbolic_trajectory_list.append(trajectory)
 
     return symbolic_trajectory_list
 
 
 def read_concrete_trajectories(configs):
-    file_name = configs['concrete_trajectory_path']
-    f = open(file_name, 'r')
-    f.readline()
-
+    _, trajectory_bounds = read_trajectories(configs['concrete_trajectory_path'])
     concrete_trajectory_list = list() # each element is a trajectory of (l, r)
-    trajectory = list()
-    for line in f:
-        if 'trajectory_idx' in line:
-            if len(trajectory) > 0:
-                concrete_trajectory_list.append(trajectory)
-                trajectory = list()
-        else:
+    for trajectory_l, _ in trajectory_bounds:
+        if len(trajectory_l) == 0:
+            continue
+        trajectory = list()
+        for state in trajectory_l.tolist():
             # Racetrack, thermostat can choose the first element
             # AC should choose the coordinate, specifically, x
             tmp_state_list = list()
             if configs['benchmark'] == 'Racetrack-Relaxed-Multi':
-                properties = line.split(';')[0] 
-                content = properties.split(', ')
-                value = float(content[0])
-                tmp_state_list.append(abs(value)) # distance
-                properties = line.split(';')[1] 
-                content = properties.split(', ')
-                value = float(content[0])
-                tmp_state_list.append(value) # agent1's x
-                properties = line.split(';')[2]
-                content = properties.split(', ')
-                value = float(content[0])
-                tmp_state_list.append(value) # agent2's x
+                tmp_state_list.append(abs(state[0])) # distance
+                tmp_state_list.append(state[1]) # agent1's x
+                tmp_state_list.append(state[2]) # agent2's x
             elif configs['benchmark'] in ['AC', 'AC-New', 'AC-New-1']:
-                properties = line.split(';')[0] 
-                content = properties.split(', ')
-                value = float(content[0])
-                tmp_state_list.append(math.sqrt(abs(value))) # distance
+                tmp_state_list.append(math.sqrt(abs(state[0]))) # distance
             else:
-                properties = line.split(';')[0]
-                content = properties.split(', ')
-                value = float(content[0])
-                tmp_state_list.append(value)
+                tmp_state_list.append(state[0])
             trajectory.append(tmp_state_list)
+        concrete_trajectory_list.append(trajectory)
 
     return concrete_trajectory_list
 
@@ -1,6 +1,11 @@
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import seaborn as sns
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from trajectory_io import read_trajectories
 
 
 def read_training_loss(mode, benchmark_name, result_prefix):
@@ -8,34 +13,12 @@ def read_training_loss(mode, benchmark_name, result_prefix):
 
 
 def read_point_trajectory(file_name, name_list=['acceleration', 'position', 'velocity']):
+    # the lower bounds of the first trajectory, from the text or the binary trajectory file
+    _, trajectory_bounds = read_trajectories(file_name)
+    trajectory_l, _ = trajectory_bounds[0]
     trajectories_dict = dict()
-    for name in name_list:
-        trajectories_dict[name] = list()
-
-    trajectory_file = open(file_name, 'r')
-    trajectory_file.readline()
-    
-    ini = True
-    for line in trajectory_file:
-        # print(line)
-        if 'trajectory_idx' in line:
-            # if 'trajectory_idx 1' in line:
-            #     break
-            if not ini:
-                break
-            else:
-                ini = False
-            tmp_trajectory_dict = {
-                    name: list() for name in name_list
-                }
-        else:
-            content = line[:-2].split(';')
-            # print(content)
-            for idx, state in enumerate(content):
-                tmp_trajectory_dict[name_list[idx]].append(float(state.split(', ')[0]))
-    for key in trajectories_dict:
-        trajectories_dict[key].append(tmp_trajectory_dict[key])
-    # print(trajectories_dict)
+    for idx, name in enumerate(name_list):
+        trajectories_dict[name] = [[float(state[idx]) for state in trajectory_l]]
     return trajectories_dict
 
 
@@ -0,0 +1,323 @@
+'''
+Analysis over the statement tree of a Program (Assign, IfElse, ArgMax, While, Trajectory, Skip in nn.Sequential)
+the statements of gpu_DSE, gpu_DiffAI and modules_AI share the attributes, so the statements are matched by class name
+'''
+import copy
+
+import torch
+import torch.nn as nn
+
+import constants
+from domain_utils import apply_function
+
+
+STATEMENTS = ['Skip', 'Assign', 'IfElse', 'ArgMax', 'While', 'Trajectory']
+
+
+def statement_name(module):
+    if isinstance(module, nn.Sequential):
+        return 'Sequential'
+    return type(module).__name__
+
+
+def index_list(idx):
+    return [int(i) for i in idx.tolist()]
+
+
+def is_statement_tree(module):
+    name = statement_name(module)
+    if name == 'Sequential':
+        return all(is_statement_tree(child) for child in module.children())
+    if name not in STATEMENTS:
+        return False
+    if name == 'IfElse':
+        return is_statement_tree(module.body) and is_statement_tree(module.orelse)
+    if name == 'ArgMax':
+        return all(is_statement_tree(branch) for branch in module.branch_list)
+    if name == 'While':
+        return is_statement_tree(module.body)
+    return True
+
+
+def live_in(module, live_out, defs=None):
+    '''
+    columns of the state read before being written when running module, given the columns live_out read after it
+    defs: if not None, list of (target columns, live_out) of the Assigns, used for the interference
+    '''
+    name = statement_name(module)
+    if name == 'Sequential':
+        live = live_out
+        for child in reversed(list(module.children())):
+            live = live_in(child, live, defs)
+        return live
+    if name == 'Assign':
+        target, arg = set(index_list(module.target_idx)), set(index_list(module.arg_idx))
+        if defs is not None:
+            defs.append((target, live_out))
+        return (live_out - target) | arg
+    if name == 'IfElse':
+        return live_in(module.body, live_out, defs) | live_in(module.orelse, live_out, defs) | set(index_list(module.target_idx))
+    if name == 'ArgMax':
+        live = set(index_list(module.arg_idx))
+        for branch in module.branch_list:
+            live |= live_in(branch, live_out, defs)
+        return live
+    if name == 'While':
+        # the test is read before each iteration, iterate until the loop head is stable
+        live = live_out | set(index_list(module.target_idx))
+        while True:
+            new_live = live | live_in(module.body, live)
+            if new_live == live:
+                break
+            live = new_live
+        if defs is not None:
+            live_in(module.body, live, defs)
+        return live
+    if name == 'Trajectory':
+        return live_out | set(index_list(module.target_idx))
+    return live_out
+
+
+def allocate_columns(program, D):
+    '''
+    map the D columns of the state to fewer columns, two columns share one if they are never live at the same time
+    return the new index of each column and the column of the input taken by each new column
+    '''
+    defs = list()
+    entry_live = live_in(program, set(), defs)
+    interference = {column: set() for column in range(D)}
+    def interfere(a, b):
+        if a != b:
+            interference[a].add(b)
+            interference[b].add(a)
+    for a in entry_live:
+        for b in entry_live:
+            interfere(a, b)
+    for target, live_out in defs:
+        for a in target:
+            for b in target | live_out:
+                interfere(a, b)
+    used = entry_live.union(*[target | live_out for target, live_out in defs])
+
+    # input columns first, to keep their order
+    column_map = dict()
+    for column in sorted(entry_live) + sorted(used - entry_live):
+        neighbour_columns = {column_map[neighbour] for neighbour in interference[column] if neighbour in column_map}
+        new_column = 0
+        while new_column in neighbour_columns:
+            new_column += 1
+        column_map[column] = new_column
+
+    num_columns = max(column_map.values()) + 1 if column_map else 1
+    input_columns = [0] * num_columns
+    for column in sorted(entry_live):
+        input_columns[column_map[column]] = column
+    return column_map, input_columns
+
+
+def remap_statement(module, column_map, copies):
+    '''
+    a copy of the statement tree of module on the allocated columns, the statements of module are unchanged
+    the networks are shared with module, statements shared in several places of the tree are copied once
+    '''
+    if id(module) in copies:
+        return copies[id(module)]
+    def remap(idx):
+        return torch.tensor([column_map[i] for i in index_list(idx)], dtype=idx.dtype, device=idx.device)
+    name = statement_name(module)
+    if name == 'Sequential':
+        new_module = nn.Sequential(*[remap_statement(child, column_map, copies) for child in module.children()])
+    elif name == 'Skip':
+        new_module = module
+    else:
+        new_module = copy_statement(module)
+    if name == 'Assign':
+        new_module.target_idx, new_module.arg_idx = remap(module.target_idx), remap(module.arg_idx)
+    if name in ['IfElse', 'While', 'Trajectory']:
+        new_module.target_idx = remap(module.target_idx)
+    if name == 'ArgMax':
+        new_module.arg_idx = remap(module.arg_idx)
+        branch_list = [remap_statement(branch, column_map, copies) for branch in module.branch_list]
+        new_module.branch_list = nn.ModuleList(branch_list) if isinstance(module.branch_list, nn.ModuleList) else branch_list
+    if name == 'IfElse':
+        new_module.body = remap_statement(module.body, column_map, copies)
+        new_module.orelse = remap_statement(module.orelse, column_map, copies)
+    if name == 'While':
+        new_module.body = remap_statement(module.body, column_map, copies)
+        if hasattr(new_module, 'compiled_body'):
+            new_module.compiled_body = None
+    copies[id(module)] = new_module
+    return new_module
+
+
+def prune_columns(m, D):
+    '''
+    the statements of m on the allocated columns, once per model, None if no column is saved
+    m.program is unchanged, the pruned program runs the states of prune_states only
+    '''
+    if not hasattr(m, 'column_plan'):
+        program = getattr(m, 'program', None)
+        m.column_plan = None
+        if program is not None and is_statement_tree(program):
+            column_map, input_columns = allocate_columns(program, D)
+            if len(input_columns) < D:
+                # a plain dict keeps the pruned program out of the parameters and the state_dict of m
+                m.column_plan = {'D': D, 'input_columns': input_columns, 'program': remap_statement(program, column_map, dict())}
+            print(f"prune columns: {D} -> {len(input_columns)}")
+    return m.column_plan
+
+
+def pruned_states(m, states):
+    # if states are the states of prune_states, their width tells them apart as fewer columns than D are kept
+    column_plan = getattr(m, 'column_plan', None)
+    return column_plan is not None and states.x.c.shape[1] == len(column_plan['input_columns'])
+
+
+def prune_states(m, states):
+    # the initial states of the pruned program of m
+    if not constants.prune_columns:
+        return states
+    column_plan = prune_columns(m, states.x.c.shape[1])
+    if column_plan is None or states.x.c.shape[1] != column_plan['D']:
+        return states
+    return states.select_columns(column_plan['input_columns'])
+
+
+'''
+Lowering of a Program to flat blocks
+nested nn.Sequentials become one Block (a straight-line list of statements), consecutive independent Assigns become one FusedAssign,
+IfElse, ArgMax and While are shallow copies of the statements of the mode (DSE, DiffAI, AI) with the lowered blocks as bodies,
+so the semantics of the branches and loops are unchanged and the parameters are shared with the model
+'''
+class FusedAssign(nn.Module):
+    # Assigns none of which reads or writes a column written by another, the inputs are read before writing all the targets at once
+    def __init__(self, assigns):
+        super().__init__()
+        self.assigns = nn.ModuleList(assigns)
+        self.target_idx = torch.cat([assign.target_idx for assign in assigns])
+        self.target_sizes = [assign.target_idx.shape[0] for assign in assigns]
+    
+    def forward(self, states):
+        x = states.x
+        B = x.c.shape[0]
+        res_list = [apply_function(assign.f, x.select_from_index(1, assign.arg_idx)) for assign in self.assigns]
+        # broadcast as the column assignment of one Assign does
+        x.c[:, self.target_idx] = torch.cat([torch.broadcast_to(res.c, (B, size)) for res, size in zip(res_list, self.target_sizes)], 1)
+        x.delta[:, self.target_idx] = torch.cat([torch.broadcast_to(res.delta, (B, size)) for res, size in zip(res_list, self.target_sizes)], 1)
+        states.x = x
+        return states
+
+
+class Block(nn.Module):
+    def __init__(self, ops):
+        super().__init__()
+        self.ops = nn.ModuleList(ops)
+    
+    def forward(self, states):
+        for op in self.ops:
+            states = op(states)
+        return states
+
+
+def flatten_statements(module):
+    if statement_name(module) == 'Sequential':
+        return [statement for child in module.children() for statement in flatten_statements(child)]
+    if statement_name(module) == 'Skip':
+        return []
+    return [module]
+
+
+def fuse_assigns(statements):
+    ops, group, group_targets = list(), list(), set()
+    def close_group():
+        if len(group) == 1:
+            ops.append(group[0])
+        elif len(group) > 1:
+            ops.append(FusedAssign(list(group)))
+        group.clear()
+        group_targets.clear()
+    for statement in statements:
+        if statement_name(statement) != 'Assign':
+            close_group()
+            ops.append(statement)
+            continue
+        target, arg = set(index_list(statement.target_idx)), set(index_list(statement.arg_idx))
+        if group_targets & (target | arg):
+            close_group()
+        group.append(statement)
+        group_targets.update(target)
+    close_group()
+    return ops
+
+
+def copy_statement(statement):
+    new_statement = copy.copy(statement)
+    new_statement._modules = dict(statement._modules)
+    return new_statement
+
+
+def lower_statement(module):
+    name = statement_name(module)
+    if name == 'Sequential':
+        ops = fuse_assigns([lower_statement(statement) for statement in flatten_statements(module)])
+        return ops[0] if len(ops) == 1 else Block(ops)
+    if name == 'IfElse':
+        new_statement = copy_statement(module)
+        new_statement.body, new_statement.orelse = lower_statement(module.body), lower_statement(module.orelse)
+        return new_statement
+    if name == 'ArgMax':
+        new_statement = copy_statement(module)
+        branch_list = [lower_statement(branch) for branch in module.branch_list]
+        new_statement.branch_list = nn.ModuleList(branch_list) if isinstance(module.branch_list, nn.ModuleList) else branch_list
+        return new_statement
+    if name == 'While':
+        new_statement = copy_statement(module)
+        new_statement.body = lower_statement(module.body)
+        if hasattr(new_statement, 'compiled_body'):
+            new_statement.compiled_body = None
+        return new_statement
+    return module
+
+
+def count_ops(module):
+    # the number of statements run by the Python interpreter for one pass over the program
+    name = statement_name(module)
+    if name == 'Sequential':
+        return sum(count_ops(child) for child in module.children())
+    if name == 'Block':
+        return sum(count_ops(op) for op in module.ops)
+    if name == 'IfElse':
+        return 1 + count_ops(module.body) + count_ops(module.orelse)
+    if name == 'ArgMax':
+        return 1 + sum(count_ops(branch) for branch in module.branch_list)
+    if name == 'While':
+        return 1 + count_ops(module.body)
+    return 1
+
+
+def compile_program(m, pruned=False):
+    # lower the statements of m once, the pruned program of m if pruned
+    if not hasattr(m, 'compiled_program'):
+        # a plain dict keeps the lowered programs out of the parameters and the state_dict of m
+        m.compiled_program = dict()
+    key = 'pruned' if pruned else 'program'
+    if key not in m.compiled_program:
+        program = m.column_plan['program'] if pruned else getattr(m, 'program', None)
+        if program is None or not is_statement_tree(program):
+            m.compiled_program[key] = None
+        else:
+            m.compiled_program[key] = lower_statement(program)
+            print(f"compile program: {count_ops(program)} statements -> {count_ops(m.compiled_program[key])} ops")
+    return m.compiled_program[key]
+
+
+def run_program(m, states, version=None):
+    pruned = pruned_states(m, states)
+    if constants.compile_program:
+        program = compile_program(m, pruned)
+        if program is not None:
+            return program(states)
+    if pruned:
+        # the forward of the Programs runs self.program for the versions other than single_nn_learning
+        return m.column_plan['program'](states)
+    return m(states, version)
@@ -12,12 +12,15 @@ import domain
 
 import random
 import time
+import json
 
 from utils import (
     extract_abstract_representation,
+    ComponentGrid,
     count_parameters,
     append_log,
 )
+from domain_utils import clear_safe_intervals
 
 
 def best_lambda(q_hat, c_hat):
@@ -60,8 +63,17 @@ def best_theta(tmp_m_name,
     return q.add(new_lambda.mul(c))
 
 
+def append_result(result_path, result):
+    # one json line per run, collected by scheduler.py
+    f = open(result_path, 'a')
+    f.write(json.dumps(result) + "\n")
+    f.close()
+
+
 if __name__ == "__main__":
     torch.autograd.set_detect_anomaly(True)
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
 
     for safe_range_bound in safe_range_bound_list:
         if not debug:
@@ -69,6 +81,7 @@ if __name__ == "__main__":
         print(f"Safe Range Bound: {safe_range_bound}")
 
         # update target, fix the left endpoint, varify the right endpoint
+        clear_safe_intervals()
         target = list()
         for idx, safe_range in enumerate(safe_range_list):
             if multi_agent_mode is True:
@@ -148,9 +161,7 @@ if __name__ == "__main__":
                 else:
                     target[0]['map_condition'] = map_condition
                 
-            N = 20
-            
-            for i in range(N):
+            for i in range(seed_start, seed_end):
                 constants.status = 'train'
                 import import_hub as hub
                 importlib.reload(hub)
@@ -180,6 +191,8 @@ if __name__ == "__main__":
                 q_list = list()
                 c_list = list()
                 q = var(0.0)
+                c, time_out = None, False
+                train_time = time.time()
 
                 for t in range(t_epoch):
                     target_model_name = f"{model_name_prefix}_{safe_range_bound}_{i}_{t}"
@@ -258,8 +271,11 @@ if __name__ == "__main__":
                     if time_out == True:
                         continue
 
+                train_time = time.time() - train_time
+
                 # AI verification use many initial components, as more as possible
-                AI_components = extract_abstract_representation(Trajectory_test, x_l, x_r, AI_verifier_num_components)
+                # only the boxes are verified, they are made chunk by chunk from the grid
+                AI_components = ComponentGrid(x_l, x_r, AI_verifier_num_components)
                 # SE verification use one initial components
                 SE_components = extract_abstract_representation(Trajectory_test, x_l, x_r, SE_verifier_num_components)
                 
@@ -275,27 +291,50 @@ if __name__ == "__main__":
 
                 verification_time = time.time()
                 
-                verifier_AI(
+                verification_unsafe = verifier_AI(
                     model_path=MODEL_PATH, 
                     model_name=target_model_name, 
                     components=AI_components, 
                     target=target,
                     trajectory_path=f"{trajectory_log_prefix}_{safe_range_bound}_{i}"
                 )
-                print(f"---verification AI time: {time.time() - verification_time} sec---")
+                verification_time = time.time() - verification_time
+                print(f"---verification AI time: {verification_time} sec---")
 
                 import tester as t
                 importlib.reload(t)
                 from tester import test_data_loss
                 
                 test_time = time.time()
-                test_data_loss(
+                test_loss = test_data_loss(
                     model_path=MODEL_PATH, 
                     model_name=target_model_name, 
                     trajectory_test=Trajectory_test, 
                     target=target,
                 )
-                print(f"---test data loss time: {time.time() - test_time} sec---")
+                test_time = time.time() - test_time
+                print(f"---test data loss time: {test_time} sec---")
+
+                if result_path is not None:
+                    append_result(result_path, {
+                        "benchmark_name": benchmark_name,
+                        "mode": mode,
+                        "safe_range_bound": safe_range_bound,
+                        "seed": i,
+                        "model_name": target_model_name,
+                        "data_loss": None if test_mode else float(q),
+                        "safety_loss": None if c is None else float(c),
+                        "time_out": bool(time_out),
+                        "train_time": train_time,
+                        # the refined verifier measures the unsafe volume fraction, not the unsafe component fraction
+                        # with early stop, only the verdict (1.0 if unsafe) is known
+                        "verification_unsafe": None if verifier_refine_depth > 0 or verifier_early_stop else verification_unsafe,
+                        "verification_unsafe_volume": verification_unsafe if verifier_refine_depth > 0 else None,
+                        "verification_unsafe_verdict": verification_unsafe if verifier_refine_depth == 0 and verifier_early_stop else None,
+                        "test_data_loss": test_loss,
+                        "verification_time": verification_time,
+                        "test_time": test_time,
+                    })
 
 
 
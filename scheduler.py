@@ -0,0 +1,132 @@
+'''
+Run the experiments of run.py in parallel
+one job is one (benchmark, bound index, seed), each job is a run.py process limited to a few torch threads
+the arguments not known here are passed to run.py, e.g.
+python scheduler.py --benchmark_names thermostat_new racetrack_relaxed_multi --bound_end 5 --seed_end 5 --workers 8 --mode DSE --num_epoch 1500
+'''
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+
+def get_parser():
+    p = argparse.ArgumentParser()
+    p.add_argument("--benchmark_names", nargs='+', required=True, help="benchmarks to run")
+    p.add_argument("--bound_start", default=0, type=int, help="the index to start with in safe bound list")
+    p.add_argument("--bound_end", default=1, type=int, help="the index to end within safe bound list")
+    p.add_argument("--seed_start", default=0, type=int, help="the first seed to run")
+    p.add_argument("--seed_end", default=1, type=int, help="the seed to end with")
+    p.add_argument("--workers", default=None, type=int, help="number of jobs running at the same time")
+    p.add_argument("--threads_per_worker", default=1, type=int, help="torch threads of one job")
+    p.add_argument("--gpus", nargs='*', default=None, help="gpu ids assigned to the jobs in a round-robin way")
+    p.add_argument("--output_dir", default="scheduler_result", type=str, help="job logs, job results and the results table")
+    p.add_argument("--dry_run", action='store_true', help="only print the jobs")
+    return p
+
+
+def build_jobs(args):
+    jobs = list()
+    for benchmark_name, bound_idx, seed in itertools.product(
+        args.benchmark_names,
+        range(args.bound_start, args.bound_end),
+        range(args.seed_start, args.seed_end),
+        ):
+        jobs.append({
+            "benchmark_name": benchmark_name,
+            "bound_idx": bound_idx,
+            "seed": seed,
+            "name": f"{benchmark_name}_{bound_idx}_{seed}",
+        })
+    return jobs
+
+
+def job_command(job, args, run_args, result_path):
+    return [
+        sys.executable, "run.py",
+        "--benchmark_name", job['benchmark_name'],
+        "--bound_start", str(job['bound_idx']),
+        "--bound_end", str(job['bound_idx'] + 1),
+        "--seed_start", str(job['seed']),
+        "--seed_end", str(job['seed'] + 1),
+        "--num_threads", str(args.threads_per_worker),
+        "--result_path", result_path,
+    ] + run_args
+
+
+def run_job(job, args, run_args, gpu=None):
+    result_path = os.path.join(args.output_dir, f"{job['name']}.jsonl")
+    log_path = os.path.join(args.output_dir, f"{job['name']}.log")
+    if os.path.exists(result_path):
+        os.remove(result_path)
+
+    env = dict(os.environ)
+    env['OMP_NUM_THREADS'] = str(args.threads_per_worker)
+    env['MKL_NUM_THREADS'] = str(args.threads_per_worker)
+    if gpu is not None:
+        env['CUDA_VISIBLE_DEVICES'] = str(gpu)
+
+    start_t = time.time()
+    with open(log_path, 'w') as log_file:
+        returncode = subprocess.call(
+            job_command(job, args, run_args, result_path),
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            env=env,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    return returncode, time.time() - start_t, result_path
+
+
+def collect_results(jobs, result_path_dict):
+    results = list()
+    for job in jobs:
+        result_path = result_path_dict.get(job['name'])
+        if result_path is None or not os.path.exists(result_path):
+            results.append({"benchmark_name": job['benchmark_name'], "bound_idx": job['bound_idx'], "seed": job['seed'], "status": job['status']})
+            continue
+        with open(result_path, 'r') as f:
+            for line in f:
+                result = json.loads(line)
+                result.update({"bound_idx": job['bound_idx'], "status": job['status']})
+                results.append(result)
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    args, run_args = get_parser().parse_known_args()
+    if args.workers is None:
+        args.workers = max(1, (os.cpu_count() or 1) // args.threads_per_worker)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    jobs = build_jobs(args)
+    print(f"{len(jobs)} jobs, {args.workers} workers, {args.threads_per_worker} threads per worker")
+    if args.dry_run:
+        for job in jobs:
+            print(" ".join(job_command(job, args, run_args, os.path.join(args.output_dir, f"{job['name']}.jsonl"))))
+        exit(0)
+
+    start_t = time.time()
+    result_path_dict = dict()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        future_to_job = dict()
+        for job_idx, job in enumerate(jobs):
+            gpu = args.gpus[job_idx % len(args.gpus)] if args.gpus else None
+            future_to_job[executor.submit(run_job, job, args, run_args, gpu)] = job
+        for future in as_completed(future_to_job):
+            job = future_to_job[future]
+            returncode, job_time, result_path = future.result()
+            job['status'] = 'done' if returncode == 0 else f"failed({returncode})"
+            result_path_dict[job['name']] = result_path
+            print(f"{job['name']}: {job['status']}, {job_time} sec.")
+    print(f"all jobs: {time.time() - start_t} sec.")
+
+    results = collect_results(jobs, result_path_dict)
+    results.to_csv(os.path.join(args.output_dir, "results.csv"), index=False)
+    print(results.to_string())
@@ -67,6 +67,7 @@ def test_objective(m, trajectory_test, criterion, test_bs):
         log_file_evaluation = open(constants.file_dir_evaluation, 'a')
         log_file_evaluation.write(f"test data loss: {float(test_data_loss)}\n")
     print(f"test data loss: {float(test_data_loss)}")
+    return float(test_data_loss)
 
 
 def test_data_loss(
@@ -91,7 +92,7 @@ def test_data_loss(
         param.requires_grad = False
 
     criterion = torch.nn.MSELoss()
-    test_objective(m, trajectory_test, criterion, test_bs)
+    return test_objective(m, trajectory_test, criterion, test_bs)
 
     
 
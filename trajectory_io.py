@@ -0,0 +1,177 @@
+'''
+Trajectory bounds files shared by the verifier, the trajectory extractors and the plot scripts
+a file is named by its prefix, the path without the .txt
+text: <prefix>.txt, a header line, then "trajectory_idx i" and one line of "l, r;" per value for each step
+binary: append-only arrays, the steps of all the trajectories one after another
+    <prefix>.lower.bin, <prefix>.upper.bin: float32, total_steps x K
+    <prefix>.offsets.bin: int64, num_trajectories + 1, the i-th trajectory is the steps [offsets[i], offsets[i+1])
+    <prefix>.json: {"name_list", "K", "num_trajectories", "num_steps"}, rewritten at each flush so that a partial file can be read
+'''
+import json
+import os
+
+import numpy as np
+import torch
+
+
+def trajectory_prefix(path):
+    return path[:-len(".txt")] if path.endswith(".txt") else path
+
+
+def states_trajectory_arrays(trajectories_l, trajectories_r, trajectory_length):
+    # the valid steps of B x T x K bounds as total_steps x K arrays, and the length of each trajectory
+    if isinstance(trajectories_l, torch.Tensor):
+        T = trajectories_l.shape[1]
+        valid = torch.arange(T, device=trajectories_l.device).unsqueeze(0) < trajectory_length.unsqueeze(1)
+        return trajectories_l[valid].detach().cpu().numpy(), trajectories_r[valid].detach().cpu().numpy(), trajectory_length.cpu().numpy()
+    T = trajectories_l.shape[1]
+    trajectory_length = np.asarray(trajectory_length)
+    valid = np.arange(T)[None, :] < trajectory_length[:, None]
+    return trajectories_l[valid], trajectories_r[valid], trajectory_length
+
+
+class TextTrajectoryWriter():
+    def __init__(self, prefix, name_list):
+        # the header of an older binary file would be read instead of this file
+        if os.path.exists(prefix + ".json"):
+            os.remove(prefix + ".json")
+        self.f = open(prefix + ".txt", 'w')
+        self.f.write(f"{name_list}\n")
+        self.num_trajectories = 0
+
+    def append_list(self, trajectory_list):
+        # trajectory_list: list of (trajectory_l, trajectory_r), length x K arrays
+        lines = list()
+        for trajectory_l, trajectory_r in trajectory_list:
+            lines.append(f"trajectory_idx {self.num_trajectories}\n")
+            for state_l, state_r in zip(np.asarray(trajectory_l).tolist(), np.asarray(trajectory_r).tolist()):
+                lines.append("".join(f"{float(x_l)}, {float(x_r)};" for x_l, x_r in zip(state_l, state_r)) + "\n")
+            self.num_trajectories += 1
+        self.f.write("".join(lines))
+
+    def append(self, trajectories_l, trajectories_r, trajectory_length):
+        lower, upper, lengths = states_trajectory_arrays(trajectories_l, trajectories_r, trajectory_length)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        self.append_list([(lower[start:end], upper[start:end]) for start, end in zip(offsets[:-1], offsets[1:])])
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class BinaryTrajectoryWriter():
+    def __init__(self, prefix, name_list):
+        self.prefix = prefix
+        self.name_list = name_list
+        self.K = None
+        self.num_trajectories = 0
+        self.num_steps = 0
+        self.lower_file = open(prefix + ".lower.bin", 'wb')
+        self.upper_file = open(prefix + ".upper.bin", 'wb')
+        self.offsets_file = open(prefix + ".offsets.bin", 'wb')
+        np.zeros(1, dtype=np.int64).tofile(self.offsets_file)
+        self.flush()
+
+    def append_arrays(self, lower, upper, lengths):
+        # lower, upper: total_steps x K, lengths: the number of steps of each trajectory
+        if len(lengths) == 0:
+            return
+        lower, upper = np.asarray(lower, dtype=np.float32), np.asarray(upper, dtype=np.float32)
+        if self.K is None:
+            self.K = int(lower.shape[1]) if lower.ndim == 2 else 0
+        lower.tofile(self.lower_file)
+        upper.tofile(self.upper_file)
+        offsets = self.num_steps + np.cumsum(np.asarray(lengths, dtype=np.int64))
+        offsets.tofile(self.offsets_file)
+        self.num_steps = int(offsets[-1])
+        self.num_trajectories += len(lengths)
+
+    def append_list(self, trajectory_list):
+        if len(trajectory_list) == 0:
+            return
+        K = next((np.asarray(trajectory_l).shape[1] for trajectory_l, _ in trajectory_list if len(trajectory_l) > 0), self.K or 0)
+        lower = np.concatenate([np.asarray(trajectory_l, dtype=np.float32).reshape(-1, K) for trajectory_l, _ in trajectory_list])
+        upper = np.concatenate([np.asarray(trajectory_r, dtype=np.float32).reshape(-1, K) for _, trajectory_r in trajectory_list])
+        self.append_arrays(lower, upper, [len(trajectory_l) for trajectory_l, _ in trajectory_list])
+
+    def append(self, trajectories_l, trajectories_r, trajectory_length):
+        self.append_arrays(*states_trajectory_arrays(trajectories_l, trajectories_r, trajectory_length))
+
+    def flush(self):
+        for f in [self.lower_file, self.upper_file, self.offsets_file]:
+            f.flush()
+        header = {
+            'name_list': self.name_list,
+            'K': self.K if self.K is not None else 0,
+            'num_trajectories': self.num_trajectories,
+            'num_steps': self.num_steps,
+        }
+        tmp_path = self.prefix + ".json.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(header, f)
+        os.replace(tmp_path, self.prefix + ".json")
+
+    def close(self):
+        self.flush()
+        for f in [self.lower_file, self.upper_file, self.offsets_file]:
+            f.close()
+
+
+def open_trajectory_writer(path, name_list, trajectory_format='text'):
+    prefix = trajectory_prefix(path)
+    if trajectory_format == 'binary':
+        return BinaryTrajectoryWriter(prefix, name_list)
+    return TextTrajectoryWriter(prefix, name_list)
+
+
+class TrajectoryReader():
+    # the trajectories of a binary file, the bounds are memory-mapped
+    def __init__(self, prefix):
+        with open(prefix + ".json", 'r') as f:
+            header = json.load(f)
+        self.name_list = header['name_list']
+        num_trajectories, num_steps, K = header['num_trajectories'], header['num_steps'], header['K']
+        self.offsets = np.fromfile(prefix + ".offsets.bin", dtype=np.int64, count=num_trajectories + 1)
+        if num_steps > 0:
+            self.lower = np.memmap(prefix + ".lower.bin", dtype=np.float32, mode='r', shape=(num_steps, K))
+            self.upper = np.memmap(prefix + ".upper.bin", dtype=np.float32, mode='r', shape=(num_steps, K))
+        else:
+            self.lower, self.upper = np.zeros((0, K), dtype=np.float32), np.zeros((0, K), dtype=np.float32)
+
+    def __len__(self):
+        return self.offsets.shape[0] - 1
+
+    def __getitem__(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.lower[start:end], self.upper[start:end]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def read_text_trajectories(prefix):
+    f = open(prefix + ".txt", 'r')
+    name_list = f.readline()[:-1]
+    trajectory_list = list()
+    for line in f:
+        if 'trajectory_idx' in line:
+            trajectory_list.append((list(), list()))
+            continue
+        bounds = [[float(v) for v in value.split(', ')] for value in line.strip().split(';') if value != '']
+        trajectory_list[-1][0].append([bound[0] for bound in bounds])
+        trajectory_list[-1][1].append([bound[1] for bound in bounds])
+    f.close()
+    return name_list, [(np.array(trajectory_l, dtype=np.float64), np.array(trajectory_r, dtype=np.float64)) for trajectory_l, trajectory_r in trajectory_list]
+
+
+def read_trajectories(path):
+    # the binary file of path if it exists, the text file otherwise
+    # return name_list, the list-like of (trajectory_l, trajectory_r), length x K
+    prefix = trajectory_prefix(path)
+    if os.path.exists(prefix + ".json"):
+        reader = TrajectoryReader(prefix)
+        return reader.name_list, reader
+    return read_text_trajectories(prefix)
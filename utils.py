@@ -29,6 +29,23 @@ def var_list(i_list, requires_grad=True):
     return res
 
 
+# constant pool: one tensor per (value, dtype, device), without grad
+# the tensors are shared, they must not be changed in place
+CONSTANTS = dict()
+
+
+def const(i, dtype=torch.float, device=None):
+    # i: a float or a small list of floats, device: cuda if available by default as var
+    if device is None:
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    value = tuple(float(v) for v in i) if isinstance(i, (list, tuple)) else float(i)
+    key = (value, dtype, str(device))
+    if key not in CONSTANTS:
+        res = torch.tensor(value, dtype=dtype)
+        CONSTANTS[key] = res.cuda() if str(device).startswith('cuda') else res.to(device)
+    return CONSTANTS[key]
+
+
 PI = var((3373259426.0 + 273688.0 / (1 << 21)) / (1 << 30))
 PI_TWICE = PI.mul(var(2.0))
 PI_HALF = PI.div(var(2.0))
@@ -63,6 +80,66 @@ def batch_pair_yield(trajectory_list, data_bs=None):
         yield states[data_bs*i:data_bs*(i+1)], actions[data_bs*i:data_bs*(i+1)]
     
 
+def trajectory_points(trajectories):
+    # the states and the actions of the trajectories one after another, float32
+    # the trajectories of the binary dataset are read as whole arrays
+    if len(trajectories) > 0 and all(hasattr(trajectory, 'states') for trajectory in trajectories):
+        return np.concatenate([trajectory.states for trajectory in trajectories]).astype(np.float32), \
+            np.concatenate([trajectory.actions for trajectory in trajectories]).astype(np.float32)
+    states = [state for trajectory in trajectories for (state, action) in trajectory]
+    actions = [action for trajectory in trajectories for (state, action) in trajectory]
+    return np.array(states, dtype=np.float32), np.array(actions, dtype=np.float32)
+
+
+# the point store of the last components
+POINT_STORE_CACHE = dict()
+
+
+def create_point_store(components):
+    '''
+    all the (state, action) pairs of the components as two tensors, built once for the same trajectory lists
+    X, y: the points, ranges: the [start, end) of the points of each component
+    a trajectory list shared by several components is stored once
+    '''
+    trajectory_lists = [component['trajectories'] for component in components]
+    key = tuple(id(trajectories) for trajectories in trajectory_lists)
+    if POINT_STORE_CACHE.get('key') == key and all(a is b for a, b in zip(POINT_STORE_CACHE['trajectory_lists'], trajectory_lists)):
+        return POINT_STORE_CACHE['point_store']
+
+    list_ranges, states_list, actions_list = dict(), list(), list()
+    offset = 0
+    for trajectories in trajectory_lists:
+        if id(trajectories) in list_ranges or len(trajectories) == 0:
+            continue
+        states, actions = trajectory_points(trajectories)
+        list_ranges[id(trajectories)] = (offset, offset + states.shape[0])
+        offset += states.shape[0]
+        states_list.append(states)
+        actions_list.append(actions)
+    ranges = [list_ranges.get(id(trajectories), (0, 0)) for trajectories in trajectory_lists]
+
+    X = torch.from_numpy(np.concatenate(states_list)) if states_list else torch.zeros(0, 0)
+    y = torch.from_numpy(np.concatenate(actions_list)) if actions_list else torch.zeros(0, 0)
+    if torch.cuda.is_available():
+        X, y = X.cuda(), y.cuda()
+    point_store = {'X': X, 'y': y, 'ranges': ranges}
+    POINT_STORE_CACHE.clear()
+    POINT_STORE_CACHE.update({'key': key, 'trajectory_lists': trajectory_lists, 'point_store': point_store})
+    print(f"point store: {X.shape[0]} points of {len(trajectory_lists)} components")
+    return point_store
+
+
+def point_store_yield(point_store, component_start, component_end, data_bs=None):
+    # the points of the components [component_start, component_end) in a random order, data_bs points at a time
+    # as batch_pair_yield, the points of a trajectory list are repeated for each component holding it
+    ranges = point_store['ranges'][component_start:component_end]
+    device = point_store['X'].device
+    index = torch.cat([torch.arange(start, end, device=device) for start, end in ranges])
+    index = index[torch.randperm(index.shape[0], device=device)]
+    for batch_index in torch.split(index, data_bs):
+        yield point_store['X'][batch_index], point_store['y'][batch_index]
+
+
 def batch_pair(trajectory_list, data_bs=None):
     states, actions = list(), list()
     random.shuffle(trajectory_list)
@@ -247,59 +324,75 @@ def append_log(f_list, log_txt):
         f.write(log_txt)
         f.close()
 
-def create_components(x_l, x_r, num_components):
-    # num_components: each dimension
-    # just cut the x[0] space
-    x_min, x_max = x_l[0], x_r[0]
-    x_c, x_width = list(), list()
-    # print(x_l, x_r)
-    for idx, idx_l in enumerate(x_l):
-        idx_r = x_r[idx]
-        x_c.append((idx_r + idx_l)/2)
-        x_width.append((idx_r - idx_l)/2)
-    component_length = (x_max - x_min) / num_components
-    components = list()
-    if len(x_l) == 1:
-        for i in range(num_components):
-            l = x_min + i * component_length
-            r = x_min + (i + 1) * component_length
-            center = [(r + l) / 2.0]
-            width = [(r - l) / 2.0]
-            for temp_c in x_c[1:]:
-                center.append(temp_c)
-            for temp_width in x_width[1:]:
-                width.append(temp_width)
-            # print(x_c[1:])
-            # print(center, x_c)
-            # center.extend[x_c[1:]]
-            # width.extend[x_width[1:]]
-            component_group = {
-                'center': center,
-                'width': width,
-            }
-            components.append(component_group)
-    elif len(x_l) == 4: # for cartpole task: for same dimensions
-        for i in range(num_components):
-            l = x_min + i * component_length
-            r = x_min + (i + 1) * component_length
-            center_0 = (r + l) / 2.0
-            width_0 = (r - l) / 2.0
-            for j in range(num_components):
-                l_1, r_1 = x_min + j * component_length, x_min + (j + 1) * component_length
-                center_1, width_1 = (r_1 + l_1) / 2.0, (r_1 - l_1) / 2.0
-                for m in range(num_components):
-                    l_2, r_2 = x_min + m * component_length, x_min + (m + 1) * component_length
-                    center_2, width_2 = (r_2 + l_2) / 2.0, (r_2 - l_2) / 2.0
-                    for n in range(num_components):
-                        l_3, r_3 = x_min + n * component_length, x_min + (n + 1) * component_length
-                        center_3, width_3 = (r_3 + l_3) / 2.0, (r_3 - l_3) / 2.0
-                        component_group = {
-                            'center': [center_0, center_1, center_2, center_3],
-                            'width': [width_0, width_1, width_2, width_3],
-                        }
-                        components.append(component_group)
+def component_splits(x_l, num_components):
+    # the number of pieces of each dimension: all the dimensions for the cartpole task, only x[0] otherwise
+    if len(x_l) == 4:
+        return [num_components] * 4
+    return [num_components] + [1] * (len(x_l) - 1)
 
-    return components
+
+# (x_l, x_r, splits) -> (center, width) of the grid
+GRID_CACHE = dict()
+
+
+def grid_rows(x_l, x_r, splits, start, end):
+    # center, width of the rows [start, end) of the grid of create_grid, made from the index of each row
+    pieces_list = np.unravel_index(np.arange(start, end), splits)
+    center_list, width_list = list(), list()
+    for x_min, x_max, num_pieces, pieces in zip(x_l, x_r, splits, pieces_list):
+        if num_pieces == 1:
+            l, r = np.full(end - start, x_min, dtype=np.float64), np.full(end - start, x_max, dtype=np.float64)
+        else:
+            component_length = (x_max - x_min) / num_pieces
+            pieces = pieces.astype(np.float64)
+            l, r = x_min + pieces * component_length, x_min + (pieces + 1) * component_length
+        center_list.append((r + l) / 2.0)
+        width_list.append((r - l) / 2.0)
+    return np.stack(center_list, axis=1), np.stack(width_list, axis=1)
+
+
+def create_grid(x_l, x_r, splits):
+    '''
+    cut the i-th dimension of [x_l, x_r] into splits[i] pieces of the same length
+    return center, width: float64 arrays of K x D, K = prod(splits), the last dimension changes the fastest
+    '''
+    key = (tuple(x_l), tuple(x_r), tuple(splits))
+    if key not in GRID_CACHE:
+        GRID_CACHE[key] = grid_rows(x_l, x_r, splits, 0, int(np.prod(splits)))
+    return GRID_CACHE[key]
+
+
+class ComponentGrid():
+    '''
+    the components [start, end) of create_components without their dicts, for the AI verifier
+    a slice is a ComponentGrid of the same grid, the boxes are made by create_abstract_states_from_components
+    '''
+    def __init__(self, x_l, x_r, num_components, splits=None, start=0, end=None):
+        self.x_l, self.x_r = x_l, x_r
+        self.splits = component_splits(x_l, num_components) if splits is None else splits
+        self.num_components = num_components
+        self.start = start
+        self.end = int(np.prod(self.splits)) if end is None else end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step not in [None, 1]:
+            raise TypeError("a ComponentGrid is sliced by a range of components")
+        start, end, _ = index.indices(len(self))
+        return ComponentGrid(self.x_l, self.x_r, self.num_components, self.splits, self.start + start, self.start + max(start, end))
+
+    def grid_rows(self):
+        return grid_rows(self.x_l, self.x_r, self.splits, self.start, self.end)
+
+
+def create_components(x_l, x_r, num_components, splits=None):
+    # num_components: each dimension
+    if splits is None:
+        splits = component_splits(x_l, num_components)
+    center, width = create_grid(x_l, x_r, splits)
+    return [{'center': c, 'width': w} for c, w in zip(center.tolist(), width.tolist())]
 
 
 def in_component(X, component):
@@ -313,26 +406,55 @@ def in_component(X, component):
     return True
 
 
+def bin_points(points, l, r):
+    '''
+    points: N values, l, r: the sorted bounds of K pieces, a point is in a piece if l <= point < r
+    return the indices of the points in each piece
+    '''
+    points, l, r = np.asarray(points, dtype=np.float64), np.asarray(l, dtype=np.float64), np.asarray(r, dtype=np.float64)
+    bins = [list() for _ in range(len(l))]
+    # the last piece starting before the point, the piece before it as well in case the two overlap by rounding
+    last_idx = np.searchsorted(l, points, side='right') - 1
+    for shift in [1, 0]:
+        piece_idx = last_idx - shift
+        valid = piece_idx >= 0
+        valid[valid] = points[valid] < r[piece_idx[valid]]
+        for point_idx in np.nonzero(valid)[0].tolist():
+            bins[piece_idx[point_idx]].append(point_idx)
+    for piece in bins:
+        piece.sort()
+    return bins
+
+
+# (id of the trajectories, x_l, x_r, splits) -> the trajectories of each piece of x[0], of the last dataset only
+BIN_CACHE = dict()
+
+
 # Current Support: partition one dimension
 def extract_abstract_representation(trajectories, x_l, x_r, num_components):
     # extract components
     # interval
-    # and all the trajectories starting from that interval
-    # x_min, x_max = x_l[0], x_r[0]
-    components = create_components(x_l, x_r, num_components)
-    # x_min, x_max = x_l[0], x_r[0]
-    # components = create_components(x_min, x_max, num_components)
+    # and all the trajectories starting from that interval, binned by x[0]
+    splits = component_splits(x_l, num_components)
+    components = create_components(x_l, x_r, num_components, splits=splits)
+    center, width = create_grid(x_l, x_r, splits)
+
+    key = (id(trajectories), tuple(x_l), tuple(x_r), tuple(splits))
+    if key not in BIN_CACHE or BIN_CACHE[key][0] is not trajectories:
+        if any(cached_trajectories is not trajectories for cached_trajectories, _ in BIN_CACHE.values()):
+            BIN_CACHE.clear()
+        # the pieces of x[0]: the first dimension changes the slowest in the grid
+        stride = len(center) // splits[0]
+        l, r = center[::stride, 0] - width[::stride, 0], center[::stride, 0] + width[::stride, 0]
+        starts = [ini_trajectory(trajectory)[0][0] for trajectory in trajectories]
+        bins = [[trajectories[i] for i in piece] for piece in bin_points(starts, l, r)]
+        BIN_CACHE[key] = (trajectories, bins)
+    _, bins = BIN_CACHE[key]
+
+    stride = len(components) // splits[0]
     for idx, component in enumerate(components):
-        component.update(
-            {
-                'trajectories': list(),
-            }
-        )
-        for trajectory in trajectories:
-            state, _ = ini_trajectory(trajectory)
-            if in_component([state[0]], component):
-                component['trajectories'].append(trajectory)
-        components[idx] = component
+        # the trajectory lists are shared by the components of the same piece of x[0], only read
+        component['trajectories'] = bins[idx // stride]
     
     return components
 
@@ -389,8 +511,12 @@ def divide_chunks(components_list, bs=1, data_bs=None):
 
 
 def create_abstract_states_from_components(components):
-    center_list, width_list = list(), list()
     abstract_states = dict()
+    if isinstance(components, ComponentGrid):
+        center, width = components.grid_rows()
+        abstract_states['center'], abstract_states['width'] = batch_points(center), batch_points(width)
+        return abstract_states
+    center_list, width_list = list(), list()
     for component_idx, component in enumerate(components):
         center_list.append(component['center'])
         width_list.append(component['width'])
@@ -477,7 +603,31 @@ def index_conversion_second_dim(x, index):
     return (torch.arange(x.size(0)), index)
 
 
+# buffer of the max lower bounds, grown to the largest batch seen
+select_argmax_buffers = dict()
+
+
 def select_argmax(interval_left, interval_right):
+    # lower bound and upper bound of the interval concretization
+    # an interval is in the argmax set iff its upper bound >= the max of all the lower bounds
+    # >= is for the interval where delta == 0
+    assert(interval_left.shape == interval_right.shape)
+
+    B, M = interval_right.shape
+    key = (interval_left.dtype, interval_left.device)
+    buffer = select_argmax_buffers.get(key)
+    if buffer is None or buffer.shape[0] < B:
+        buffer = torch.empty((B, 1), dtype=interval_left.dtype, device=interval_left.device)
+        select_argmax_buffers[key] = buffer
+    max_left_value = buffer[:B]
+    torch.amax(interval_left.detach(), dim=1, keepdim=True, out=max_left_value)
+    
+    index_mask = interval_right.detach() >= max_left_value
+    return index_mask
+
+
+def select_argmax_loop(interval_left, interval_right):
+    # the iterative version of select_argmax, kept for the micro-benchmark
     # lower bound and upper bound of the interval concretization
     assert(interval_left.shape == interval_right.shape)
 
@@ -534,4 +684,29 @@ def aggregate_sampling_states(abstract_states, sample_size, max_allowed=600):
     return aggregated_abstract_states_list
 
 
-
+def benchmark_select_argmax(M_list=[3, 5, 10], B_list=[100, 1000, 10000, 100000], repeat=20):
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    for M in M_list:
+        for B in B_list:
+            center = torch.rand((B, M), device=device)
+            delta = torch.rand((B, M), device=device) * 0.2
+            interval_left, interval_right = center - delta, center + delta
+            time_list = list()
+            for f in [select_argmax_loop, select_argmax]:
+                f(interval_left, interval_right)
+                if device == 'cuda':
+                    torch.cuda.synchronize()
+                start_t = time.time()
+                for i in range(repeat):
+                    index_mask = f(interval_left, interval_right)
+                if device == 'cuda':
+                    torch.cuda.synchronize()
+                time_list.append((time.time() - start_t) / repeat)
+            loop_mask, index_mask = select_argmax_loop(interval_left, interval_right), select_argmax(interval_left, interval_right)
+            # the loop marks the overlapping closure, a superset of the argmax set
+            assert(bool((loop_mask | ~index_mask).all()))
+            print(f"M: {M}, B: {B}, loop: {time_list[0]*1000:.3f} ms, closed form: {time_list[1]*1000:.3f} ms, tighter rows: {int((loop_mask != index_mask).any(1).sum())}")
+
+
+if __name__ == "__main__":
+    benchmark_select_argmax()
@@ -0,0 +1,110 @@
+'''
+On-disk cache of the AI verification results
+one file per (model weights, benchmark, domain, target), holding the verdict and the trajectory bounds of each verified box
+the files are evicted in the least recently used order when the cache directory is over its size limit
+'''
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+import torch
+
+
+def state_dict_hash(m):
+    h = hashlib.sha1()
+    for name, tensor in sorted(m.state_dict().items()):
+        tensor = tensor.detach().cpu().contiguous()
+        h.update(f"{name}:{tuple(tensor.shape)}:{tensor.dtype};".encode())
+        h.update(tensor.numpy().tobytes())
+    return h.hexdigest()
+
+
+def scalar(value):
+    return float(value.detach()) if isinstance(value, torch.Tensor) else float(value)
+
+
+def interval_spec(interval):
+    return None if interval is None else [scalar(interval.left), scalar(interval.right)]
+
+
+def target_spec(target):
+    # the safety properties of target as plain values
+    spec = list()
+    for target_component in target:
+        map_condition = target_component.get('map_condition')
+        spec.append({
+            'name': target_component.get('name'),
+            'method': target_component.get('method'),
+            'distance': target_component.get('distance'),
+            'map_mode': target_component.get('map_mode'),
+            'condition': interval_spec(target_component.get('condition')),
+            'map_condition': None if map_condition is None else [[interval_spec(interval) for interval in step] for step in map_condition],
+        })
+    return spec
+
+
+def box_keys(center, width):
+    # one key per box: the exact float values of its center and width
+    return [tuple(c + w) for c, w in zip(center.tolist(), width.tolist())]
+
+
+class VerificationCache():
+    def __init__(self, cache_dir, max_bytes, model_hash, settings):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        settings_hash = hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+        self.path = os.path.join(cache_dir, f"{model_hash[:20]}_{settings_hash[:20]}.pkl")
+        self.entries = dict()
+        self.num_new = 0
+        self.num_hits = 0
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                self.entries = pickle.load(f)
+            # the access time of the file for the LRU order
+            os.utime(self.path)
+
+    def get(self, key):
+        # (unsafe, trajectory_l, trajectory_r) or None
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.num_hits += 1
+        return entry
+
+    def put(self, key, unsafe, trajectory_l, trajectory_r):
+        self.entries[key] = (bool(unsafe), np.asarray(trajectory_l, dtype=np.float32), np.asarray(trajectory_r, dtype=np.float32))
+        self.num_new += 1
+
+    def save(self):
+        print(f"verification cache: {self.num_hits} hits, {self.num_new} new boxes, {len(self.entries)} boxes in {self.path}")
+        if self.num_new > 0:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(self.entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self.num_new = 0
+        evict(self.cache_dir, self.max_bytes, keep=self.path)
+
+
+def evict(cache_dir, max_bytes, keep=None):
+    # remove the least recently used files until the cache fits in max_bytes, keep is never removed
+    if not os.path.isdir(cache_dir):
+        return
+    paths = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith(".pkl")]
+    paths.sort(key=os.path.getmtime)
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    for path in paths:
+        if total_bytes <= max_bytes:
+            break
+        if path == keep:
+            continue
+        total_bytes -= os.path.getsize(path)
+        os.remove(path)
+        print(f"verification cache: evict {path}")
+
+
+def open_verification_cache(m, target, cache_dir, max_mb, settings):
+    # settings: the other values the verification result depends on, e.g. the benchmark and the domain
+    return VerificationCache(cache_dir, max_mb * 2**20, state_dict_hash(m), {'target': target_spec(target), **settings})
@@ -9,70 +9,92 @@ from utils import (
     load_model,
     create_abstract_states_from_components,
 )
+from domain_utils import stack_safe_intervals
+from program_utils import (
+    prune_states,
+    run_program,
+)
+from trajectory_io import open_trajectory_writer
+from verification_cache import (
+    box_keys,
+    open_verification_cache,
+)
 
 import import_hub as hub
 importlib.reload(hub)
 from import_hub import *
 
 
-def in_interval(x_l, x_r, y):
-    # check if x in y
-    # add a rounding operation
-    if x_l >= y.left - EPSILON and x_r <= y.right + EPSILON:
-        return True
-    else:
-        return False
-
-
-def trajectory_worst_case(trajectory_l, trajectory_r, target):
-    trajectory_worst_unsafe = False
-    for state_idx, state_l in enumerate(trajectory_l):
-        state_r = trajectory_r[state_idx]
-        # for each trajectory loop the target
-        for target_idx, target_component in enumerate(target):
-            pre_l, pre_r = state_l[target_idx], state_r[target_idx]
-            if target_component['distance']:
-                l = torch.zeros(pre_l.shape)
-                r = torch.zeros(pre_r.shape)
-                if torch.cuda.is_available():
-                    l = l.cuda()
-                    r = r.cuda()
-                all_neg_index = torch.logical_and(pre_l<=0, pre_r<=0)
-                across_index = torch.logical_and(pre_l<=0, pre_r>0)
-                all_pos_index = torch.logical_and(pre_l>0, pre_r>0)
-                l[all_neg_index], r[all_neg_index] = pre_r[all_neg_index].abs(), pre_l[all_neg_index].abs()
-                l[across_index], r[across_index] = 0, pre_r[across_index]
-                l[all_pos_index], r[all_pos_index] = pre_l[all_pos_index], pre_r[all_pos_index]
-            else:
-                l = pre_l
-                r = pre_r
-            if target_component["map_mode"] is True:
-                safe_interval_l = target_component["map_condition"][state_idx] # the constraint over the k-th step
-                for safe_interval in safe_interval_l:
-                    if not in_interval(l, r, safe_interval):
-                        return True
-            else:
-                if target_component["map_mode"] is False:
-                    safe_interval = target_component["condition"]
-                if not in_interval(l, r, safe_interval):
-                    return True
-    return trajectory_worst_unsafe
+def worst_case_distance(pre_l, pre_r):
+    # the interval of the absolute value of [pre_l, pre_r]
+    zeros = torch.zeros_like(pre_l)
+    all_neg_index = torch.logical_and(pre_l<=0, pre_r<=0)
+    across_index = torch.logical_and(pre_l<=0, pre_r>0)
+    all_pos_index = torch.logical_and(pre_l>0, pre_r>0)
+    l = torch.where(all_neg_index, pre_r.abs(), torch.where(all_pos_index, pre_l, zeros))
+    r = torch.where(all_neg_index, pre_l.abs(), torch.where(torch.logical_or(across_index, all_pos_index), pre_r, zeros))
+    return l, r
 
 
-def verify_worst_case(output_states, target):
-    worst_case_unsafe_num = 0.0
-    for trajectory_idx, trajectory_l in enumerate(output_states['trajectories_l']):
-        trajectory_r = output_states['trajectories_r'][trajectory_idx]
-        worst_case_unsafe = trajectory_worst_case(trajectory_l, trajectory_r, target)
-        if worst_case_unsafe:
-            worst_case_unsafe_num += 1
-
-    worst_case_unsafe_num = worst_case_unsafe_num * 1.0 / len(output_states['trajectories_l'])
-    print(f"verify AI: #worst case unsafe num: {worst_case_unsafe_num}")
+def worst_case_unsafe_mask(output_states, target):
+    '''
+    the worst case verdict of all the states at once: the B x T x K bounds against the T x M safe intervals of each target
+    a step is unsafe if it is not in all the safe intervals of the step, a step with no constraint in map mode is an error
+    return unsafe: bool, B, first_unsafe_step: int64, B, the first unsafe step of each trajectory, -1 if it is safe
+    '''
+    trajectories_l, trajectories_r = output_states.get_trajectories()
+    B, T = trajectories_l.shape[0], trajectories_l.shape[1]
+    device = trajectories_l.device
+    step = torch.arange(T, device=device)
+    valid = step.unsqueeze(0) < output_states.trajectory_length.unsqueeze(1)
+    violation = torch.zeros((B, T), dtype=torch.bool, device=device)
+    epsilon = float(EPSILON.detach()) if isinstance(EPSILON, torch.Tensor) else float(EPSILON)
+    for target_idx, target_component in enumerate(target):
+        l, r = trajectories_l[:, :, target_idx], trajectories_r[:, :, target_idx]
+        if target_component['distance']:
+            l, r = worst_case_distance(l, r)
+        safe_intervals = stack_safe_intervals(target_component).to(device)
+        if target_component["map_mode"] is True:
+            T_c = min(T, safe_intervals.shape[0])
+            if T_c < T and bool(valid[:, T_c:].any()):
+                raise IndexError(f"trajectory step {T_c} of target {target_component['name']} has no constraint in map_condition of length {safe_intervals.shape[0]}")
+            safe_intervals = safe_intervals[:T_c].unsqueeze(0)
+            l, r = l[:, :T_c].unsqueeze(2), r[:, :T_c].unsqueeze(2)
+        else:
+            T_c = T
+            safe_intervals = safe_intervals[0, 0]
+        inside = torch.logical_and(l >= safe_intervals[..., 0] - epsilon, r <= safe_intervals[..., 1] + epsilon)
+        if target_component["map_mode"] is True:
+            inside = inside.all(2)
+        violation[:, :T_c] |= ~inside
+    violation &= valid
+    unsafe = violation.any(1)
+    first_unsafe_step = torch.where(unsafe, violation.to(torch.uint8).argmax(1), torch.full_like(unsafe, -1, dtype=torch.long))
+    return unsafe, first_unsafe_step
+
+
+def worst_case_unsafe_list(output_states, target):
+    # if the trajectory of each state may be unsafe
+    unsafe, _ = worst_case_unsafe_mask(output_states, target)
+    return unsafe.tolist()
+
+
+def count_worst_case_unsafe(output_states, target):
+    return float(sum(worst_case_unsafe_list(output_states, target)))
+
+
+def log_worst_case(worst_case_unsafe_num, name="#worst case unsafe num"):
+    print(f"verify AI: {name}: {worst_case_unsafe_num}")
     if not constants.debug:
         log_file_evaluation = open(constants.file_dir_evaluation, 'a')
-        log_file_evaluation.write(f"verify AI: #worst case unsafe num: {worst_case_unsafe_num}\n")
+        log_file_evaluation.write(f"verify AI: {name}: {worst_case_unsafe_num}\n")
         log_file_evaluation.flush()
+    return worst_case_unsafe_num
+
+
+def verify_worst_case(output_states, target):
+    worst_case_unsafe_num = count_worst_case_unsafe(output_states, target) * 1.0 / len(output_states)
+    return log_worst_case(worst_case_unsafe_num)
 
 
 def show_component_p(component_list):
@@ -83,24 +105,25 @@ def show_component_p(component_list):
     return 
 
 
+def open_trajectory_file(trajectory_path):
+    # the trajectory writer of the AI verifier, text or binary by constants.trajectory_format
+    return open_trajectory_writer(trajectory_path + f"_AI", f"{constants.name_list}", constants.trajectory_format)
+
+
 def store_trajectory(output_states, trajectory_path, category=None):
-    trajectory_path = trajectory_path + f"_AI"
-    trajectory_path += ".txt"
-    trajectory_log_file = open(trajectory_path, 'w')
-    trajectory_log_file.write(f"{constants.name_list}\n")
-    for trajectory_idx, trajectory_l in enumerate(output_states['trajectories_l']):
-        trajectory_r = output_states['trajectories_r'][trajectory_idx]
-        trajectory_log_file.write(f"trajectory_idx {trajectory_idx}\n")
-        for state_idx, state_l in enumerate(trajectory_l):
-            state_r = trajectory_r[state_idx]
-            for idx, x_l in enumerate(state_l):
-                x_r = state_r[idx]
-                trajectory_log_file.write(f"{float(x_l)}, {float(x_r)};")
-            trajectory_log_file.write(f"\n")
-    trajectory_log_file.close()
+    trajectory_writer = open_trajectory_file(trajectory_path)
+    trajectory_writer.append(*output_states.get_trajectories(), output_states.trajectory_length)
+    trajectory_writer.close()
     return 
 
 
+def states_trajectory_list(output_states):
+    # (trajectory_l, trajectory_r) of each state, arrays of length x K
+    trajectories_l, trajectories_r = output_states.get_trajectories()
+    trajectories_l, trajectories_r = trajectories_l.detach().cpu().numpy(), trajectories_r.detach().cpu().numpy()
+    return [(trajectories_l[trajectory_idx, :length], trajectories_r[trajectory_idx, :length]) for trajectory_idx, length in enumerate(output_states.trajectory_length.tolist())]
+
+
 def verifier_AI(model_path, model_name, components, target, trajectory_path):
     m = Program(l=l, nn_mode=nn_mode)
     
@@ -115,10 +138,191 @@ def verifier_AI(model_path, model_name, components, target, trajectory_path):
     for param in m.parameters():
         param.requires_grad = False
     
-    abstract_states = create_abstract_states_from_components(components)
-    ini_states = initialize_components(abstract_states)
+    cache = None
+    if constants.verification_cache_dir is not None:
+        cache = open_verification_cache(
+            m, target, constants.verification_cache_dir, constants.verification_cache_size,
+            settings={'benchmark_name': constants.benchmark_name, 'nn_domain': constants.nn_domain, 'zonotope_max_errors': constants.zonotope_max_errors},
+        )
+
+    if constants.verifier_refine_depth > 0:
+        res = verify_refine(m, components, target, trajectory_path, cache=cache)
+    elif constants.verifier_chunk_size is None and constants.verifier_memory_budget is None and not constants.verifier_early_stop:
+        abstract_states = create_abstract_states_from_components(components)
+        unsafe_list, trajectory_list, _ = evaluate_boxes(m, abstract_states['center'], abstract_states['width'], target, cache=cache)
+        trajectory_writer = open_trajectory_file(trajectory_path)
+        trajectory_writer.append_list(trajectory_list)
+        trajectory_writer.close()
+        res = log_worst_case(sum(unsafe_list) * 1.0 / len(unsafe_list))
+    else:
+        res = verify_chunks(m, components, target, trajectory_path, cache=cache)
+
+    if cache is not None:
+        cache.save()
+    return res
 
-    output_states = m(ini_states)
-    store_trajectory(output_states, trajectory_path, category=None)
+
+def evaluate_boxes(m, center, width, target, cache=None):
+    '''
+    the worst case verdict and the trajectory bounds of each box, the boxes in the cache are not run
+    return unsafe_list, trajectory_list, the output states of the boxes run (None if all the boxes are cached)
+    '''
+    keys = None
+    results = [None] * center.shape[0]
+    if cache is not None:
+        keys = box_keys(center, width)
+        results = [cache.get(key) for key in keys]
+    missing = [idx for idx, result in enumerate(results) if result is None]
+    output_states = None
+    if len(missing) > 0:
+        if len(missing) < center.shape[0]:
+            missing_idx = torch.tensor(missing, dtype=torch.long, device=center.device)
+            center, width = center[missing_idx], width[missing_idx]
+        output_states = run_boxes(m, center, width)
+        unsafe_list = worst_case_unsafe_list(output_states, target)
+        for idx, unsafe, (trajectory_l, trajectory_r) in zip(missing, unsafe_list, states_trajectory_list(output_states)):
+            results[idx] = (unsafe, trajectory_l, trajectory_r)
+            if cache is not None:
+                cache.put(keys[idx], unsafe, trajectory_l, trajectory_r)
+    return [result[0] for result in results], [(result[1], result[2]) for result in results], output_states
+
+
+def states_nbytes(states):
+    return sum(tensor.numel() * tensor.element_size() for tensor in [states.x.c, states.x.delta, states.trajectories_l, states.trajectories_r])
+
+
+def verify_chunks(m, components, target, trajectory_path, cache=None):
+    '''
+    run the components chunk by chunk, the unsafe count and the trajectory file are updated after each chunk
+    components: a list of components or a ComponentGrid, whose boxes are only made for the chunk being run
+    with a memory budget, the chunk size is set from the peak memory per component of the first chunk
+    with early stop, the verdict is returned instead of the unsafe fraction
+    the memory is measured on the device on cuda, as the size of the output states otherwise
+    '''
+    budget = None if constants.verifier_memory_budget is None else constants.verifier_memory_budget * 2**20
+    chunk_size = constants.verifier_chunk_size
+    if chunk_size is None:
+        # a small first chunk to measure the memory
+        chunk_size = min(len(components), 64)
+    chunk_size = max(1, chunk_size)
     
-    verify_worst_case(output_states, target)
+    trajectory_writer = open_trajectory_file(trajectory_path)
+    worst_case_unsafe_num, verified_num = 0.0, 0
+    start_idx, chunk_idx = 0, 0
+    while start_idx < len(components):
+        chunk = components[start_idx:start_idx + chunk_size]
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+            base_bytes = torch.cuda.memory_allocated()
+        abstract_states = create_abstract_states_from_components(chunk)
+        unsafe_list, trajectory_list, output_states = evaluate_boxes(m, abstract_states['center'], abstract_states['width'], target, cache=cache)
+        if torch.cuda.is_available():
+            peak_bytes = torch.cuda.max_memory_allocated() - base_bytes
+        else:
+            # the input states are about the size of x of the output states
+            peak_bytes = 0 if output_states is None else states_nbytes(output_states) + 2 * output_states.x.c.numel() * output_states.x.c.element_size()
+
+        trajectory_writer.append_list(trajectory_list)
+        trajectory_writer.flush()
+        chunk_unsafe_num = float(sum(unsafe_list))
+        worst_case_unsafe_num += chunk_unsafe_num
+        verified_num += len(unsafe_list)
+        start_idx += len(chunk)
+        if constants.debug_verifier:
+            print(f"verify AI chunk {chunk_idx}: {len(chunk)} components, {peak_bytes / 2**20} MB, unsafe num: {chunk_unsafe_num}")
+        del output_states
+
+        if constants.verifier_early_stop and chunk_unsafe_num > 0:
+            print(f"verify AI: early stop, unsafe component found in the first {start_idx} components")
+            break
+        if budget is not None and chunk_idx == 0 and peak_bytes > 0:
+            chunk_size = max(1, int(budget / max(peak_bytes / len(chunk), 1)))
+            print(f"verify AI: chunk size {chunk_size} for the memory budget {constants.verifier_memory_budget} MB")
+        chunk_idx += 1
+    trajectory_writer.close()
+
+    if constants.verifier_early_stop:
+        # the fraction of a partial run is not comparable, only the verdict is kept: 1.0 if an unsafe component is found
+        return log_worst_case(float(worst_case_unsafe_num > 0), name="worst case unsafe verdict")
+    return log_worst_case(worst_case_unsafe_num * 1.0 / verified_num)
+
+
+
+def run_boxes(m, center, width):
+    # the output states of the input boxes, sorted as the boxes
+    ini_states = prune_states(m, initialize_components({'center': center, 'width': width}))
+    return run_program(m, ini_states)
+
+
+def input_influence(m, center, width):
+    '''
+    the first order contribution of each input dimension to the width of the trajectories, B x D
+    the gradient of the sum of the trajectory widths to the input width, times the input width
+    '''
+    with torch.enable_grad():
+        width = width.clone().requires_grad_(True)
+        output_states = run_boxes(m, center, width)
+        trajectories_l, trajectories_r = output_states.get_trajectories()
+        step = torch.arange(trajectories_l.shape[1], device=trajectories_l.device)
+        valid = (step.unsqueeze(0) < output_states.trajectory_length.unsqueeze(1)).unsqueeze(2)
+        trajectory_width = torch.where(valid, trajectories_r - trajectories_l, torch.zeros_like(trajectories_l)).sum()
+        if not trajectory_width.requires_grad:
+            return width.detach()
+        grad, = torch.autograd.grad(trajectory_width, width, allow_unused=True)
+    if grad is None:
+        return width.detach()
+    return grad.abs() * width.detach()
+
+
+def verify_refine(m, components, target, trajectory_path, cache=None):
+    '''
+    branch and bound over the components: the boxes which may be unsafe are bisected along the input dimension
+    with the largest influence on the width of their trajectories, until the depth or the time budget
+    return the unsafe volume fraction, the volume of the boxes still unsafe at the end over the volume of the components
+    '''
+    start_t = time.time()
+    abstract_states = create_abstract_states_from_components(components)
+    center, width = abstract_states['center'], abstract_states['width']
+    # the dimensions of width 0 do not count in the volume
+    split_dims = (width > 0).any(0)
+    volume = lambda w: (2 * w[:, split_dims]).prod(1)
+    total_volume = float(volume(width).sum())
+    chunk_size = constants.verifier_chunk_size if constants.verifier_chunk_size is not None else center.shape[0]
+
+    trajectory_writer = open_trajectory_file(trajectory_path)
+    safe_volume, unsafe_volume, num_runs = 0.0, 0.0, 0
+    for depth in range(constants.verifier_refine_depth + 1):
+        last = depth == constants.verifier_refine_depth or \
+            (constants.verifier_refine_time is not None and time.time() - start_t > constants.verifier_refine_time)
+        unsafe_idx_list = list()
+        for start_idx in range(0, center.shape[0], chunk_size):
+            unsafe_list, trajectory_list, _ = evaluate_boxes(m, center[start_idx:start_idx + chunk_size], width[start_idx:start_idx + chunk_size], target, cache=cache)
+            unsafe_idx_list += [start_idx + idx for idx, unsafe in enumerate(unsafe_list) if unsafe]
+            # the trajectories of the final boxes
+            final_trajectory_list = [trajectory for trajectory, unsafe in zip(trajectory_list, unsafe_list) if last or not unsafe]
+            trajectory_writer.append_list(final_trajectory_list)
+        num_runs += center.shape[0]
+
+        unsafe_idx = torch.tensor(unsafe_idx_list, dtype=torch.long, device=center.device)
+        box_volume = volume(width)
+        unsafe_box_volume = float(box_volume[unsafe_idx].sum())
+        safe_volume += float(box_volume.sum()) - unsafe_box_volume
+        if constants.debug_verifier:
+            print(f"verify AI refine depth {depth}: {center.shape[0]} boxes, {len(unsafe_idx_list)} unsafe, safe volume: {safe_volume / total_volume}")
+        if last or len(unsafe_idx_list) == 0:
+            unsafe_volume = unsafe_box_volume
+            break
+
+        # bisect the unsafe boxes
+        center, width = center[unsafe_idx], width[unsafe_idx]
+        influence = input_influence(m, center, width)
+        influence[:, ~split_dims] = -1.0
+        dim = influence.argmax(1, keepdim=True)
+        half_width = width.gather(1, dim) / 2.0
+        offset = torch.zeros_like(width).scatter(1, dim, half_width)
+        center = torch.cat([center - offset, center + offset], 0)
+        width = torch.cat([width.scatter(1, dim, half_width)] * 2, 0)
+    trajectory_writer.close()
+
+    print(f"verify AI refine: safe volume fraction: {safe_volume / total_volume}, {num_runs} boxes run, depth {depth}, {time.time() - start_t} sec.")
+    return log_worst_case(unsafe_volume / total_volume, name="worst case unsafe volume fraction")